@@ -1,18 +1,38 @@
 ﻿# coding: utf-8
 import argparse
-import codecs
+import functools
 import os
 import sys
 
-from collections import OrderedDict
+from module.artwork import ArtworkCache, create_artwork
+from module.checkpoint import Checkpoint, CheckpointError, read_checkpoint
+from module.cover import (
+    CoverOptimizer, CoverOptions, get_default_cache_dir,
+    is_optimizer_available)
+from module.genres import GenreCollector, write_genres, GENRE_FORMATS
+from module.index import get_index_values, ScanIndex
+from module.normalize import normalize_many, normalize_string
+from module.paths import (
+    gen_audio_files, gen_directories, walk_directories, WalkFilter)
+from module.plan import (
+    gen_directory_groups, get_dir_renames, make_paths_absolute, PlanWriter,
+    read_plan,
+    OP_ARTWORK, OP_RENAME_DIR, OP_RENAME_FILE, OP_TAGS)
+from module.rename import RenameBatch
+from module.session import WriteSession
+from module.shard import get_part_filename, ShardError, ShardParts
+from module.stats import STATS
+from module.tag import get_tags, read_tags, TagLoadError
+from module.throttle import SCHEDULER, set_idle_priority, TimeWindow
+from module.track import read_track_info
+from module.workers import run_tasks, WorkerStats
 
-from module.artwork import is_artwork_file, create_artwork
-from module.normalize import normalize_path, normalize_string
-from module.paths import gen_audio_files, gen_directories
-from module.tag import get_tags, is_audio_file, TagLoadError
 
+GENRE_OUT_FILENAMES = {
+    'text': 'genres.txt', 'json': 'genres.json', 'csv': 'genres.csv',
+}
 
-GENRE_OUT_FILENAME = 'genres.txt'
+OPERATIONS = ('tags', 'artwork', 'genres', 'uncovered', 'rename', )
 
 
 def keyboard_interrupt(function):
@@ -26,73 +46,293 @@ def keyboard_interrupt(function):
 
 
 def print_scanning(function):
-    def wrapper(directory):
+    def wrapper(directory, *args, **kwargs):
         abs_dir_path = os.path.abspath(directory)
         print(f'Scanning {abs_dir_path}')
-        function(directory)
+        function(directory, *args, **kwargs)
 
     return wrapper
 
 
+def _normalize_tags(filename, with_values=False):
+    try:
+        tag = get_tags(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        return filename, None, None
+
+    session = WriteSession(filename, tag)
+    changed = _normalize_tag_values(session)
+    session.commit()
+    values = get_index_values(tag) if with_values else None
+    return filename, changed, values
+
+
+def _normalize_tag_values(session):
+    keys = ('artist', 'album', 'title')
+    old_values = [session.get(key) for key in keys]
+    with STATS.timer('normalize'):
+        new_values = normalize_many(old_values)
+    for key, new_value in zip(keys, new_values):
+        session.set(key, new_value)
+    return session.changed
+
+
+def _is_normalized_in_index(index, filename):
+    row = index.lookup(filename)
+    if row is None or _get_normalized_name(filename) != filename:
+        return False
+    for key in ('artist', 'album', 'title'):
+        if normalize_string(row[key]) != row[key]:
+            return False
+    return True
+
+
+def _rename_files(batch, tag, index=None):
+    # Renames are applied in the main thread, so a target that already
+    # exists is never overwritten by another file of the same run.
+    for rename in _apply_renames(batch, tag):
+        STATS.incr('files_renamed')
+        print(f'[!] file renamed: {rename.path}')
+        if index is not None:
+            index.rename(rename.path, rename.target)
+
+
+def _rename_directories(batch, tag):
+    renamed_dirs = _apply_renames(batch, tag)
+    for rename in renamed_dirs:
+        STATS.incr('dirs_renamed')
+        print(f'folder renamed: {rename.path}')
+    return renamed_dirs
+
+
+def _apply_renames(batch, tag):
+    renamed = batch.apply()
+    for rename in batch.renames:
+        if rename.error is not None:
+            print(f'[{tag}] Unable to rename {rename.path}: {rename.error}')
+    return renamed
+
+
 @keyboard_interrupt
 @print_scanning
-def fix_audio_tags(directory):
-    for filename in gen_audio_files(directory):
-        try:
-            tag = get_tags(filename)
-        except (IOError, TagLoadError):
-            print(f'[fix_audio_tags] Unable to load tags for {filename}')
-            continue
+def fix_audio_tags(directory, jobs=1, processes=False, index=None,
+                   walk_filter=None, checkpoint=None):
+    filenames = _gen_pending_files(directory, walk_filter, checkpoint)
+    if index is not None:
+        filenames = (filename for filename in filenames
+                     if not _is_normalized_in_index(index, filename))
+    function = functools.partial(_normalize_tags,
+                                 with_values=index is not None)
+    stats = WorkerStats()
+    results = run_tasks(function, filenames,
+                        jobs=jobs, processes=processes, stats=stats)
+    current_dir = None
+    batch = RenameBatch(checkpoint)
+    for filename, changed, values in results:
+        # Results come in walk order, so a directory is done once a file
+        # of another one is returned.
+        basedir = os.path.dirname(filename)
+        if basedir != current_dir:
+            if current_dir is not None:
+                _finish_directory(current_dir, batch, index, checkpoint)
+                batch = RenameBatch(checkpoint)
+            current_dir = basedir
+        file_batch = batch
+        if _is_shard_root(basedir, directory, walk_filter):
+            file_batch = None
+        _finish_normalized_file(filename, changed, values, index,
+                                file_batch, checkpoint)
+    if current_dir is not None:
+        _finish_directory(current_dir, batch, index, checkpoint)
+    if checkpoint is not None:
+        checkpoint.complete()
+
+    if jobs > 1:
+        for worker, count, rate in stats.gen_report():
+            print(f'[fix_audio_tags] worker {worker}: {count} files, '
+                  f'{rate:.1f} files/s')
+
+
+def _gen_pending_files(directory, walk_filter, checkpoint):
+    for record in walk_directories(directory, walk_filter):
+        if checkpoint is None or not checkpoint.is_done(record.path):
+            yield from record.audio_files
+
+
+def _is_shard_root(path, directory, walk_filter):
+    # Shards leave the root and its files as they are, so a shard which
+    # is done first does not rename anything others are still walking
+    return walk_filter is not None and walk_filter.shard is not None and \
+        os.path.abspath(path) == os.path.abspath(directory)
+
+
+def _finish_directory(path, batch, index, checkpoint):
+    _rename_files(batch, 'fix_audio_tags', index)
+    if checkpoint is not None:
+        checkpoint.mark_done(path)
 
-        changed = False
-        for key in ('artist', 'album', 'title'):
-            old_value = getattr(tag, key)
-            new_value = normalize_string(old_value)
-            if old_value != new_value:
-                setattr(tag, key, new_value)
-                changed = True
-        if changed:
-            tag.save()
-            print(f'[!] file updated: {filename}')
-        new_filename = normalize_path(filename)
-        if filename != new_filename:
-            try:
-                os.rename(filename, new_filename)
-                print(f'[!] file renamed: {filename}')
-            except Exception:
-                print(f'[fix_audio_tags] Unable to rename {filename}')
+
+def _finish_normalized_file(filename, changed, values, index, batch,
+                            checkpoint=None):
+    if changed is None:
+        print(f'[fix_audio_tags] Unable to load tags for {filename}')
+        return
+    if changed:
+        print(f'[!] file updated: {filename}')
+        if checkpoint is not None:
+            checkpoint.log_update(filename)
+    if index is not None:
+        index.update(filename, values)
+    if batch is not None:
+        batch.add(filename, normalize_string(os.path.basename(filename)))
 
 
 @keyboard_interrupt
 @print_scanning
-def rename_dirs(directory):
-    renamed_dirs = []
-    for item in gen_directories(directory, with_files=False):
-        old_path = item
-        new_path = normalize_path(old_path)
-        if old_path != new_path:
-            try:
-                os.rename(old_path, new_path)
-                renamed_dirs.append(old_path)
-            except Exception:
-                print(f'[rename_dirs] Unable to rename {old_path}')
-    if renamed_dirs:
-        for path in renamed_dirs:
-            print(f'folder renamed: {path}')
-    else:
+def fix_audio_tags_async(directory, index=None, walk_filter=None,
+                         meta_limit=16, write_limit=4):
+    # asyncio is slow to import and needed only here
+    from module.aio import run_pipeline
+
+    # The index connection is bound to the main thread, so lookups and
+    # updates happen in the pipeline loop, renames after the pipeline.
+    batch = RenameBatch()
+
+    def gen_items(record):
+        for filename in record.audio_files:
+            if index is None or not _is_normalized_in_index(index, filename):
+                yield filename
+
+    def on_result(result):
+        filename, session, changed = result
+        values = None
+        if index is not None and session is not None:
+            values = get_index_values(session.tag)
+        file_batch = batch
+        if _is_shard_root(os.path.dirname(filename), directory, walk_filter):
+            file_batch = None
+        _finish_normalized_file(filename, changed, values, index, file_batch)
+
+    run_pipeline(directory, gen_items, _read_normalized_tags,
+                 _save_normalized_tags, on_result,
+                 meta_limit=meta_limit, write_limit=write_limit,
+                 walk_filter=walk_filter)
+    _rename_files(batch, 'fix_audio_tags', index)
+
+
+def _read_normalized_tags(filename):
+    try:
+        tag = get_tags(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        return (filename, None, None), False
+    session = WriteSession(filename, tag)
+    changed = _normalize_tag_values(session)
+    return (filename, session, changed), changed
+
+
+def _save_normalized_tags(result):
+    _, session, _ = result
+    session.commit()
+
+
+@keyboard_interrupt
+@print_scanning
+def rename_dirs(directory, walk_filter=None, checkpoint=None):
+    # The whole tree is listed before anything is renamed
+    batch = RenameBatch(checkpoint)
+    for path in gen_directories(directory, with_files=False,
+                                walk_filter=walk_filter):
+        if not _is_shard_root(path, directory, walk_filter):
+            batch.add(path, normalize_string(os.path.basename(path)))
+    renamed_dirs = _rename_directories(batch, 'rename_dirs')
+    if checkpoint is not None:
+        checkpoint.complete()
+    if not renamed_dirs:
         print('Nothing is renamed')
 
 
+@print_scanning
+def rollback_renames(directory, checkpoint_filename):
+    state = read_checkpoint(checkpoint_filename)
+    reverted_count = 0
+    # Renames are logged before they are applied, so the last ones may
+    # have never happened.
+    for path, target in reversed(state.renames):
+        if not os.path.exists(target) or os.path.exists(path):
+            continue
+        try:
+            with STATS.timer('rename'):
+                os.rename(target, path)
+            reverted_count += 1
+            print(f'rename reverted: {target}')
+        except Exception as e:
+            STATS.add_error(e)
+            print(f'[rollback_renames] Unable to rename {target}')
+    with Checkpoint(checkpoint_filename, state.command, state.directory,
+                    resume=True) as checkpoint:
+        checkpoint.log_rollback()
+    print(f'[rollback_renames] {reverted_count} renames reverted')
+
+
 @keyboard_interrupt
 @print_scanning
-def search_uncovered_dirs(directory):
+def search_uncovered_dirs(directory, walk_filter=None, shard=None):
     uncovered_dirs = []
-    for item in gen_directories(directory, with_files=True):
-        for subitem in os.listdir(item):
-            if is_artwork_file(subitem):
-                break
+    for record in walk_directories(directory, walk_filter):
+        if record.files and not record.artwork_files:
+            uncovered_dirs.append(record.path)
+    if shard is not None:
+        entries = ({'type': 'uncovered', 'path': path}
+                   for path in uncovered_dirs)
+        _write_part('uncovered', directory, shard, entries)
+    _print_uncovered_dirs(uncovered_dirs)
+
+
+@keyboard_interrupt
+@print_scanning
+def extract_covers(directory, jobs=1, processes=False, walk_filter=None):
+    from module.extract import has_cover_file
+
+    items = ((record.path, record.audio_files)
+             for record in walk_directories(directory, walk_filter)
+             if record.audio_files and not record.artwork_files and
+             not has_cover_file(record.path))
+    extracted_count = missing_count = failed_count = 0
+    results = run_tasks(_extract_cover, items, jobs=jobs, processes=processes)
+    for path, cover_filename, picture_count, error in results:
+        if error is not None:
+            failed_count += 1
+            print(f'[extract] Unable to write a cover to {path}: {error}')
+            continue
+        if cover_filename is None:
+            missing_count += 1
+            continue
+        extracted_count += 1
+        if picture_count > 1:
+            print(f'Extracted: {cover_filename} '
+                  f'(of {picture_count} different pictures)')
         else:
-            uncovered_dirs.append(item)
+            print(f'Extracted: {cover_filename}')
+    print(f'[extract_covers] {extracted_count} covers extracted, '
+          f'{missing_count} directories without embedded pictures, '
+          f'{failed_count} failed')
+
+
+def _extract_cover(item):
+    from module.extract import extract_cover
+
+    path, audio_files = item
+    try:
+        cover_filename, picture_count = extract_cover(path, audio_files)
+    except OSError as e:
+        STATS.add_error(e)
+        return path, None, 0, str(e)
+    return path, cover_filename, picture_count, None
+
+
+def _print_uncovered_dirs(uncovered_dirs):
     if uncovered_dirs:
         for path in uncovered_dirs:
             print(f'Uncovered: {path}')
@@ -100,58 +340,621 @@ def search_uncovered_dirs(directory):
         print('All directories have covers')
 
 
+def _write_part(command, directory, shard, entries):
+    filename = get_part_filename(command, shard)
+    # Parts hold no renames, one left by an interrupted run is replaced
+    if os.path.exists(filename):
+        os.remove(filename)
+    with Checkpoint(filename, command, directory, shard=shard) as part:
+        for entry in entries:
+            part.write(entry)
+        part.complete()
+    filepath = os.path.join(os.getcwd(), filename)
+    print(f'[shard] partial output written to {filepath}')
+
+
 @keyboard_interrupt
 @print_scanning
-def collect_genres(directory):
-    genres = {}
-    for filename in gen_audio_files(directory, only_first=True):
+def collect_genres(directory, index=None, walk_filter=None,
+                   output_format='text', memory_limit=64 * 1024 * 1024,
+                   shard=None):
+    with GenreCollector(memory_limit) as collector:
+        for filename in gen_audio_files(directory, walk_filter=walk_filter):
+            genre = _read_genre(filename, index)
+            if genre:
+                basedir = os.path.dirname(filename)
+                collector.add(genre, os.path.abspath(basedir))
+
+        if shard is None:
+            _write_genres_file(collector, output_format)
+        else:
+            entries = ({'type': 'genre', 'genre': genre,
+                        'directory': basedir, 'tracks': tracks}
+                       for genre, basedir, tracks in collector.gen_items())
+            _write_part('genres', directory, shard, entries)
+
+
+def _write_genres_file(collector, output_format):
+    filename = GENRE_OUT_FILENAMES[output_format]
+    with open(filename, 'w', encoding='utf-8', newline='') as fd:
+        write_genres(fd, collector, output_format)
+    filepath = os.path.join(os.getcwd(), filename)
+    print(f'[collect_genres] genre info written to {filepath}')
+
+
+def _read_genre(filename, index):
+    row = index.lookup(filename) if index is not None else None
+    if row is not None:
+        return row['genre']
+
+    try:
+        track = read_track_info(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        print(f'[collect_genres] error: get tag from {filename}')
+        return None
+    if index is not None:
+        index.update(filename, get_index_values(track))
+    return track.genre
+
+
+@keyboard_interrupt
+@print_scanning
+def attach_artworks(directory, index=None, walk_filter=None,
+                    optimizer=None, checkpoint=None):
+    artwork_cache = ArtworkCache(optimizer=optimizer)
+    rewritten_count = skipped_count = rewritten_size = saved_size = 0
+    for record in walk_directories(directory, walk_filter):
+        if not record.artwork_files:
+            continue
+        if checkpoint is not None and checkpoint.is_done(record.path):
+            continue
+        artwork_filename = record.artwork_files[0]
+        artwork = artwork_cache.get(artwork_filename)
+        for filename in record.audio_files:
+            size = _attach_artwork(filename, artwork, index)
+            if size is None:
+                skipped_count += 1
+                saved_size += record.get_size(filename)
+            else:
+                rewritten_count += 1
+                rewritten_size += size
+                if checkpoint is not None:
+                    checkpoint.log_update(filename)
+        if checkpoint is not None:
+            checkpoint.mark_done(record.path)
+    if checkpoint is not None:
+        checkpoint.complete()
+    print(f'[attach_artworks] {rewritten_count} files rewritten '
+          f'({rewritten_size} bytes), {skipped_count} skipped, '
+          f'{saved_size} bytes saved')
+
+
+def _attach_artwork(filename, artwork, index):
+    if index is not None and _has_artwork_in_index(index, filename, artwork):
+        return None
+    try:
+        tag = get_tags(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        print(f'[attach_artworks] Unable to load tags for {filename}')
+        return None
+    session = WriteSession(filename, tag)
+    changed = session.set('artwork', artwork)
+    size = session.commit()
+    if index is not None:
+        index.update(filename, get_index_values(tag, artwork))
+    return size if changed else None
+
+
+@keyboard_interrupt
+@print_scanning
+def run_operations(directory, operations, index=None, walk_filter=None,
+                   output_format='text', memory_limit=64 * 1024 * 1024,
+                   optimizer=None):
+    _run_operations(directory, operations, index, walk_filter,
+                    output_format, memory_limit,
+                    ArtworkCache(optimizer=optimizer))
+
+
+def _run_operations(directory, operations, index, walk_filter,
+                    output_format, memory_limit, artwork_cache):
+    # All operations share a single walk, each file is loaded and saved
+    # at most once.
+    uncovered_dirs = []
+    dir_paths = []
+    rewritten_count = rewritten_size = 0
+    with GenreCollector(memory_limit) as collector:
+        for record in walk_directories(directory, walk_filter):
+            dir_paths.append(record.path)
+            if record.files and not record.artwork_files:
+                uncovered_dirs.append(record.path)
+            artwork = None
+            if 'artwork' in operations and record.artwork_files:
+                artwork = artwork_cache.get(record.artwork_files[0])
+            batch = RenameBatch()
+            for filename in record.audio_files:
+                size = _process_file(filename, operations, artwork,
+                                     collector, index, batch)
+                if size:
+                    rewritten_count += 1
+                    rewritten_size += size
+            _rename_files(batch, 'ops', index)
+        print(f'[ops] {rewritten_count} files rewritten '
+              f'({rewritten_size} bytes)')
+
+        # Reports are written after directories are renamed, with the
+        # new paths
+        renamed = {}
+        if 'rename' in operations:
+            batch = RenameBatch()
+            for path in dir_paths:
+                batch.add(path, normalize_string(os.path.basename(path)))
+            for rename in _rename_directories(batch, 'rename_dirs'):
+                renamed[rename.path] = rename.name
+                renamed[os.path.abspath(rename.path)] = rename.name
+
+        if 'genres' in operations and renamed:
+            with GenreCollector(memory_limit) as renamed_collector:
+                for genre, path, tracks in collector.gen_items():
+                    renamed_collector.add(
+                        genre, _get_renamed_path(path, renamed), tracks)
+                _write_genres_file(renamed_collector, output_format)
+        elif 'genres' in operations:
+            _write_genres_file(collector, output_format)
+
+    if 'uncovered' in operations:
+        for path in uncovered_dirs:
+            print(f'Uncovered: {_get_renamed_path(path, renamed)}')
+
+
+def _get_renamed_path(path, renamed):
+    # renamed maps original paths of renamed directories to new names
+    parent, name = os.path.split(path)
+    if not name:
+        return path
+    if parent and parent != path:
+        parent = _get_renamed_path(parent, renamed)
+    return os.path.join(parent, renamed.get(path, name))
+
+
+@keyboard_interrupt
+def watch_library(directory, index=None, walk_filter=None, optimizer=None,
+                  delay=5.0, polling=False):
+    from module.watch import watch
+
+    # The cover cache and the normalizer cache stay warm between events
+    artwork_cache = ArtworkCache(optimizer=optimizer)
+    abs_dir_path = os.path.abspath(directory)
+    print(f'Watching {abs_dir_path}')
+
+    def process(path):
+        print(f'Processing {path}')
+        operations = ('tags', 'artwork', 'rename')
+        if path == directory:
+            operations = ('tags', 'artwork')
+        _run_operations(path, operations, index, walk_filter, 'text',
+                        64 * 1024 * 1024, artwork_cache)
+        if index is not None:
+            index.commit()
+
+    watch(directory, process, walk_filter=walk_filter, delay=delay,
+          polling=polling)
+
+
+def _process_file(filename, operations, artwork, collector, index, batch):
+    modifies = 'tags' in operations or artwork is not None
+    try:
+        tag = get_tags(filename) if modifies else read_tags(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        print(f'[ops] Unable to load tags for {filename}')
+        return 0
+
+    session = WriteSession(filename, tag)
+    if 'tags' in operations:
+        _normalize_tag_values(session)
+    if artwork is not None:
+        session.set('artwork', artwork)
+    changed = session.changed
+    try:
+        size = session.commit()
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        print(f'[ops] Unable to save tags to {filename}')
+        return 0
+    if changed:
+        print(f'[!] file updated: {filename}')
+
+    if 'genres' in operations and tag.genre:
+        basedir = os.path.dirname(filename)
+        collector.add(tag.genre, os.path.abspath(basedir))
+
+    if index is not None:
+        index.update(filename, get_index_values(tag, artwork))
+    if 'tags' in operations:
+        # Files are renamed after their directory is processed,
+        # directories after the whole walk
+        batch.add(filename, normalize_string(os.path.basename(filename)))
+    return size
+
+
+def _parse_operations(value):
+    operations = [op.strip() for op in value.split(',') if op.strip()]
+    for op in operations:
+        if op not in OPERATIONS:
+            raise argparse.ArgumentTypeError(
+                f'unknown operation: {op} (choose from '
+                f'{", ".join(OPERATIONS)})')
+    if not operations:
+        raise argparse.ArgumentTypeError('no operations are specified')
+    return operations
+
+
+def _parse_shard(value):
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid shard: {value}')
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(
+            f'shard index is out of range: {value}')
+    return index, count
+
+
+def _parse_rate(value):
+    multipliers = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    multiplier = multipliers.get(value[-1:].upper())
+    try:
+        rate = float(value[:-1] if multiplier else value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid rate: {value}')
+    if rate <= 0:
+        raise argparse.ArgumentTypeError(f'rate must be positive: {value}')
+    return rate * (multiplier or 1)
+
+
+def _parse_time_window(value):
+    try:
+        return TimeWindow.parse(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _has_artwork_in_index(index, filename, artwork):
+    row = index.lookup(filename)
+    if row is None:
+        return False
+    return row['artwork_digest'] == artwork.digest
+
+
+@keyboard_interrupt
+@print_scanning
+def find_dupes(directory, jobs=1, processes=False, walk_filter=None,
+               with_hash=False):
+    from module.dupes import DupeIndex
+
+    dupe_index = DupeIndex()
+    function = functools.partial(_read_dupe_info, with_hash=with_hash)
+    results = run_tasks(function,
+                        gen_audio_files(directory, walk_filter=walk_filter),
+                        jobs=jobs, processes=processes)
+    for filename, track, size, key, digest in results:
+        if track is None:
+            print(f'[dupes] Unable to load tags for {filename}')
+            continue
+        dupe_index.add(track, size, key, digest)
+
+    group_count = 0
+    for key, files, size in dupe_index.gen_track_groups():
+        _print_dupes(' - '.join(key), files, size)
+        group_count += 1
+    for digest, files, size in dupe_index.gen_payload_groups():
+        _print_dupes(f'audio {digest}', files, size)
+        group_count += 1
+    if group_count:
+        reclaimable_size = dupe_index.get_reclaimable_size()
+        print(f'[dupes] {group_count} groups, about {reclaimable_size} '
+              f'bytes reclaimable')
+    else:
+        print('No duplicates found')
+
+
+def _read_dupe_info(filename, with_hash=False):
+    from module.dupes import get_track_key, hash_audio_payload
+
+    try:
+        track = read_track_info(filename)
+        size = os.path.getsize(filename)
+        digest = None
+        if with_hash:
+            with STATS.timer('hash'):
+                digest = hash_audio_payload(filename)
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        return filename, None, None, None, None
+    return filename, track, size, get_track_key(track), digest
+
+
+def _print_dupes(title, files, reclaimable_size):
+    print(f'{title}: {len(files)} files, {reclaimable_size} bytes '
+          f'reclaimable')
+    for filename, size in files:
+        print(f'    {filename} ({size} bytes)')
+
+
+@keyboard_interrupt
+@print_scanning
+def export_catalog(directory, catalog_filename, jobs=1, processes=False,
+                   walk_filter=None):
+    from module.catalog import Catalog
+
+    results = run_tasks(_read_catalog_row,
+                        gen_audio_files(directory, walk_filter=walk_filter),
+                        jobs=jobs, processes=processes)
+    with Catalog(catalog_filename) as catalog:
+        catalog.clear(directory)
+        for filename, row in results:
+            if row is None:
+                print(f'[export] Unable to load tags for {filename}')
+                continue
+            catalog.add(row)
+        catalog.flush()
+    catalog_path = os.path.abspath(catalog_filename)
+    print(f'[export] {catalog.count} files written to {catalog_path}')
+
+
+def _read_catalog_row(filename):
+    from module.catalog import get_catalog_row
+
+    try:
+        return filename, get_catalog_row(filename,
+                                         read_track_info(filename))
+    except (IOError, TagLoadError) as e:
+        STATS.add_error(e)
+        return filename, None
+
+
+def query_catalog(directory, catalog_filename, where):
+    import sqlite3
+
+    from module.catalog import Catalog
+
+    count = 0
+    with Catalog(catalog_filename, read_only=True) as catalog:
+        try:
+            for row in catalog.query(where, directory):
+                print(row['path'])
+                count += 1
+        except sqlite3.Error as e:
+            print(f'[query] Invalid query: {e}')
+            return
+    print(f'[query] {count} files found')
+
+
+def _get_normalized_name(path):
+    dirname, basename = os.path.split(path)
+    return os.path.join(dirname, normalize_string(basename))
+
+
+def _plan_tags(filename):
+    try:
+        tag = get_tags(filename)
+    except (IOError, TagLoadError):
+        return filename, None
+
+    entries = []
+    old_tags = {}
+    new_tags = {}
+    for key in ('artist', 'album', 'title'):
+        old_value = getattr(tag, key)
+        new_value = normalize_string(old_value)
+        if old_value != new_value:
+            old_tags[key] = old_value
+            new_tags[key] = new_value
+    if new_tags:
+        entries.append({
+            'op': OP_TAGS, 'path': filename,
+            'tags': new_tags, 'old_tags': old_tags,
+            'size': os.path.getsize(filename),
+        })
+    new_filename = _get_normalized_name(filename)
+    if filename != new_filename:
+        entries.append({
+            'op': OP_RENAME_FILE, 'path': filename, 'target': new_filename,
+        })
+    return filename, entries
+
+
+def _gen_tags_plan(directory, jobs, processes, walk_filter):
+    results = run_tasks(_plan_tags, gen_audio_files(directory,
+                                                    walk_filter=walk_filter),
+                        jobs=jobs, processes=processes)
+    for filename, entries in results:
+        if entries is None:
+            print(f'[plan] Unable to load tags for {filename}')
+            continue
+        yield from entries
+
+
+def _gen_dirs_plan(directory, walk_filter):
+    for path in gen_directories(directory, with_files=False,
+                                walk_filter=walk_filter):
+        new_path = _get_normalized_name(path)
+        if path != new_path:
+            yield {'op': OP_RENAME_DIR, 'path': path, 'target': new_path}
+
+
+def _plan_artworks(item, optimizer=None):
+    artwork_filename, audio_files = item
+    artwork = create_artwork(artwork_filename)
+    if optimizer is not None:
+        artwork = optimizer.optimize(artwork)
+    entries = []
+    for filename in audio_files:
         try:
             tag = get_tags(filename)
-        except IOError:
-            print(f'[collect_genres] error: get tag from {filename}')
+        except (IOError, TagLoadError):
+            print(f'[plan] Unable to load tags for {filename}')
             continue
+        if tag.artwork != artwork:
+            entries.append({
+                'op': OP_ARTWORK, 'path': filename,
+                'cover': artwork_filename,
+                'size': os.path.getsize(filename) + artwork.size,
+            })
+    return entries
 
-        genre = tag.genre
-        if genre:
-            if genre not in genres:
-                genres[genre] = []
-            basedir = os.path.dirname(filename)
-            genres[genre].append(os.path.abspath(basedir))
-
-    sorted_genres = OrderedDict(sorted(genres.items()))
-
-    with codecs.open(GENRE_OUT_FILENAME, 'w', 'utf-8') as fd:
-        for genre in sorted_genres:
-            fd.write(genre)
-            fd.write('\n')
-            for item in genres[genre]:
-                fd.write(item)
-                fd.write('\n')
-            fd.write('\n')
-    filepath = os.path.join(os.getcwd(), 'genres.txt')
-    print(f'[collect_genres] genre info written to {filepath}')
+
+def _gen_artworks_plan(directory, jobs, processes, walk_filter,
+                       optimizer=None):
+    items = ((record.artwork_files[0], record.audio_files)
+             for record in walk_directories(directory, walk_filter)
+             if record.artwork_files)
+    function = functools.partial(_plan_artworks, optimizer=optimizer)
+    results = run_tasks(function, items, jobs=jobs, processes=processes)
+    for entries in results:
+        yield from entries
 
 
 @keyboard_interrupt
 @print_scanning
-def attach_artworks(directory):
-    for item in gen_directories(directory, with_files=True):
-        dir_items = os.listdir(item)
-        for subitem in dir_items:
-            if is_artwork_file(subitem):
-                artwork_filename = os.path.join(item, subitem)
-                break
-        else:
+def write_plan(directory, plan_filename, entries):
+    with PlanWriter(plan_filename) as writer:
+        for entry in entries:
+            writer.write(make_paths_absolute(entry))
+    plan_path = os.path.abspath(plan_filename)
+    print(f'[plan] {writer.count} changes, about {writer.size} bytes '
+          f'to rewrite, plan written to {plan_path}')
+
+
+@keyboard_interrupt
+@print_scanning
+def apply_plan(directory, plan_filename, optimizer=None):
+    entries = list(read_plan(plan_filename, directory))
+    artwork_cache = ArtworkCache(optimizer=optimizer)
+    for _, file_edits, file_renames in gen_directory_groups(entries):
+        for filename, edits in file_edits:
+            try:
+                changed, stale_keys = _apply_edits(filename, edits,
+                                                   artwork_cache)
+            except (IOError, TagLoadError) as e:
+                STATS.add_error(e)
+                print(f'[apply_plan] Unable to update {filename}')
+                continue
+            if stale_keys:
+                keys = ', '.join(stale_keys)
+                print(f'[apply_plan] Tags changed since planning, skipped: '
+                      f'{filename} ({keys})')
+            if changed:
+                print(f'[!] file updated: {filename}')
+        batch = RenameBatch()
+        for entry in file_renames:
+            batch.add(entry['path'], os.path.basename(entry['target']))
+        _rename_files(batch, 'apply_plan')
+
+    batch = RenameBatch()
+    for entry in get_dir_renames(entries):
+        batch.add(entry['path'], os.path.basename(entry['target']))
+    _rename_directories(batch, 'apply_plan')
+
+
+def _apply_edits(filename, edits, artwork_cache):
+    # Tag edits are skipped if the file no longer has the planned old
+    # values, their keys are returned
+    session = WriteSession(filename, get_tags(filename))
+    stale_keys = []
+    for entry in edits:
+        if entry['op'] == OP_TAGS:
+            keys = [key for key, value in entry.get('old_tags', {}).items()
+                    if session.get(key) != value]
+            if keys:
+                stale_keys.extend(keys)
+                continue
+            for key, value in entry['tags'].items():
+                session.set(key, value)
+        elif entry['op'] == OP_ARTWORK:
+            session.set('artwork', artwork_cache.get(entry['cover']))
+    changed = session.changed
+    session.commit()
+    return changed, stale_keys
+
+
+def merge_parts(directory, filenames, checkpoint_filename=None,
+                output_format='text', memory_limit=64 * 1024 * 1024):
+    parts = ShardParts(filenames)
+    if parts.command == 'genres':
+        with GenreCollector(memory_limit) as collector:
+            abs_dir_path = os.path.abspath(directory)
+            for _, entry in parts.gen_entries(abs_dir_path):
+                collector.add(entry['genre'], entry['directory'],
+                              entry['tracks'])
+            _write_genres_file(collector, output_format)
+    elif parts.command == 'uncovered':
+        # Each top-level directory is walked by a single shard, so sorting
+        # by top-level directories in listing order restores walk order.
+        order = {name: position
+                 for position, name in enumerate(os.listdir(directory))}
+        uncovered_dirs = [entry['path'] for _, entry in
+                          parts.gen_entries(directory)]
+        uncovered_dirs.sort(key=lambda path: _get_top_dir_position(
+            directory, path, order))
+        _print_uncovered_dirs(uncovered_dirs)
+    elif checkpoint_filename:
+        _merge_checkpoints(directory, parts, checkpoint_filename)
+        print(f'[shard] changes of {parts.count} shards written to '
+              f'{os.path.abspath(checkpoint_filename)}')
+    else:
+        raise ShardError('the checkpoint file is not specified')
+
+
+def _get_top_dir_position(directory, path, order):
+    relpath = os.path.relpath(path, directory)
+    if relpath == os.curdir:
+        return -1
+    top_dir = relpath.split(os.sep, 1)[0]
+    return order.get(top_dir, len(order))
+
+
+def _merge_checkpoints(directory, parts, checkpoint_filename):
+    with Checkpoint(checkpoint_filename, parts.command,
+                    directory) as checkpoint:
+        # A rollback reverts renames of its own shard only
+        entries = []
+        for index, entry in parts.gen_entries(checkpoint.directory,
+                                              strict=False):
+            if entries and entries[-1][0] != index:
+                _write_shard_changes(checkpoint, entries)
+                entries = []
+            entries.append((index, entry))
+        _write_shard_changes(checkpoint, entries)
+        if parts.completed:
+            checkpoint.complete()
+
+
+def _write_shard_changes(checkpoint, entries):
+    rollback_positions = [position
+                          for position, (_, entry) in enumerate(entries)
+                          if entry['type'] == 'rollback']
+    start = rollback_positions[-1] if rollback_positions else -1
+    for position, (_, entry) in enumerate(entries):
+        if entry['type'] == 'rollback' or (
+                entry['type'] == 'rename' and position < start):
             continue
-        artwork = create_artwork(artwork_filename)
-        for subitem in dir_items:
-            if is_audio_file(subitem):
-                tag = get_tags(os.path.join(item, subitem))
-                tag.artwork = artwork
-                tag.save()
+        checkpoint.write(entry)
 
 
-def main():
+@print_scanning
+def print_index_stats(directory, index):
+    stats = index.get_stats(directory)
+    print(f'Index file: {os.path.abspath(index.filename)}')
+    print(f'Indexed files: {stats["files"]}')
+    print(f'Total size: {stats["total_size"]} bytes')
+    print(f'Files with artwork: {stats["with_artwork"]}')
+    print(f'Files with genre: {stats["with_genre"]}')
+
+
+def _create_parser():
     parser = argparse.ArgumentParser(prog='audiotool')
     parser.add_argument(dest='directory', help='Path to scanning')
     group = parser.add_mutually_exclusive_group(required=True)
@@ -165,19 +968,320 @@ def main():
                        help='normalize audio tags')
     group.add_argument('-u', dest='uncovered', action='store_true',
                        help='search folders without album artwork')
+    group.add_argument('-e', dest='extract', action='store_true',
+                       help='extract embedded artwork of folders without '
+                            'album artwork')
+    group.add_argument('--index-stats', dest='index_stats',
+                       action='store_true',
+                       help='print statistics of the scan index')
+    group.add_argument('--apply', dest='apply', metavar='PLAN',
+                       help='apply changes from a plan file')
+    group.add_argument('--dupes', dest='dupes', action='store_true',
+                       help='search duplicate tracks')
+    group.add_argument('--export', dest='export', metavar='CATALOG',
+                       help='export tags of all files to a SQLite catalog')
+    group.add_argument('--query', dest='query', metavar='WHERE',
+                       help='print files of the --catalog matching an SQL '
+                            'condition, e.g. "genre IS NULL"')
+    group.add_argument('--watch', dest='watch', action='store_true',
+                       help='watch the directory and fix tags, names and '
+                            'artwork of new or changed albums')
+    group.add_argument('--rollback', dest='rollback', action='store_true',
+                       help='revert renames recorded in the --checkpoint')
+    group.add_argument('--merge', dest='merge', metavar='PART',
+                       action='append',
+                       help='combine partial outputs of --shard runs, '
+                            'given once per part')
+    group.add_argument('--ops', dest='operations', metavar='LIST',
+                       type=_parse_operations,
+                       help='run several comma-separated operations in a '
+                            'single scan: ' + ','.join(OPERATIONS))
+    parser.add_argument('-j', '--jobs', dest='jobs', type=int, default=1,
+                        metavar='N', help='number of parallel workers')
+    parser.add_argument('--processes', dest='processes',
+                        action='store_true',
+                        help='use worker processes instead of threads')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='overlap directory listing, tag reads and '
+                             'writes of -t (for high-latency storage)')
+    parser.add_argument('--meta-concurrency', dest='meta_concurrency',
+                        type=int, default=16, metavar='N',
+                        help='concurrent listings and tag reads of --async')
+    parser.add_argument('--write-concurrency', dest='write_concurrency',
+                        type=int, default=4, metavar='N',
+                        help='concurrent tag writes of --async')
+    parser.add_argument('--shard', dest='shard', metavar='I/N',
+                        type=_parse_shard,
+                        help='process only the I-th of N disjoint parts of '
+                             'top-level directories (0 <= I < N)')
+    parser.add_argument('--index', dest='index', metavar='FILE',
+                        help='scan index used to skip unchanged files')
+    parser.add_argument('--invalidate-index', dest='invalidate_index',
+                        action='store_true',
+                        help='drop index entries of the scanned directory')
+    parser.add_argument('--plan', dest='plan', metavar='FILE',
+                        help='write planned changes of -a, -r or -t '
+                             'to a file instead of applying them')
+    parser.add_argument('--checkpoint', dest='checkpoint', metavar='FILE',
+                        help='record progress and changes of -a, -r or -t '
+                             'to a file')
+    parser.add_argument('--resume', dest='resume', action='store_true',
+                        help='continue the run recorded in the '
+                             '--checkpoint')
+    parser.add_argument('--catalog', dest='catalog', metavar='FILE',
+                        help='catalog file used by --query')
+    parser.add_argument('--dupes-hash', dest='dupes_hash',
+                        action='store_true',
+                        help='also compare audio data of --dupes, '
+                             'ignoring tags')
+    parser.add_argument('--watch-delay', dest='watch_delay', type=float,
+                        default=5.0, metavar='SECONDS',
+                        help='quiet time of a changed directory before '
+                             '--watch processes it')
+    parser.add_argument('--watch-polling', dest='watch_polling',
+                        action='store_true',
+                        help='poll the directory instead of using inotify')
+    parser.add_argument('--genres-format', dest='genres_format',
+                        choices=GENRE_FORMATS, default='text',
+                        help='output format of collected genres')
+    parser.add_argument('--memory-limit', dest='memory_limit', type=int,
+                        default=64, metavar='MB',
+                        help='memory used to collect genres before '
+                             'spilling them to disk')
+    parser.add_argument('--stats', dest='stats', action='store_true',
+                        help='print timings and counters of the run')
+    parser.add_argument('--stats-file', dest='stats_file', metavar='FILE',
+                        help='export timings and counters to a JSON file '
+                             'or to a Prometheus textfile (*.prom)')
+    parser.add_argument('--cover-max-size', dest='cover_max_size',
+                        type=int, metavar='PX',
+                        help='downscale attached covers to fit PX pixels')
+    parser.add_argument('--cover-quality', dest='cover_quality', type=int,
+                        metavar='Q', help='JPEG quality of attached covers')
+    parser.add_argument('--cover-png-to-jpeg', dest='cover_png_to_jpeg',
+                        action='store_true',
+                        help='attach PNG covers as JPEG')
+    parser.add_argument('--cover-strip', dest='cover_strip',
+                        action='store_true',
+                        help='strip metadata of attached covers')
+    parser.add_argument('--cover-cache', dest='cover_cache', metavar='DIR',
+                        help='cache of optimized covers '
+                             '(default: ~/.cache/audiotool/covers)')
+    parser.add_argument('--io-rate', dest='io_rate', metavar='BYTES',
+                        type=_parse_rate,
+                        help='limit read and written bytes per second, K, '
+                             'M and G suffixes are allowed')
+    parser.add_argument('--io-ops', dest='io_ops', metavar='N',
+                        type=_parse_rate,
+                        help='limit file reads and writes per second')
+    parser.add_argument('--io-idle', dest='io_idle', action='store_true',
+                        help='use the idle I/O priority class (Linux)')
+    parser.add_argument('--io-window', dest='io_windows', action='append',
+                        metavar='HH:MM-HH:MM', type=_parse_time_window,
+                        help='do I/O only within the time window, may be '
+                             'given several times')
+    parser.add_argument('--io-latency', dest='io_latency', type=float,
+                        metavar='MS',
+                        help='slow down while reads take longer than MS '
+                             'milliseconds')
+    parser.add_argument('--include', dest='include', action='append',
+                        metavar='GLOB',
+                        help='process only matching audio files')
+    parser.add_argument('--exclude', dest='exclude', action='append',
+                        metavar='GLOB',
+                        help='skip matching audio files and directories')
+    parser.add_argument('--max-depth', dest='max_depth', type=int,
+                        metavar='N', help='do not descend deeper than N')
+    return parser
+
+
+def main():
+    parser = _create_parser()
     args = parser.parse_args()
 
-    if args.tags:
-        fix_audio_tags(args.directory)
+    STATS.enabled = args.stats or bool(args.stats_file)
+    try:
+        _run_command(parser, args)
+    finally:
+        if args.stats:
+            print()
+            for line in STATS.gen_summary():
+                print(line)
+        if args.stats_file:
+            STATS.export(args.stats_file)
+    return 0
+
+
+def _run_command(parser, args):
+    _configure_scheduler(parser, args)
+    if args.shard and not (args.artwork or args.extract or args.genres or
+                           args.rename or args.tags or args.uncovered):
+        parser.error('--shard can be used only with -a, -e, -g, -r, -t '
+                     'or -u')
+    if args.shard and args.plan:
+        parser.error('--shard can not be used with --plan')
+    walk_filter = WalkFilter(include=args.include, exclude=args.exclude,
+                             max_depth=args.max_depth, shard=args.shard)
+    cover_options = CoverOptions(max_dimension=args.cover_max_size,
+                                 quality=args.cover_quality,
+                                 png_to_jpeg=args.cover_png_to_jpeg,
+                                 strip_metadata=args.cover_strip)
+    if not cover_options.is_enabled():
+        optimizer = None
+    elif is_optimizer_available():
+        optimizer = CoverOptimizer(
+            cover_options, args.cover_cache or get_default_cache_dir())
+    else:
+        parser.error('cover options require Pillow to be installed')
+    if args.plan:
+        if args.tags:
+            entries = _gen_tags_plan(args.directory, args.jobs,
+                                     args.processes, walk_filter)
+        elif args.rename:
+            entries = _gen_dirs_plan(args.directory, walk_filter)
+        elif args.artwork:
+            entries = _gen_artworks_plan(args.directory, args.jobs,
+                                         args.processes, walk_filter,
+                                         optimizer)
+        else:
+            parser.error('--plan can be used only with -a, -r or -t')
+        write_plan(args.directory, args.plan, entries)
+        return
+
+    if args.merge:
+        try:
+            merge_parts(args.directory, args.merge, args.checkpoint,
+                        output_format=args.genres_format,
+                        memory_limit=args.memory_limit * 1024 * 1024)
+        except (OSError, ShardError) as e:
+            parser.error(f'unable to merge: {e}')
+        return
+
+    if args.rollback:
+        if not args.checkpoint or not os.path.exists(args.checkpoint):
+            parser.error('the checkpoint file is not specified or not found')
+        try:
+            rollback_renames(args.directory, args.checkpoint)
+        except CheckpointError as e:
+            parser.error(str(e))
+        return
+
+    checkpoint = _open_checkpoint(parser, args)
+    try:
+        _run_checkpointed_command(parser, args, walk_filter, optimizer,
+                                  checkpoint)
+    finally:
+        if checkpoint is not None:
+            checkpoint.close()
+            if not checkpoint.completed:
+                print(f'[checkpoint] progress is saved to {args.checkpoint}, '
+                      f'continue with --resume')
+
+
+def _configure_scheduler(parser, args):
+    if args.io_idle and not set_idle_priority():
+        parser.error('idle I/O priority is not supported on this system')
+    latency_slo = args.io_latency / 1000 if args.io_latency else None
+    SCHEDULER.configure(bytes_rate=args.io_rate, ops_rate=args.io_ops,
+                        windows=args.io_windows or (),
+                        latency_slo=latency_slo,
+                        workers=args.jobs if args.processes else 1)
+
+
+def _open_checkpoint(parser, args):
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if not args.checkpoint:
+        return None
+    if args.tags and not args.use_async:
+        command = 'tags'
     elif args.rename:
-        rename_dirs(args.directory)
-    elif args.genres:
-        collect_genres(args.directory)
-    elif args.uncovered:
-        search_uncovered_dirs(args.directory)
+        command = 'rename'
     elif args.artwork:
-        attach_artworks(args.directory)
-    return 0
+        command = 'artwork'
+    else:
+        parser.error('--checkpoint can be used only with -a, -r or -t')
+    try:
+        return Checkpoint(args.checkpoint, command, args.directory,
+                          resume=args.resume, shard=args.shard)
+    except (OSError, CheckpointError) as e:
+        parser.error(f'unable to open the checkpoint: {e}')
+
+
+def _run_checkpointed_command(parser, args, walk_filter, optimizer,
+                              checkpoint):
+    if args.query:
+        if not args.catalog or not os.path.exists(args.catalog):
+            parser.error('the catalog file is not specified or not found')
+        query_catalog(args.directory, args.catalog, args.query)
+        return
+
+    if args.index:
+        index = ScanIndex(args.index)
+    elif args.index_stats or args.invalidate_index:
+        parser.error('the scan index file is not specified')
+    else:
+        index = None
+
+    try:
+        if args.invalidate_index:
+            count = index.invalidate(args.directory)
+            print(f'[index] {count} entries invalidated')
+
+        if args.tags and args.use_async:
+            fix_audio_tags_async(args.directory, index=index,
+                                 walk_filter=walk_filter,
+                                 meta_limit=args.meta_concurrency,
+                                 write_limit=args.write_concurrency)
+        elif args.tags:
+            fix_audio_tags(args.directory, jobs=args.jobs,
+                           processes=args.processes, index=index,
+                           walk_filter=walk_filter, checkpoint=checkpoint)
+        elif args.rename:
+            rename_dirs(args.directory, walk_filter=walk_filter,
+                        checkpoint=checkpoint)
+        elif args.genres:
+            collect_genres(args.directory, index=index,
+                           walk_filter=walk_filter,
+                           output_format=args.genres_format,
+                           memory_limit=args.memory_limit * 1024 * 1024,
+                           shard=args.shard)
+        elif args.uncovered:
+            search_uncovered_dirs(args.directory, walk_filter=walk_filter,
+                                  shard=args.shard)
+        elif args.extract:
+            extract_covers(args.directory, jobs=args.jobs,
+                           processes=args.processes, walk_filter=walk_filter)
+        elif args.artwork:
+            attach_artworks(args.directory, index=index,
+                            walk_filter=walk_filter, optimizer=optimizer,
+                            checkpoint=checkpoint)
+        elif args.index_stats:
+            print_index_stats(args.directory, index)
+        elif args.apply:
+            apply_plan(args.directory, args.apply, optimizer=optimizer)
+        elif args.export:
+            export_catalog(args.directory, args.export, jobs=args.jobs,
+                           processes=args.processes,
+                           walk_filter=walk_filter)
+        elif args.watch:
+            watch_library(args.directory, index=index,
+                          walk_filter=walk_filter, optimizer=optimizer,
+                          delay=args.watch_delay,
+                          polling=args.watch_polling)
+        elif args.dupes:
+            find_dupes(args.directory, jobs=args.jobs,
+                       processes=args.processes, walk_filter=walk_filter,
+                       with_hash=args.dupes_hash)
+        elif args.operations:
+            run_operations(args.directory, args.operations, index=index,
+                           walk_filter=walk_filter,
+                           output_format=args.genres_format,
+                           memory_limit=args.memory_limit * 1024 * 1024,
+                           optimizer=optimizer)
+    finally:
+        if index is not None:
+            index.close()
 
 
 if '__main__' == __name__:
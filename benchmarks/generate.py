@@ -0,0 +1,101 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+from module.tag import get_tags
+
+
+__all__ = ['generate_library', 'AUDIO_FORMATS', ]
+
+
+AUDIO_FORMATS = ('flac', 'ogg', 'mp3', 'm4a', )
+
+EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(EXAMPLES_DIR, 'cover.jpg')
+
+ARTIST_NAMES = (
+    'Bring Me The Horizon', 'Rise Of The Robots', 'Songs For The Deaf',
+    'Periscope Up', 'Control The Storm',
+)
+ALBUM_NAMES = (
+    'Live At The Apollo', 'Back In The Day', 'One And The Other',
+    'Build It Up - Tear It Down', 'The End Is Near',
+)
+TITLE_NAMES = (
+    'Fly Away From The Sun', 'Song Of The Year', 'Stand Up On It',
+    'Back In The (Remix)', 'The Rockafeller Skank',
+)
+
+
+def _create_templates(template_dir, album_index, formats, with_covers):
+    # Tags are written once per album, tracks are plain file copies
+    artist = ARTIST_NAMES[album_index % len(ARTIST_NAMES)]
+    album = ALBUM_NAMES[album_index % len(ALBUM_NAMES)]
+    title = TITLE_NAMES[album_index % len(TITLE_NAMES)]
+    templates = {}
+    for ext in formats:
+        example_name = '3' if with_covers else '1'
+        example_path = os.path.join(EXAMPLES_DIR, f'{example_name}.{ext}')
+        template_path = os.path.join(template_dir, f'template.{ext}')
+        shutil.copyfile(example_path, template_path)
+        tag = get_tags(template_path)
+        tag.artist = artist
+        tag.album = album
+        tag.title = title
+        tag.save()
+        templates[ext] = template_path
+    return artist, album, templates
+
+
+def generate_library(directory, file_count, formats=AUDIO_FORMATS,
+                     with_covers=False, tracks_per_album=10):
+    template_dir = tempfile.mkdtemp()
+    try:
+        created = album_index = 0
+        while created < file_count:
+            artist, album, templates = _create_templates(
+                template_dir, album_index, formats, with_covers)
+            album_dir = os.path.join(
+                directory, f'{artist} {album_index // 10}',
+                f'{album} {album_index}')
+            os.makedirs(album_dir, exist_ok=True)
+            if with_covers:
+                shutil.copyfile(COVER_EXAMPLE_PATH,
+                                os.path.join(album_dir, 'cover.jpg'))
+            for track in range(min(tracks_per_album, file_count - created)):
+                ext = formats[track % len(formats)]
+                title = TITLE_NAMES[track % len(TITLE_NAMES)]
+                track_path = os.path.join(
+                    album_dir, f'{track + 1:02d} - {title}.{ext}')
+                shutil.copyfile(templates[ext], track_path)
+                created += 1
+            album_index += 1
+    finally:
+        shutil.rmtree(template_dir)
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='generate')
+    parser.add_argument(dest='directory', help='Path to the new library')
+    parser.add_argument('-n', dest='files', type=int, default=1000,
+                        help='number of audio files')
+    parser.add_argument('--formats', dest='formats',
+                        default=','.join(AUDIO_FORMATS),
+                        help='comma separated list of audio formats')
+    parser.add_argument('--covers', dest='covers', action='store_true',
+                        help='embed artwork and add cover files')
+    args = parser.parse_args()
+
+    formats = tuple(args.formats.split(','))
+    count = generate_library(args.directory, args.files, formats, args.covers)
+    print(f'{count} files generated in {os.path.abspath(args.directory)}')
+    return 0
+
+
+if '__main__' == __name__:
+    sys.exit(main())
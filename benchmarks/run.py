@@ -0,0 +1,165 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import audiotool
+from benchmarks.generate import (
+    generate_library, AUDIO_FORMATS, COVER_EXAMPLE_PATH, EXAMPLES_DIR)
+from module.artwork import create_artwork
+from module.normalize import normalize_string
+from module.tag import get_tags, read_tags
+from module.track import read_track_info
+
+
+# Commands are run in this order, read-only ones go first
+COMMANDS = (
+    ('-u', audiotool.search_uncovered_dirs),
+    ('-g', audiotool.collect_genres),
+    ('-t', audiotool.fix_audio_tags),
+    ('-r', audiotool.rename_dirs),
+    ('-a', audiotool.attach_artworks),
+)
+
+DEFAULT_THRESHOLD = 0.1
+
+
+def _get_commit():
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, cwd=os.path.dirname(EXAMPLES_DIR))
+    except OSError:
+        return None
+    return output.stdout.strip() or None
+
+
+def _measure(function, *args, repeat=1):
+    start_time = time.perf_counter()
+    for _ in range(repeat):
+        function(*args)
+    return (time.perf_counter() - start_time) / repeat
+
+
+def _measure_many(function, items):
+    start_time = time.perf_counter()
+    for item in items:
+        function(item)
+    return (time.perf_counter() - start_time) / len(items)
+
+
+def bench_commands(library_dir, work_dir):
+    results = {}
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            for option, command in COMMANDS:
+                cwd = os.getcwd()
+                os.chdir(work_dir)
+                try:
+                    results[f'command {option}'] = _measure(
+                        command, library_dir)
+                finally:
+                    os.chdir(cwd)
+    return results
+
+
+def bench_functions(formats, repeat):
+    results = {}
+    for ext in formats:
+        filenames = [os.path.join(EXAMPLES_DIR, f'{name}.{ext}')
+                     for name in ('1', '2', '3')] * repeat
+        results[f'get_tags {ext}'] = _measure_many(get_tags, filenames)
+        results[f'read_tags {ext}'] = _measure_many(read_tags, filenames)
+        results[f'read_track_info {ext}'] = _measure_many(
+            read_track_info, filenames)
+
+    # Every string is unique so the result cache does not hide the work
+    strings = [f'Song Of The Year {index} - Live At The Apollo'
+               for index in range(repeat * 100)]
+    results['normalize_string'] = _measure_many(normalize_string, strings)
+    results['create_artwork'] = _measure(
+        create_artwork, COVER_EXAMPLE_PATH, repeat=repeat)
+    return results
+
+
+def compare_results(old_results, new_results, threshold=DEFAULT_THRESHOLD):
+    regressions = []
+    for name in sorted(new_results['results']):
+        if name not in old_results['results']:
+            continue
+        old_time = old_results['results'][name]
+        new_time = new_results['results'][name]
+        ratio = new_time / old_time if old_time else 1.0
+        mark = ''
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            mark = ' REGRESSION'
+        print(f'{name:<24} {old_time:12.6f} {new_time:12.6f} '
+              f'{ratio:6.2f}x{mark}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(prog='benchmarks.run')
+    parser.add_argument('-n', dest='files', type=int, default=1000,
+                        help='number of audio files in synthetic library')
+    parser.add_argument('--formats', dest='formats',
+                        default=','.join(AUDIO_FORMATS),
+                        help='comma separated list of audio formats')
+    parser.add_argument('--covers', dest='covers', action='store_true',
+                        help='embed artwork and add cover files')
+    parser.add_argument('--repeat', dest='repeat', type=int, default=100,
+                        help='iterations of hot function benchmarks')
+    parser.add_argument('-o', dest='output', metavar='FILE',
+                        help='write results to a JSON file')
+    parser.add_argument('--compare', dest='compare', metavar='FILE',
+                        help='compare results with a previous JSON file')
+    parser.add_argument('--threshold', dest='threshold', type=float,
+                        default=DEFAULT_THRESHOLD,
+                        help='relative slowdown reported as regression')
+    args = parser.parse_args()
+
+    formats = tuple(args.formats.split(','))
+    work_dir = tempfile.mkdtemp()
+    try:
+        library_dir = os.path.join(work_dir, 'library')
+        generate_library(library_dir, args.files, formats, args.covers)
+        results = bench_commands(library_dir, work_dir)
+    finally:
+        shutil.rmtree(work_dir)
+    results.update(bench_functions(formats, args.repeat))
+
+    report = {
+        'meta': {
+            'commit': _get_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'files': args.files,
+            'formats': formats,
+            'covers': args.covers,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as fd:
+            json.dump(report, fd, indent=2)
+    else:
+        for name, elapsed in sorted(results.items()):
+            print(f'{name:<24} {elapsed:12.6f}')
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as fd:
+            old_report = json.load(fd)
+        if compare_results(old_report, report, args.threshold):
+            return 1
+    return 0
+
+
+if '__main__' == __name__:
+    sys.exit(main())
@@ -0,0 +1,93 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from module.paths import scan_directory, WalkFilter
+
+
+__all__ = ['run_pipeline', ]
+
+
+_QUEUE_SIZE = 1024
+
+
+class _Pipeline(object):
+    def __init__(self, gen_items, read_item, write_item, on_result,
+                 meta_limit, write_limit, walk_filter):
+        self.gen_items = gen_items
+        self.read_item = read_item
+        self.write_item = write_item
+        self.on_result = on_result
+        self.meta_limit = meta_limit
+        self.write_limit = write_limit
+        self.walk_filter = walk_filter or WalkFilter()
+        self.executor = None
+        self.queue = None
+        self.meta_semaphore = None
+        self.write_semaphore = None
+
+    async def run(self, directory):
+        self.queue = asyncio.Queue(_QUEUE_SIZE)
+        self.meta_semaphore = asyncio.Semaphore(self.meta_limit)
+        self.write_semaphore = asyncio.Semaphore(self.write_limit)
+        consumer_count = self.meta_limit + self.write_limit
+        with ThreadPoolExecutor(max_workers=consumer_count) as executor:
+            self.executor = executor
+            tasks = [asyncio.ensure_future(self._consume())
+                     for _ in range(consumer_count)]
+            tasks.append(asyncio.ensure_future(
+                self._produce(directory, consumer_count)))
+            try:
+                # A failed consumer must not leave the producer blocked on
+                # the full queue, so stop on the first error.
+                done, _ = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_EXCEPTION)
+                for task in done:
+                    task.result()
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def _call(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def _produce(self, directory, consumer_count):
+        await self._scan(directory, 0)
+        for _ in range(consumer_count):
+            await self.queue.put(None)
+
+    async def _scan(self, path, depth):
+        async with self.meta_semaphore:
+            record = await self._call(
+                scan_directory, path, depth, self.walk_filter)
+        if record is None:
+            return
+        for item in self.gen_items(record):
+            await self.queue.put(item)
+        if self.walk_filter.can_descend(depth):
+            await asyncio.gather(*(
+                self._scan(subdir, depth + 1)
+                for subdir in record.get_walkable_subdirs()))
+
+    async def _consume(self):
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            async with self.meta_semaphore:
+                result, needs_write = await self._call(self.read_item, item)
+            if needs_write:
+                async with self.write_semaphore:
+                    await self._call(self.write_item, result)
+            self.on_result(result)
+
+
+def run_pipeline(directory, gen_items, read_item, write_item, on_result,
+                 meta_limit=16, write_limit=4, walk_filter=None):
+    # gen_items(record) produces work items of a scanned directory,
+    # read_item(item) returns (result, needs_write) and write_item(result)
+    # is called for results which need to be written. on_result(result) is
+    # always called from the thread running the pipeline.
+    pipeline = _Pipeline(gen_items, read_item, write_item, on_result,
+                         meta_limit, write_limit, walk_filter)
+    asyncio.run(pipeline.run(directory))
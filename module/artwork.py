@@ -1,7 +1,9 @@
+from collections import OrderedDict
+import hashlib
 import os
 
 __all__ = [
-    'Artwork', 'create_artwork',
+    'Artwork', 'ArtworkCache', 'create_artwork',
     'is_artwork_supported', 'is_artwork_file',
 ]
 
@@ -10,9 +12,60 @@ class Artwork(object):
     def __init__(self, mime, data):
         self.mime = mime
         self.data = data
+        self._digest = None
 
     def __eq__(self, other):
-        return self.data == other.data and self.mime == other.mime
+        if not isinstance(other, Artwork):
+            return NotImplemented
+        return self.mime == other.mime and self.digest == other.digest
+
+    def __hash__(self):
+        return hash((self.mime, self.digest))
+
+    @property
+    def digest(self):
+        if self._digest is None:
+            self._digest = hashlib.sha1(self.data).hexdigest()
+        return self._digest
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+class ArtworkCache(object):
+    def __init__(self, max_size=64 * 1024 * 1024, optimizer=None):
+        self.max_size = max_size
+        self.optimizer = optimizer
+        self.size = 0
+        self._digests = {}
+        self._artworks = OrderedDict()
+
+    def get(self, filename):
+        stat_result = os.stat(filename)
+        key = (os.path.abspath(filename),
+               stat_result.st_mtime_ns, stat_result.st_size)
+        digest = self._digests.get(key)
+        if digest in self._artworks:
+            self._artworks.move_to_end(digest)
+            return self._artworks[digest]
+
+        artwork = create_artwork(filename)
+        if self.optimizer is not None:
+            artwork = self.optimizer.optimize(artwork)
+        self._digests[key] = artwork.digest
+        if artwork.digest in self._artworks:
+            self._artworks.move_to_end(artwork.digest)
+            return self._artworks[artwork.digest]
+        self._add(artwork)
+        return artwork
+
+    def _add(self, artwork):
+        self._artworks[artwork.digest] = artwork
+        self.size += artwork.size
+        while self.size > self.max_size and len(self._artworks) > 1:
+            _, evicted = self._artworks.popitem(last=False)
+            self.size -= evicted.size
 
 
 _MIME_MAP = {
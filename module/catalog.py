@@ -0,0 +1,103 @@
+import os
+import pathlib
+import sqlite3
+
+from module.index import get_path_range
+
+
+__all__ = ['Catalog', 'CATALOG_COLUMNS', 'get_catalog_row', ]
+
+
+CATALOG_COLUMNS = (
+    'path', 'directory', 'format', 'size', 'mtime_ns',
+    'artist', 'album', 'title', 'genre', 'artwork_mime', 'artwork_size',
+)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS tracks (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    artist TEXT,
+    album TEXT,
+    title TEXT,
+    genre TEXT,
+    artwork_mime TEXT,
+    artwork_size INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tracks_directory ON tracks (directory);
+CREATE INDEX IF NOT EXISTS tracks_format ON tracks (format);
+CREATE INDEX IF NOT EXISTS tracks_genre ON tracks (genre);
+CREATE INDEX IF NOT EXISTS tracks_album ON tracks (artist, album);
+CREATE INDEX IF NOT EXISTS tracks_artwork ON tracks (artwork_mime);
+'''
+
+_BATCH_SIZE = 5000
+
+
+def get_catalog_row(filename, tag):
+    stat_result = os.stat(filename)
+    path = os.path.abspath(filename)
+    extension = os.path.splitext(filename)[1]
+    return (
+        path, os.path.dirname(path), extension[1:].lower(),
+        stat_result.st_size, stat_result.st_mtime_ns,
+        tag.artist, tag.album, tag.title, tag.genre,
+        tag.artwork_mime, tag.artwork_size,
+    )
+
+
+class Catalog(object):
+    def __init__(self, filename, read_only=False):
+        self.filename = filename
+        if read_only:
+            uri = pathlib.Path(os.path.abspath(filename)).as_uri()
+            self.connection = sqlite3.connect(f'{uri}?mode=ro', uri=True)
+        else:
+            self.connection = sqlite3.connect(filename)
+            self.connection.executescript(_SCHEMA)
+        self.connection.row_factory = sqlite3.Row
+        self.pending_rows = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def clear(self, directory):
+        self.connection.execute(
+            'DELETE FROM tracks WHERE path >= ? AND path < ?',
+            get_path_range(directory))
+        self.connection.commit()
+
+    def add(self, row):
+        self.pending_rows.append(row)
+        if len(self.pending_rows) >= _BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        placeholders = ', '.join('?' * len(CATALOG_COLUMNS))
+        self.connection.executemany(
+            f'INSERT OR REPLACE INTO tracks VALUES ({placeholders})',
+            self.pending_rows)
+        self.connection.commit()
+        self.count += len(self.pending_rows)
+        self.pending_rows = []
+
+    def query(self, where, directory=None):
+        sql = 'SELECT * FROM tracks WHERE '
+        params = ()
+        if directory is not None:
+            sql += 'path >= ? AND path < ? AND '
+            params = get_path_range(directory)
+        sql += f'({where}) ORDER BY path'
+        return self.connection.execute(sql, params)
+
+    def close(self):
+        if self.pending_rows:
+            self.flush()
+        self.connection.close()
@@ -0,0 +1,150 @@
+import json
+import os
+import time
+
+
+__all__ = [
+    'Checkpoint', 'CheckpointError', 'gen_journal_entries', 'read_checkpoint',
+]
+
+
+_SYNC_INTERVAL = 5.0
+
+
+class CheckpointError(Exception):
+    pass
+
+
+class _CheckpointState(object):
+    def __init__(self):
+        self.command = None
+        self.directory = None
+        self.shard = None
+        self.done_dirs = set()
+        self.renames = []
+        self.completed = False
+
+
+def gen_journal_entries(filename):
+    with open(filename, encoding='utf-8') as fd:
+        for line in fd:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line is cut if the run crashed while writing it
+                return
+            yield entry
+
+
+def read_checkpoint(filename):
+    state = _CheckpointState()
+    for entry in gen_journal_entries(filename):
+        entry_type = entry['type']
+        if entry_type == 'start':
+            state.command = entry['command']
+            state.directory = entry['directory']
+            state.shard = _get_shard(entry)
+        elif entry_type == 'dir':
+            state.done_dirs.add(entry['path'])
+        elif entry_type == 'rename':
+            state.renames.append((entry['path'], entry['target']))
+        elif entry_type == 'rollback':
+            state.renames = []
+        elif entry_type == 'end':
+            state.completed = True
+    if state.command is None:
+        raise CheckpointError(f'{filename} is not a checkpoint file')
+    return state
+
+
+def _get_shard(entry):
+    shard = entry.get('shard')
+    return tuple(shard) if shard else None
+
+
+def _check_overwrite(filename):
+    # The journal of an unfinished run is the only log of its renames
+    if not os.path.exists(filename):
+        return
+    if not read_checkpoint(filename).completed:
+        raise CheckpointError(
+            f'{filename} belongs to an unfinished run, continue it with '
+            f'--resume or remove the file')
+
+
+class Checkpoint(object):
+    def __init__(self, filename, command, directory, resume=False,
+                 shard=None):
+        self.filename = filename
+        self.command = command
+        self.directory = os.path.abspath(directory)
+        self.shard = shard
+        self.completed = False
+        if resume:
+            state = read_checkpoint(filename)
+            if (state.command != command or
+                    state.directory != self.directory or
+                    state.shard != shard):
+                raise CheckpointError(
+                    f'{filename} belongs to "{state.command}" run '
+                    f'of {state.directory}')
+            self.done_dirs = state.done_dirs
+            self.fd = open(filename, 'a', encoding='utf-8')
+        else:
+            _check_overwrite(filename)
+            self.done_dirs = set()
+            self.fd = open(filename, 'w', encoding='utf-8')
+            entry = {'type': 'start', 'command': command,
+                     'directory': self.directory}
+            if shard is not None:
+                entry['shard'] = list(shard)
+            self.write(entry)
+            self.sync()
+        self.last_sync_time = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def is_done(self, path):
+        return os.path.abspath(path) in self.done_dirs
+
+    def mark_done(self, path):
+        path = os.path.abspath(path)
+        self.done_dirs.add(path)
+        self.write({'type': 'dir', 'path': path})
+        if time.monotonic() - self.last_sync_time >= _SYNC_INTERVAL:
+            self.sync()
+
+    def log_update(self, path):
+        self.write({'type': 'update', 'path': os.path.abspath(path)})
+
+    def log_rename(self, path, target):
+        # Renames are logged before they are applied, so a rollback knows
+        # about every rename which may have happened.
+        self.write({'type': 'rename', 'path': os.path.abspath(path),
+                    'target': os.path.abspath(target)})
+        self.sync()
+
+    def log_rollback(self):
+        self.write({'type': 'rollback'})
+        self.sync()
+
+    def complete(self):
+        self.completed = True
+        self.write({'type': 'end'})
+
+    def sync(self):
+        self.fd.flush()
+        os.fsync(self.fd.fileno())
+        self.last_sync_time = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self.fd.close()
+
+    def write(self, entry):
+        self.fd.write(json.dumps(entry, ensure_ascii=False))
+        self.fd.write('\n')
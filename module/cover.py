@@ -0,0 +1,144 @@
+import hashlib
+from io import BytesIO
+import os
+import tempfile
+
+from module.artwork import Artwork
+from module.stats import STATS
+
+
+__all__ = [
+    'CoverOptimizer', 'CoverOptions',
+    'get_default_cache_dir', 'is_optimizer_available',
+]
+
+
+_EXTENSION_MAP = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+}
+
+_FORMAT_MAP = {
+    'image/jpeg': 'JPEG',
+    'image/png': 'PNG',
+}
+
+_DEFAULT_QUALITY = 90
+
+
+class CoverOptions(object):
+    def __init__(self, max_dimension=None, quality=None,
+                 png_to_jpeg=False, strip_metadata=False):
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.png_to_jpeg = png_to_jpeg
+        self.strip_metadata = strip_metadata
+
+    def is_enabled(self):
+        return bool(self.max_dimension or self.quality or
+                    self.png_to_jpeg or self.strip_metadata)
+
+    def get_key(self):
+        return (f'{self.max_dimension}:{self.quality}:'
+                f'{int(self.png_to_jpeg)}:{int(self.strip_metadata)}')
+
+
+class CoverOptimizer(object):
+    def __init__(self, options, cache_dir=None):
+        if not is_optimizer_available():
+            raise RuntimeError('Pillow is required to optimize covers')
+        self.options = options
+        self.cache_dir = cache_dir
+
+    def optimize(self, artwork):
+        # Results are addressed by the source content and the options, so
+        # a cover is transformed once no matter where it is stored.
+        key = hashlib.sha1(
+            f'{artwork.mime}:{artwork.digest}:{self.options.get_key()}'
+            .encode('utf-8')).hexdigest()
+        cached = self._load(key)
+        if cached is not None:
+            STATS.incr('cover_cache_hits')
+            return cached
+
+        with STATS.timer('optimize'):
+            result = _transform(artwork, self.options)
+        STATS.incr('covers_optimized')
+        self._store(key, result)
+        return result
+
+    def _get_cache_path(self, key, mime):
+        return os.path.join(
+            self.cache_dir, key[:2], key + _EXTENSION_MAP[mime])
+
+    def _load(self, key):
+        if self.cache_dir is None:
+            return None
+        for mime in _EXTENSION_MAP:
+            try:
+                with open(self._get_cache_path(key, mime), 'rb') as fd:
+                    return Artwork(mime, fd.read())
+            except FileNotFoundError:
+                continue
+        return None
+
+    def _store(self, key, artwork):
+        if self.cache_dir is None:
+            return
+        path = self._get_cache_path(key, artwork.mime)
+        dirname = os.path.dirname(path)
+        os.makedirs(dirname, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=dirname)
+        with open(fd, 'wb') as temp_fd:
+            temp_fd.write(artwork.data)
+        os.replace(temp_path, path)
+
+
+def _transform(artwork, options):
+    from PIL import Image
+
+    image = Image.open(BytesIO(artwork.data))
+    image.load()
+    resized = False
+    if (options.max_dimension and
+            max(image.size) > options.max_dimension):
+        image.thumbnail((options.max_dimension, options.max_dimension),
+                        Image.LANCZOS)
+        resized = True
+
+    mime = artwork.mime
+    if options.png_to_jpeg and mime == 'image/png':
+        mime = 'image/jpeg'
+
+    save_options = {'optimize': True}
+    if not options.strip_metadata:
+        for key in ('exif', 'icc_profile'):
+            if image.info.get(key):
+                save_options[key] = image.info[key]
+    if mime == 'image/jpeg':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        save_options['quality'] = options.quality or _DEFAULT_QUALITY
+
+    output = BytesIO()
+    image.save(output, _FORMAT_MAP[mime], **save_options)
+    result = Artwork(mime, output.getvalue())
+    # Re-encoding alone is not worth a larger cover
+    if (not resized and not options.strip_metadata and
+            mime == artwork.mime and result.size >= artwork.size):
+        return artwork
+    return result
+
+
+def get_default_cache_dir():
+    return os.path.join(os.path.expanduser('~'), '.cache', 'audiotool',
+                        'covers')
+
+
+def is_optimizer_available():
+    # Pillow is optional and imported only when covers are optimized
+    try:
+        import PIL.Image  # noqa: F401
+    except ImportError:
+        return False
+    return True
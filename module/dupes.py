@@ -0,0 +1,185 @@
+from array import array
+import hashlib
+import mmap
+import os
+import struct
+
+from module.formats import detect_format
+from module.normalize import normalize_string
+from module.throttle import SCHEDULER
+from module.track import TrackBatch
+
+
+__all__ = ['DupeIndex', 'get_track_key', 'hash_audio_payload', ]
+
+
+_OGG_HEADER_SIZE = 27
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+class DupeIndex(object):
+    # Tracks of the whole library are kept in a columnar batch, groups
+    # hold row numbers only.
+    def __init__(self):
+        self.batch = TrackBatch()
+        self.sizes = array('q')
+        self.tracks = {}
+        self.payloads = {}
+
+    def add(self, track, size, key=None, digest=None):
+        if key is None and digest is None:
+            return
+        row = len(self.batch)
+        self.batch.append(track)
+        self.sizes.append(size)
+        if key is not None:
+            self.tracks.setdefault(key, array('I')).append(row)
+        if digest is not None:
+            self.payloads.setdefault(digest, array('I')).append(row)
+
+    def gen_track_groups(self):
+        return self._gen_groups(self.tracks)
+
+    def gen_payload_groups(self):
+        return self._gen_groups(self.payloads)
+
+    def get_reclaimable_size(self):
+        # Sizes of files which are not kept, a file in a track group and
+        # in a payload group is counted once
+        rows = set()
+        for entries in (self.tracks, self.payloads):
+            for group in entries.values():
+                if len(group) < 2:
+                    continue
+                kept_row = max(group, key=self.sizes.__getitem__)
+                rows.update(row for row in group if row != kept_row)
+        return sum(self.sizes[row] for row in rows)
+
+    def _gen_groups(self, entries):
+        # Yield (key, files, reclaimable size) of keys having several
+        # files. The largest file of a group is supposed to be kept.
+        for key, rows in sorted(entries.items()):
+            if len(rows) < 2:
+                continue
+            files = sorted((self.batch[row].path, self.sizes[row])
+                           for row in rows)
+            sizes = [size for _, size in files]
+            yield key, files, sum(sizes) - max(sizes)
+
+
+def get_track_key(tag):
+    values = (tag.artist, tag.album, tag.title)
+    if not tag.artist or not tag.title:
+        return None
+    return tuple(normalize_string(value.strip()).casefold()
+                 if value else '' for value in values)
+
+
+def hash_audio_payload(filename):
+    payload_reader = _PAYLOAD_READERS.get(detect_format(filename),
+                                          _gen_file_range)
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as fd:
+        if os.fstat(fd.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for start, end in payload_reader(data):
+                for pos in range(start, end, _HASH_CHUNK_SIZE):
+                    chunk_end = min(pos + _HASH_CHUNK_SIZE, end)
+                    # Pages of the mapping are read as they are hashed
+                    SCHEDULER.throttle(nbytes=chunk_end - pos)
+                    digest.update(data[pos:chunk_end])
+    return digest.hexdigest()
+
+
+def _get_id3v2_size(data, pos=0):
+    header = data[pos:pos + 10]
+    if len(header) != 10 or header[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in header[6:10]:
+        size = (size << 7) | (byte & 0x7f)
+    # A footer repeats the header at the end of the tag
+    if header[5] & 0x10:
+        size += 10
+    return size + 10
+
+
+def _get_id3v1_start(data):
+    end = len(data)
+    if end >= 128 and data[end - 128:end - 125] == b'TAG':
+        return end - 128
+    return end
+
+
+def _gen_mp3_ranges(data):
+    yield _get_id3v2_size(data), _get_id3v1_start(data)
+
+
+def _gen_flac_ranges(data):
+    pos = _get_id3v2_size(data)
+    if data[pos:pos + 4] != b'fLaC':
+        yield pos, len(data)
+        return
+    pos += 4
+    while pos + 4 <= len(data):
+        block_header = data[pos]
+        block_size = struct.unpack('>I', b'\x00' + data[pos + 1:pos + 4])[0]
+        pos += 4 + block_size
+        if block_header & 0x80:
+            break
+    yield min(pos, len(data)), _get_id3v1_start(data)
+
+
+def _gen_ogg_ranges(data):
+    # Header packets (the comment packet may span several pages) are
+    # skipped, page headers too, as they are renumbered when tags grow.
+    pos = 0
+    size = len(data)
+    header_packets = None
+    packet_count = 0
+    while pos + _OGG_HEADER_SIZE <= size:
+        if data[pos:pos + 4] != b'OggS':
+            yield pos, size
+            return
+        segment_count = data[pos + 26]
+        segments_start = pos + _OGG_HEADER_SIZE
+        body_start = segments_start + segment_count
+        lacing_values = data[segments_start:body_start]
+        body_end = min(body_start + sum(lacing_values), size)
+        if header_packets is None:
+            is_opus = data[body_start:body_start + 8] == b'OpusHead'
+            header_packets = 2 if is_opus else 3
+        if packet_count >= header_packets:
+            yield body_start, body_end
+        packet_count += sum(1 for value in lacing_values if value < 255)
+        pos = body_end
+
+
+def _gen_mp4_ranges(data):
+    pos = 0
+    size = len(data)
+    while pos + 8 <= size:
+        atom_size, name = struct.unpack('>I4s', data[pos:pos + 8])
+        header_size = 8
+        if atom_size == 1:
+            atom_size = struct.unpack('>Q', data[pos + 8:pos + 16])[0]
+            header_size = 16
+        elif atom_size == 0:
+            atom_size = size - pos
+        if atom_size < header_size:
+            return
+        if name == b'mdat':
+            yield pos + header_size, min(pos + atom_size, size)
+        pos += atom_size
+
+
+def _gen_file_range(data):
+    yield 0, len(data)
+
+
+_PAYLOAD_READERS = {
+    'flac': _gen_flac_ranges, 'vorbis': _gen_ogg_ranges,
+    'opus': _gen_ogg_ranges, 'mp3': _gen_mp3_ranges,
+    'mp4': _gen_mp4_ranges,
+}
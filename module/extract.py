@@ -0,0 +1,156 @@
+import hashlib
+import mmap
+import os
+
+from module.header import HeaderError, read_header
+from module.stats import STATS
+from module.tag import get_tags, TagLoadError
+from module.throttle import SCHEDULER
+
+__all__ = [
+    'EmbeddedPicture', 'extract_cover', 'get_cover_filename',
+    'has_cover_file',
+]
+
+
+_COVER_EXTENSIONS = {
+    'image/jpeg': '.jpg', 'image/jpg': '.jpg', 'image/png': '.png',
+}
+_COVER_NAME = 'cover'
+_IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', )
+
+
+class EmbeddedPicture(object):
+    # The first picture embedded into an audio file. If it is stored as is,
+    # data is a view of the memory mapped file, so the picture is neither
+    # read nor copied until it is hashed or written out. Pictures stored
+    # in another way (base64 in Ogg comments, unsynchronised ID3 frames)
+    # are decoded by the tag wrapper.
+    def __init__(self, filename):
+        self.filename = filename
+        self.mime = None
+        self.data = None
+        self._mmap = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def open(self):
+        try:
+            header = read_header(self.filename)
+        except HeaderError:
+            header = None
+        if header is not None and header['artwork_offset'] is not None:
+            if self._map(header['artwork_offset'], header['artwork_size']):
+                self.mime = header['artwork_mime']
+                return
+        if header is not None and header['artwork_mime'] is None:
+            return
+        artwork = get_tags(self.filename).artwork
+        if artwork is not None:
+            self.mime = artwork.mime
+            self.data = memoryview(artwork.data)
+
+    def close(self):
+        if self.data is not None:
+            self.data.release()
+            self.data = None
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def get_digest(self):
+        with STATS.timer('hash'):
+            return hashlib.sha1(self.data).hexdigest()
+
+    def _map(self, offset, size):
+        with open(self.filename, 'rb') as fd:
+            file_size = os.fstat(fd.fileno()).st_size
+            if not size or offset + size > file_size:
+                return False
+            self._mmap = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self.data = memoryview(self._mmap)[offset:offset + size]
+        STATS.incr('pictures_mapped')
+        return True
+
+
+def get_cover_filename(directory, mime):
+    extension = _COVER_EXTENSIONS.get(mime)
+    if extension is None:
+        return None
+    return os.path.join(directory, _COVER_NAME + extension)
+
+
+def has_cover_file(directory):
+    # Any image counts, whatever case its extension is in and whichever
+    # globs select audio files
+    with os.scandir(directory) as entries:
+        return any(os.path.splitext(entry.name)[1].lower() in
+                   _IMAGE_EXTENSIONS for entry in entries)
+
+
+def extract_cover(directory, audio_files):
+    # Write the picture embedded into most files of the album, the first
+    # one on a tie. Return the cover filename and the number of distinct
+    # pictures, the filename is None if nothing is written.
+    counts = {}
+    first_files = {}
+    for filename in audio_files:
+        try:
+            with EmbeddedPicture(filename) as picture:
+                if picture.data is None or \
+                        picture.mime not in _COVER_EXTENSIONS:
+                    continue
+                key = (picture.mime, picture.get_digest())
+        except (IOError, TagLoadError) as e:
+            STATS.add_error(e)
+            continue
+        counts[key] = counts.get(key, 0) + 1
+        first_files.setdefault(key, filename)
+    if not counts:
+        return None, 0
+
+    key = max(counts, key=counts.get)
+    cover_filename = get_cover_filename(directory, key[0])
+    with EmbeddedPicture(first_files[key]) as picture:
+        _write_cover(cover_filename, picture.data)
+    return cover_filename, len(counts)
+
+
+def _write_cover(filename, data):
+    # The cover is written under a temporary name first, so an interrupted
+    # run does not leave a truncated image which would mark the directory
+    # as covered. It is published with a hard link, which fails instead
+    # of replacing an existing file (also one differing in case only).
+    temp_filename = os.path.join(os.path.dirname(filename),
+                                 f'.{os.path.basename(filename)}.extract')
+    SCHEDULER.throttle(ops=1, nbytes=len(data))
+    with STATS.timer('write'):
+        try:
+            with open(temp_filename, 'wb') as fd:
+                fd.write(data)
+            try:
+                os.link(temp_filename, filename)
+            except FileExistsError:
+                raise
+            except OSError:
+                # File systems without hard links
+                _write_new_file(filename, data)
+        finally:
+            if os.path.lexists(temp_filename):
+                os.remove(temp_filename)
+
+
+def _write_new_file(filename, data):
+    with open(filename, 'xb') as fd:
+        try:
+            fd.write(data)
+        except OSError:
+            fd.close()
+            os.remove(filename)
+            raise
@@ -0,0 +1,142 @@
+import functools
+import os
+
+from module.throttle import SCHEDULER
+
+
+__all__ = [
+    'AudioFormat', 'detect_format', 'get_audio_extensions',
+    'is_audio_extension', 'register_format', 'unregister_format',
+]
+
+
+# Enough for an Ogg page header with the beginning of its first packet
+_SNIFF_SIZE = 64
+_CACHE_SIZE = 4096
+
+
+class AudioFormat(object):
+    def __init__(self, name, extensions, sniff):
+        # sniff(head, has_id3) tells whether the beginning of a file (after
+        # an ID3v2 tag if there is one) belongs to the format
+        self.name = name
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.sniff = sniff
+
+    def __repr__(self):
+        return f'AudioFormat({self.name!r})'
+
+
+_FORMATS = {}
+_EXTENSIONS = {}
+
+
+def register_format(name, extensions, sniff):
+    audio_format = AudioFormat(name, extensions, sniff)
+    _FORMATS[name] = audio_format
+    for extension in audio_format.extensions:
+        _EXTENSIONS.setdefault(extension, []).append(audio_format)
+    _detect_format.cache_clear()
+    return audio_format
+
+
+def unregister_format(name):
+    audio_format = _FORMATS.pop(name)
+    for extension in audio_format.extensions:
+        _EXTENSIONS[extension].remove(audio_format)
+        if not _EXTENSIONS[extension]:
+            del _EXTENSIONS[extension]
+    _detect_format.cache_clear()
+
+
+def get_audio_extensions():
+    return tuple(_EXTENSIONS)
+
+
+def is_audio_extension(filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return extension in _EXTENSIONS
+
+
+def detect_format(filename):
+    # Return the name of the format of a file, or None if it is unknown.
+    # The content decides, the extension only sets the order of sniffing.
+    stat_result = os.stat(filename)
+    return _detect_format(filename, stat_result.st_size,
+                          stat_result.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=_CACHE_SIZE)
+def _detect_format(filename, size, mtime_ns):
+    # The sniff reads the same few bytes of every file, so its latency
+    # is what the I/O scheduler adapts to
+    with SCHEDULER.read_timer(), open(filename, 'rb') as fd:
+        head = fd.read(_SNIFF_SIZE)
+        has_id3 = _get_id3v2_size(head) > 0
+        if has_id3:
+            fd.seek(_get_id3v2_size(head))
+            head = fd.read(_SNIFF_SIZE)
+
+    extension = os.path.splitext(filename)[1].lower()
+    candidates = _EXTENSIONS.get(extension, [])
+    # Formats of the extension go first, a misnamed file is sniffed
+    # against the others
+    for audio_format in candidates:
+        if audio_format.sniff(head, has_id3):
+            return audio_format.name
+    # A file matching no format is not handed to mutagen by its extension
+    for audio_format in _FORMATS.values():
+        if audio_format not in candidates and \
+                audio_format.sniff(head, has_id3):
+            return audio_format.name
+    return None
+
+
+def _get_id3v2_size(head):
+    if len(head) < 10 or head[:3] != b'ID3':
+        return 0
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7f)
+    # A footer repeats the header at the end of the tag
+    if head[5] & 0x10:
+        size += 10
+    return size + 10
+
+
+def _get_ogg_packet(head):
+    if head[:4] != b'OggS' or len(head) < 27:
+        return b''
+    return head[27 + head[26]:]
+
+
+def _sniff_flac(head, has_id3):
+    return head[:4] == b'fLaC'
+
+
+def _sniff_ogg_vorbis(head, has_id3):
+    return _get_ogg_packet(head)[:7] == b'\x01vorbis'
+
+
+def _sniff_ogg_opus(head, has_id3):
+    return _get_ogg_packet(head)[:8] == b'OpusHead'
+
+
+def _sniff_mp3(head, has_id3):
+    # An MPEG audio frame sync, layer bits of ADTS AAC frames are zero
+    if len(head) >= 2 and head[0] == 0xff and head[1] & 0xe0 == 0xe0 and \
+            head[1] & 0x06:
+        return True
+    return has_id3
+
+
+def _sniff_mp4(head, has_id3):
+    return head[4:8] == b'ftyp'
+
+
+# MP3 goes last, as any file having an ID3 tag is sniffed as MP3
+register_format('flac', ('.flac', ), _sniff_flac)
+register_format('vorbis', ('.ogg', '.oga', ), _sniff_ogg_vorbis)
+register_format('opus', ('.opus', '.ogg', '.oga', ), _sniff_ogg_opus)
+register_format('mp4', ('.m4a', '.mp4', '.m4b', ), _sniff_mp4)
+register_format('mp3', ('.mp3', ), _sniff_mp3)
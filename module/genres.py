@@ -0,0 +1,124 @@
+import csv
+import heapq
+from itertools import groupby
+import json
+import os
+import sys
+import tempfile
+
+
+__all__ = ['GenreCollector', 'write_genres', 'GENRE_FORMATS', ]
+
+
+GENRE_FORMATS = ('text', 'json', 'csv', )
+
+# Approximate overhead of a dict item holding a (genre, directory) key
+_ENTRY_OVERHEAD = 200
+
+
+class GenreCollector(object):
+    def __init__(self, memory_limit=64 * 1024 * 1024):
+        self.memory_limit = memory_limit
+        self.size = 0
+        self.entries = {}
+        self.run_filenames = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, genre, directory, tracks=1):
+        key = (genre, directory)
+        if key in self.entries:
+            self.entries[key] += tracks
+            return
+        self.entries[key] = tracks
+        self.size += (sys.getsizeof(genre) + sys.getsizeof(directory) +
+                      _ENTRY_OVERHEAD)
+        if self.size > self.memory_limit:
+            self._spill()
+
+    def gen_items(self):
+        # Yield (genre, directory, tracks) sorted by genre and directory.
+        sources = [_read_run(filename) for filename in self.run_filenames]
+        sources.append(
+            (genre, directory, tracks)
+            for (genre, directory), tracks in sorted(self.entries.items()))
+        merged = heapq.merge(*sources)
+        for key, items in groupby(merged, key=lambda item: item[:2]):
+            genre, directory = key
+            yield genre, directory, sum(item[2] for item in items)
+
+    def gen_genres(self):
+        # Yield (genre, items) where items are (directory, tracks) pairs.
+        for genre, items in groupby(self.gen_items(), key=lambda x: x[0]):
+            yield genre, ((directory, tracks)
+                          for _, directory, tracks in items)
+
+    def close(self):
+        for filename in self.run_filenames:
+            os.remove(filename)
+        self.run_filenames = []
+
+    def _spill(self):
+        fd, filename = tempfile.mkstemp(prefix='genres-', suffix='.jsonl')
+        self.run_filenames.append(filename)
+        with open(fd, 'w', encoding='utf-8') as run_fd:
+            for (genre, directory), tracks in sorted(self.entries.items()):
+                run_fd.write(json.dumps([genre, directory, tracks]))
+                run_fd.write('\n')
+        self.entries = {}
+        self.size = 0
+
+
+def _read_run(filename):
+    with open(filename, encoding='utf-8') as fd:
+        for line in fd:
+            yield tuple(json.loads(line))
+
+
+def _write_text(fd, collector):
+    for genre, items in collector.gen_genres():
+        fd.write(genre)
+        fd.write('\n')
+        for directory, _ in items:
+            fd.write(directory)
+            fd.write('\n')
+        fd.write('\n')
+
+
+def _write_json(fd, collector):
+    fd.write('[')
+    for index, (genre, items) in enumerate(collector.gen_genres()):
+        if index:
+            fd.write(',')
+        fd.write('\n  {"genre": %s, "directories": [' % json.dumps(genre))
+        directory_count = track_count = 0
+        for directory, tracks in items:
+            if directory_count:
+                fd.write(',')
+            fd.write('\n    {"path": %s, "tracks": %d}' % (
+                json.dumps(directory), tracks))
+            directory_count += 1
+            track_count += tracks
+        fd.write('\n  ], "directory_count": %d, "tracks": %d}' % (
+            directory_count, track_count))
+    fd.write('\n]\n')
+
+
+def _write_csv(fd, collector):
+    writer = csv.writer(fd)
+    writer.writerow(('genre', 'directory', 'tracks'))
+    for item in collector.gen_items():
+        writer.writerow(item)
+
+
+_GENRE_WRITERS = {
+    'text': _write_text, 'json': _write_json, 'csv': _write_csv,
+}
+
+
+def write_genres(fd, collector, output_format='text'):
+    _GENRE_WRITERS[output_format](fd, collector)
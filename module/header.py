@@ -0,0 +1,396 @@
+from base64 import b64decode
+import os
+import struct
+
+from module.formats import detect_format
+
+__all__ = ['HeaderError', 'read_header', 'HEADER_TAG_KEYS', ]
+
+
+HEADER_TAG_KEYS = ('artist', 'album', 'title', 'genre', )
+
+
+class HeaderError(Exception):
+    pass
+
+
+def _create_header():
+    header = {key: None for key in HEADER_TAG_KEYS}
+    header['artwork_mime'] = None
+    header['artwork_size'] = 0
+    # Position of the picture data in the file if it is stored as is
+    header['artwork_offset'] = None
+    return header
+
+
+def _read_exactly(fd, size):
+    data = fd.read(size)
+    if len(data) != size:
+        raise HeaderError('Unexpected end of file')
+    return data
+
+
+def _skip_id3v2(fd):
+    header = fd.read(10)
+    if header[:3] == b'ID3' and len(header) == 10:
+        fd.seek(_get_syncsafe_int(header[6:10]), os.SEEK_CUR)
+    else:
+        fd.seek(-len(header), os.SEEK_CUR)
+
+
+def _get_syncsafe_int(data):
+    value = 0
+    for byte in data:
+        value = (value << 7) | (byte & 0x7f)
+    return value
+
+
+def _parse_picture_header(data):
+    # FLAC PICTURE block: type, mime, description, 4 image properties,
+    # data length and the image data itself.
+    try:
+        mime_length = struct.unpack('>I', data[4:8])[0]
+        mime = data[8:8 + mime_length].decode('utf-8')
+        pos = 8 + mime_length
+        desc_length = struct.unpack('>I', data[pos:pos + 4])[0]
+        pos += 4 + desc_length + 16
+        data_length = struct.unpack('>I', data[pos:pos + 4])[0]
+    except (struct.error, UnicodeDecodeError):
+        raise HeaderError('Invalid picture block')
+    return mime, data_length, pos + 4
+
+
+def _read_vorbis_comments(reader, header):
+    # reader is a callable with the read(size) semantics
+    vendor_length = struct.unpack('<I', reader(4))[0]
+    reader(vendor_length)
+    count = struct.unpack('<I', reader(4))[0]
+    for _ in range(count):
+        length = struct.unpack('<I', reader(4))[0]
+        prefix = reader(min(length, 64))
+        key, separator, _ = prefix.partition(b'=')
+        if not separator:
+            raise HeaderError('Invalid comment')
+        key = key.decode('ascii', 'replace').lower()
+        if key == 'metadata_block_picture':
+            value = prefix[len(key) + 1:]
+            _read_comment_picture(reader, header, value, length - len(prefix))
+        elif key in HEADER_TAG_KEYS:
+            value = prefix + reader(length - len(prefix))
+            if header[key] is None:
+                header[key] = value[len(key) + 1:].decode('utf-8', 'replace')
+        else:
+            reader(length - len(prefix), skip=True)
+
+
+def _read_comment_picture(reader, header, value, remaining):
+    if header['artwork_mime'] is not None:
+        reader(remaining, skip=True)
+        return
+    # Decode only the beginning of base64 encoded picture block
+    prefix_length = min(remaining, 1024 - len(value))
+    value += reader(prefix_length)
+    remaining -= prefix_length
+    decoded = b64decode(value[:len(value) // 4 * 4])
+    header['artwork_mime'], header['artwork_size'], _ = (
+        _parse_picture_header(decoded))
+    reader(remaining, skip=True)
+
+
+def _create_file_reader(fd):
+    def reader(size, skip=False):
+        if skip:
+            fd.seek(size, os.SEEK_CUR)
+            return b''
+        return _read_exactly(fd, size)
+
+    return reader
+
+
+def _read_flac(fd):
+    header = _create_header()
+    _skip_id3v2(fd)
+    if fd.read(4) != b'fLaC':
+        raise HeaderError('Not a FLAC file')
+    reader = _create_file_reader(fd)
+    is_last = False
+    while not is_last:
+        block_header = _read_exactly(fd, 4)
+        is_last = bool(block_header[0] & 0x80)
+        block_type = block_header[0] & 0x7f
+        block_size = struct.unpack('>I', b'\0' + block_header[1:])[0]
+        block_end = fd.tell() + block_size
+        if block_type == 4:
+            _read_vorbis_comments(reader, header)
+        elif block_type == 6 and header['artwork_mime'] is None:
+            data = fd.read(min(block_size, 1024))
+            header['artwork_mime'], header['artwork_size'], data_start = (
+                _parse_picture_header(data))
+            header['artwork_offset'] = block_end - block_size + data_start
+        fd.seek(block_end)
+    return header
+
+
+class _OggPacketReader(object):
+    def __init__(self, fd):
+        self.fd = fd
+        self.serial = None
+        self.remaining = 0
+
+    def skip_page(self):
+        self._read_page_header()
+        self.fd.seek(self.remaining, os.SEEK_CUR)
+        self.remaining = 0
+
+    def __call__(self, size, skip=False):
+        chunks = []
+        while size > 0:
+            if not self.remaining:
+                self._read_page_header()
+            chunk_size = min(size, self.remaining)
+            if skip:
+                self.fd.seek(chunk_size, os.SEEK_CUR)
+            else:
+                chunks.append(_read_exactly(self.fd, chunk_size))
+            self.remaining -= chunk_size
+            size -= chunk_size
+        return b''.join(chunks)
+
+    def _read_page_header(self):
+        while True:
+            page_header = _read_exactly(self.fd, 27)
+            if page_header[:4] != b'OggS':
+                raise HeaderError('Invalid Ogg page')
+            serial = page_header[14:18]
+            lacing = _read_exactly(self.fd, page_header[26])
+            if self.serial is None:
+                self.serial = serial
+            if serial == self.serial:
+                self.remaining = sum(lacing)
+                return
+            self.fd.seek(sum(lacing), os.SEEK_CUR)
+
+
+def _read_ogg_vorbis(fd):
+    header = _create_header()
+    reader = _OggPacketReader(fd)
+    # The first page holds only the identification header
+    reader.skip_page()
+    if reader(7) != b'\x03vorbis':
+        raise HeaderError('Invalid Vorbis comment header')
+    _read_vorbis_comments(reader, header)
+    return header
+
+
+def _read_ogg_opus(fd):
+    header = _create_header()
+    reader = _OggPacketReader(fd)
+    reader.skip_page()
+    if reader(8) != b'OpusTags':
+        raise HeaderError('Invalid Opus comment header')
+    _read_vorbis_comments(reader, header)
+    return header
+
+
+_ID3_TEXT_FRAMES = {
+    b'TPE1': 'artist', b'TALB': 'album',
+    b'TIT2': 'title', b'TCON': 'genre',
+}
+_ID3_ENCODINGS = ('latin1', 'utf-16', 'utf-16-be', 'utf-8', )
+_ID3_PICTURE_MIMES = {'PNG': 'image/png', 'JPG': 'image/jpeg', }
+
+
+def _read_mp3(fd):
+    header = _create_header()
+    id3_header = fd.read(10)
+    if id3_header[:3] != b'ID3' or len(id3_header) != 10:
+        raise HeaderError('No ID3v2 tag')
+    version = id3_header[3]
+    flags = id3_header[5]
+    # Unsynchronised tags and extended headers are left to mutagen
+    if version not in (3, 4) or flags & 0xc0:
+        raise HeaderError('Unsupported ID3v2 tag')
+    tag_end = 10 + _get_syncsafe_int(id3_header[6:10])
+
+    while fd.tell() + 10 <= tag_end:
+        frame_header = fd.read(10)
+        frame_id = frame_header[:4]
+        if frame_id == b'\0\0\0\0':
+            break
+        if version == 4:
+            frame_size = _get_syncsafe_int(frame_header[4:8])
+            unsupported_flags = 0x4f
+        else:
+            frame_size = struct.unpack('>I', frame_header[4:8])[0]
+            unsupported_flags = 0xe0
+        if frame_header[9] & unsupported_flags:
+            raise HeaderError('Unsupported ID3v2 frame')
+        frame_end = fd.tell() + frame_size
+        if frame_id in _ID3_TEXT_FRAMES:
+            key = _ID3_TEXT_FRAMES[frame_id]
+            header[key] = _parse_id3_text(frame_id, fd.read(frame_size))
+        elif frame_id == b'APIC':
+            frame_start = fd.tell()
+            _parse_id3_picture(header, fd.read(min(frame_size, 1024)),
+                               frame_size, frame_start)
+        fd.seek(frame_end)
+
+    # mutagen fills frames missing in ID3v2 tag from ID3v1 one
+    fd.seek(-128, os.SEEK_END)
+    id3v1_data = fd.read(128)
+    if id3v1_data[:3] == b'TAG':
+        _merge_id3v1(header, id3v1_data)
+    return header
+
+
+def _parse_id3_text(frame_id, data):
+    try:
+        encoding = _ID3_ENCODINGS[data[0]]
+        values = data[1:].decode(encoding).split('\0')
+    except (IndexError, UnicodeDecodeError):
+        raise HeaderError('Invalid text frame')
+    if values and not values[-1]:
+        values.pop()
+    return _get_first_text(frame_id, values)
+
+
+def _get_first_text(frame_id, values):
+    if frame_id == b'TCON':
+        from mutagen.id3 import TCON
+        values = TCON(encoding=3, text=values).genres
+    return values[0] if values else None
+
+
+def _merge_id3v1(header, data):
+    from mutagen.id3 import ParseID3v1
+    frames = ParseID3v1(data) or {}
+    for frame_id, key in _ID3_TEXT_FRAMES.items():
+        frame = frames.get(frame_id.decode('ascii'))
+        if frame is not None and header[key] is None:
+            header[key] = _get_first_text(frame_id, frame.text)
+
+
+def _parse_id3_picture(header, data, frame_size, frame_start):
+    # APIC frame: text encoding, mime, picture type, description, data
+    try:
+        encoding = _ID3_ENCODINGS[data[0]]
+        mime_end = data.index(b'\0', 1)
+        mime = data[1:mime_end].decode('latin1')
+        desc_start = mime_end + 2
+        if encoding in ('utf-16', 'utf-16-be'):
+            desc_end = desc_start
+            while data[desc_end:desc_end + 2] != b'\0\0':
+                if desc_end >= len(data):
+                    raise ValueError
+                desc_end += 2
+            data_start = desc_end + 2
+        else:
+            desc_end = data.index(b'\0', desc_start)
+            data_start = desc_end + 1
+        desc = data[desc_start:desc_end].decode(encoding)
+    except (IndexError, ValueError):
+        raise HeaderError('Unsupported picture frame')
+    # The wrapper reads only the picture with an empty description
+    if desc:
+        return
+    header['artwork_mime'] = _ID3_PICTURE_MIMES.get(mime, mime)
+    header['artwork_size'] = frame_size - data_start
+    header['artwork_offset'] = frame_start + data_start
+
+
+_MP4_TEXT_ATOMS = {
+    b'\xa9ART': 'artist', b'\xa9alb': 'album',
+    b'\xa9nam': 'title', b'\xa9gen': 'genre',
+}
+_MP4_COVER_MIMES = {13: 'image/jpeg', 14: 'image/png', }
+_MP4_PATH = (b'moov', b'udta', b'meta', b'ilst', )
+
+
+def _gen_mp4_atoms(fd, end):
+    while fd.tell() + 8 <= end:
+        start = fd.tell()
+        size, name = struct.unpack('>I4s', _read_exactly(fd, 8))
+        if size == 1:
+            size = struct.unpack('>Q', _read_exactly(fd, 8))[0]
+        elif size == 0:
+            size = end - start
+        if size < 8:
+            raise HeaderError('Invalid atom size')
+        yield name, start + size
+        fd.seek(start + size)
+
+
+def _find_mp4_atom(fd, path, end):
+    for name, atom_end in _gen_mp4_atoms(fd, end):
+        if name != path[0]:
+            continue
+        if name == b'meta':
+            # meta is a full atom with version and flags, except for
+            # files written by some QuickTime versions
+            data = _read_exactly(fd, 8)
+            if data[4:] != b'hdlr':
+                fd.seek(-4, os.SEEK_CUR)
+            else:
+                fd.seek(-8, os.SEEK_CUR)
+        if len(path) == 1:
+            return atom_end
+        return _find_mp4_atom(fd, path[1:], atom_end)
+    return None
+
+
+def _read_mp4(fd):
+    header = _create_header()
+    fd.seek(0, os.SEEK_END)
+    file_size = fd.tell()
+    fd.seek(0)
+    ilst_end = _find_mp4_atom(fd, _MP4_PATH, file_size)
+    if ilst_end is None:
+        return header
+
+    for name, atom_end in _gen_mp4_atoms(fd, ilst_end):
+        if name == b'gnre':
+            raise HeaderError('ID3 genre atom')
+        if name not in _MP4_TEXT_ATOMS and name != b'covr':
+            continue
+        for data_name, data_end in _gen_mp4_atoms(fd, atom_end):
+            if data_name == b'name' and name == b'covr':
+                continue
+            if data_name != b'data':
+                raise HeaderError('Unexpected atom')
+            data_type = struct.unpack('>I', _read_exactly(fd, 4))[0]
+            data_size = data_end - fd.tell() - 4
+            if name == b'covr':
+                header['artwork_mime'] = _MP4_COVER_MIMES.get(
+                    data_type, 'image/jpeg')
+                header['artwork_size'] = data_size
+                header['artwork_offset'] = fd.tell() + 4
+            else:
+                if data_type & 0xffffff not in (0, 1):
+                    raise HeaderError('Unknown text atom type')
+                fd.seek(4, os.SEEK_CUR)
+                try:
+                    value = _read_exactly(fd, data_size).decode('utf-8')
+                except UnicodeDecodeError:
+                    raise HeaderError('Invalid text atom')
+                header[_MP4_TEXT_ATOMS[name]] = value
+            break
+    return header
+
+
+_HEADER_READERS = {
+    'flac': _read_flac, 'vorbis': _read_ogg_vorbis, 'opus': _read_ogg_opus,
+    'mp3': _read_mp3, 'mp4': _read_mp4,
+}
+
+
+def read_header(filename):
+    format_name = detect_format(filename)
+    try:
+        header_reader = _HEADER_READERS[format_name]
+    except KeyError:
+        raise HeaderError('Unknown file format: %s' % format_name)
+    with open(filename, 'rb') as fd:
+        try:
+            return header_reader(fd)
+        except (struct.error, OSError, ValueError) as e:
+            raise HeaderError(str(e))
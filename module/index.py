@@ -0,0 +1,138 @@
+import os
+
+
+__all__ = ['ScanIndex', 'get_index_values', 'get_path_range', ]
+
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    artist TEXT,
+    album TEXT,
+    title TEXT,
+    genre TEXT,
+    has_artwork INTEGER NOT NULL DEFAULT 0,
+    artwork_digest TEXT
+)
+'''
+
+_INDEX_KEYS = ('artist', 'album', 'title', 'genre', )
+
+_COMMIT_INTERVAL = 1000
+
+
+def get_index_values(tag, artwork=None):
+    # artwork is the picture known to be embedded into the file, its
+    # digest is stored only then, as reading the picture costs a full load
+    values = {key: getattr(tag, key) for key in _INDEX_KEYS}
+    values['has_artwork'] = tag.artwork_mime is not None
+    values['artwork_digest'] = artwork.digest if artwork is not None else None
+    return values
+
+
+class ScanIndex(object):
+    def __init__(self, filename):
+        import sqlite3
+
+        self.filename = filename
+        self.connection = sqlite3.connect(filename)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(_SCHEMA)
+        self._upgrade_schema()
+        self.pending_changes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def lookup(self, filename):
+        try:
+            stat_result = os.stat(filename)
+        except OSError:
+            return None
+        row = self.connection.execute(
+            'SELECT * FROM files WHERE path = ?',
+            (os.path.abspath(filename), )).fetchone()
+        if row is None:
+            return None
+        if (row['mtime_ns'] != stat_result.st_mtime_ns or
+                row['size'] != stat_result.st_size):
+            return None
+        return row
+
+    def update(self, filename, values):
+        stat_result = os.stat(filename)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO files VALUES '
+            '(?, ?, ?, ?, ?, ?, ?, ?, ?)', (
+                os.path.abspath(filename),
+                stat_result.st_mtime_ns, stat_result.st_size,
+                values['artist'], values['album'],
+                values['title'], values['genre'],
+                int(values['has_artwork']), values.get('artwork_digest'),
+            ))
+        self._on_change()
+
+    def remove(self, filename):
+        self.connection.execute(
+            'DELETE FROM files WHERE path = ?', (os.path.abspath(filename), ))
+        self._on_change()
+
+    def rename(self, filename, new_filename):
+        # A rename keeps mtime and size, so the entry stays valid
+        self.connection.execute(
+            'UPDATE OR REPLACE files SET path = ? WHERE path = ?',
+            (os.path.abspath(new_filename), os.path.abspath(filename)))
+        self._on_change()
+
+    def invalidate(self, directory):
+        cursor = self.connection.execute(
+            'DELETE FROM files WHERE path >= ? AND path < ?',
+            get_path_range(directory))
+        self.connection.commit()
+        return cursor.rowcount
+
+    def get_stats(self, directory):
+        row = self.connection.execute('''
+            SELECT COUNT(*), TOTAL(size), TOTAL(has_artwork),
+                COUNT(genre), MAX(mtime_ns)
+            FROM files WHERE path >= ? AND path < ?
+            ''', get_path_range(directory)).fetchone()
+        return {
+            'files': row[0],
+            'total_size': int(row[1]),
+            'with_artwork': int(row[2]),
+            'with_genre': row[3],
+            'latest_mtime_ns': row[4],
+        }
+
+    def commit(self):
+        self.connection.commit()
+        self.pending_changes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+    def _upgrade_schema(self):
+        columns = {row['name'] for row in
+                   self.connection.execute('PRAGMA table_info(files)')}
+        if 'artwork_digest' not in columns:
+            self.connection.execute(
+                'ALTER TABLE files ADD COLUMN artwork_digest TEXT')
+
+    def _on_change(self):
+        self.pending_changes += 1
+        if self.pending_changes >= _COMMIT_INTERVAL:
+            self.commit()
+
+
+def get_path_range(directory):
+    # Paths under a directory sort between these bounds. Unlike LIKE the
+    # comparison is case-sensitive, and it may use the primary key index.
+    prefix = os.path.join(os.path.abspath(directory), '')
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
@@ -1,7 +1,8 @@
+from functools import lru_cache
 import re
 
 
-__all__ = ['normalize_path', 'normalize_string', ]
+__all__ = ['normalize_many', 'normalize_path', 'normalize_string', ]
 
 
 _WORDS_TO_REPLACE = (
@@ -17,13 +18,20 @@ _WORDS_TO_REPLACE = (
     'am', 'was', 'is', 'are',
 )
 
+_CACHE_SIZE = 65536
 
-def _gen_regexp_pattern(word):
+
+def _gen_regexp_pattern(words):
     # Don't match: [-.:_&] EXPR [(-]
-    pattern = '(?<![-.:_&]) %s (?![(-])' % word
+    pattern = '(?<= )(?<![-.:_&] )(%s)(?= (?![(-]))' % '|'.join(words)
     return pattern
 
 
+_REPLACE_MAP = {word.capitalize(): word for word in _WORDS_TO_REPLACE}
+_REPLACE_REGEXP = re.compile(_gen_regexp_pattern(
+    sorted(_REPLACE_MAP, key=len, reverse=True)))
+
+
 # noinspection PyArgumentList
 def normalize_path(path):
     return normalize_string(path)
@@ -31,8 +39,32 @@ def normalize_path(path):
 
 def normalize_string(string):
     if string:
-        for word in _WORDS_TO_REPLACE:
-            pattern = _gen_regexp_pattern(word.capitalize())
-            replace = ' %s ' % word
-            string = re.sub(pattern, replace, string)
+        return _normalize_string(string)
     return string
+
+
+def normalize_many(strings):
+    return [normalize_string(string) for string in strings]
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def _normalize_string(string):
+    parts = []
+    position = 0
+    last_match_ends = {}
+    for match in _REPLACE_REGEXP.finditer(string):
+        word = match.group(1)
+        start, end = match.span()
+        # Each word used to be replaced by a separate substitution consuming
+        # both surrounding spaces, so the same word right after a replaced
+        # one was never matched.
+        if last_match_ends.get(word) == start - 1:
+            continue
+        last_match_ends[word] = end
+        parts.append(string[position:start])
+        parts.append(_REPLACE_MAP[word])
+        position = end
+    if not parts:
+        return string
+    parts.append(string[position:])
+    return ''.join(parts)
@@ -1,25 +1,151 @@
+from fnmatch import fnmatch
 import os
+import zlib
 
+from module.artwork import is_artwork_file
+from module.stats import STATS
 from module.tag import is_audio_supported
 
 
-__all__ = ['gen_audio_files', 'gen_directories', ]
+__all__ = [
+    'DirRecord', 'WalkFilter',
+    'gen_audio_files', 'gen_directories', 'get_shard', 'scan_directory',
+    'walk_directories',
+]
 
 
-def _gen_files(directory, only_first, check_func):
-    for root, dirs, files in os.walk(directory):
-        for fn in files:
-            if check_func(fn):
-                yield os.path.join(root, fn)
-                if only_first:
-                    break
+class WalkFilter(object):
+    def __init__(self, include=None, exclude=None, max_depth=None,
+                 shard=None):
+        self.include = include or ()
+        self.exclude = exclude or ()
+        self.max_depth = max_depth
+        # (index, count) pair, top-level directories of other shards and
+        # files of the root (unless it is the first shard) are skipped
+        self.shard = shard
 
+    def is_file_allowed(self, name):
+        if self.include and not _match_any(name, self.include):
+            return False
+        return not _match_any(name, self.exclude)
 
-def gen_audio_files(directory, only_first=False):
-    return _gen_files(directory, only_first, is_audio_supported)
+    def is_dir_allowed(self, name):
+        return not _match_any(name, self.exclude)
 
+    def can_descend(self, depth):
+        return self.max_depth is None or depth < self.max_depth
 
-def gen_directories(directory, with_files=False):
-    for root, dirs, files in os.walk(directory):
-        if files or not with_files:
-            yield root
+    def is_top_dir_allowed(self, name):
+        if self.shard is None:
+            return True
+        index, count = self.shard
+        return get_shard(name, count) == index
+
+    def has_root_files(self):
+        return self.shard is None or self.shard[0] == 0
+
+
+def get_shard(name, count):
+    # hash() of strings is salted per process, crc32 is the same on
+    # every node.
+    return zlib.crc32(os.fsencode(name)) % count
+
+
+class DirRecord(object):
+    def __init__(self, path, depth):
+        self.path = path
+        self.depth = depth
+        self.files = []
+        self.audio_files = []
+        self.artwork_files = []
+        self.subdirs = []
+        self.entries = {}
+
+    def get_walkable_subdirs(self):
+        return [subdir for subdir in self.subdirs
+                if not self.entries[os.path.basename(subdir)].is_symlink()]
+
+    def get_size(self, filename):
+        entry = self.entries.get(os.path.basename(filename))
+        if entry is None:
+            return os.path.getsize(filename)
+        return entry.stat().st_size
+
+
+_DEFAULT_FILTER = WalkFilter()
+
+
+def _match_any(name, patterns):
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+def scan_directory(path, depth=0, walk_filter=None):
+    with STATS.timer('walk'):
+        record = _scan_directory(path, depth, walk_filter or _DEFAULT_FILTER)
+    if record is not None:
+        STATS.incr('dirs_scanned')
+        STATS.incr('files_scanned', len(record.files))
+    return record
+
+
+def _scan_directory(path, depth, walk_filter):
+    record = DirRecord(path, depth)
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if walk_filter.is_dir_allowed(entry.name) and (
+                            depth or walk_filter.is_top_dir_allowed(
+                                entry.name)):
+                        record.subdirs.append(entry.path)
+                        record.entries[entry.name] = entry
+                elif depth == 0 and not walk_filter.has_root_files():
+                    continue
+                else:
+                    # Globs select audio files only, a cover is found
+                    # even if it does not match them
+                    record.files.append(entry.path)
+                    record.entries[entry.name] = entry
+                    if is_audio_supported(entry.name):
+                        if walk_filter.is_file_allowed(entry.name):
+                            record.audio_files.append(entry.path)
+                    elif is_artwork_file(entry.name):
+                        record.artwork_files.append(entry.path)
+    except OSError:
+        return None
+    return record
+
+
+def walk_directories(directory, walk_filter=None):
+    walk_filter = walk_filter or _DEFAULT_FILTER
+    # Directories are visited in the same top-down order as os.walk does,
+    # each of them is listed exactly once.
+    stack = [(directory, 0)]
+    while stack:
+        path, depth = stack.pop()
+        record = scan_directory(path, depth, walk_filter)
+        if record is None:
+            continue
+        yield record
+        if not walk_filter.can_descend(depth):
+            continue
+        for subdir in reversed(record.get_walkable_subdirs()):
+            stack.append((subdir, depth + 1))
+
+
+def gen_audio_files(directory, only_first=False, walk_filter=None):
+    for record in walk_directories(directory, walk_filter):
+        for filename in record.audio_files:
+            yield filename
+            if only_first:
+                break
+
+
+def gen_directories(directory, with_files=False, walk_filter=None):
+    for record in walk_directories(directory, walk_filter):
+        if record.files or not with_files:
+            yield record.path
@@ -0,0 +1,90 @@
+import json
+import os
+
+
+__all__ = [
+    'PlanWriter', 'read_plan', 'gen_directory_groups', 'get_dir_renames',
+    'make_paths_absolute',
+    'OP_ARTWORK', 'OP_RENAME_DIR', 'OP_RENAME_FILE', 'OP_TAGS',
+]
+
+
+OP_TAGS = 'tags'
+OP_ARTWORK = 'artwork'
+OP_RENAME_FILE = 'rename_file'
+OP_RENAME_DIR = 'rename_dir'
+
+_FILE_OPS = (OP_TAGS, OP_ARTWORK, OP_RENAME_FILE, )
+_PATH_KEYS = ('path', 'target', 'cover', )
+
+
+class PlanWriter(object):
+    def __init__(self, filename):
+        self.filename = filename
+        self.count = 0
+        self.size = 0
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = open(self.filename, 'w', encoding='utf-8')
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.fd.close()
+
+    def write(self, entry):
+        self.fd.write(json.dumps(entry, ensure_ascii=False))
+        self.fd.write('\n')
+        self.count += 1
+        self.size += entry.get('size', 0)
+
+
+def make_paths_absolute(entry):
+    # A plan may be applied from another working directory
+    for key in _PATH_KEYS:
+        if key in entry:
+            entry[key] = os.path.abspath(entry[key])
+    return entry
+
+
+def read_plan(filename, directory=None):
+    with open(filename, encoding='utf-8') as fd:
+        for line in fd:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if directory is None or _is_subpath(entry['path'], directory):
+                yield entry
+
+
+def _is_subpath(path, directory):
+    path = os.path.abspath(path)
+    directory = os.path.abspath(directory)
+    return path == directory or path.startswith(os.path.join(directory, ''))
+
+
+def gen_directory_groups(entries):
+    # Yield (directory, edits, renames) for every directory in path order.
+    # Edits of one file are grouped so each file is saved at most once.
+    directories = {}
+    for entry in entries:
+        if entry['op'] not in _FILE_OPS:
+            continue
+        dirname, basename = os.path.split(entry['path'])
+        edits, renames = directories.setdefault(dirname, ({}, []))
+        if entry['op'] == OP_RENAME_FILE:
+            renames.append(entry)
+        else:
+            edits.setdefault(basename, []).append(entry)
+    for dirname in sorted(directories):
+        edits, renames = directories[dirname]
+        file_edits = [(os.path.join(dirname, basename), edits[basename])
+                      for basename in sorted(edits)]
+        yield dirname, file_edits, renames
+
+
+def get_dir_renames(entries):
+    renames = [entry for entry in entries if entry['op'] == OP_RENAME_DIR]
+    # Deepest directories go first so parent paths stay valid.
+    renames.sort(key=lambda entry: entry['path'].count(os.sep), reverse=True)
+    return renames
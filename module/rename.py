@@ -0,0 +1,128 @@
+import os
+
+from module.stats import STATS
+
+
+__all__ = ['RenameBatch', ]
+
+
+class _Rename(object):
+    def __init__(self, path, name):
+        self.path = path
+        self.parent, self.old_name = os.path.split(path)
+        self.name = name
+        self.target = os.path.join(self.parent, name)
+        self.depth = os.path.normpath(path).count(os.sep)
+        self.temp_name = None
+        self.error = None
+
+
+class RenameBatch(object):
+    # Renames of files and directories to new names within their parent
+    # directories. Conflicts are checked before anything is renamed, then
+    # the deepest paths go first, so paths of the batch stay valid until
+    # they are renamed themselves.
+    def __init__(self, checkpoint=None):
+        self.checkpoint = checkpoint
+        self.renames = []
+        self.applied = []
+
+    def __len__(self):
+        return len(self.renames)
+
+    def add(self, path, name):
+        if name and name != os.path.basename(path):
+            self.renames.append(_Rename(path, name))
+
+    def check(self):
+        targets = set()
+        for rename in self.renames:
+            key = (rename.parent, rename.name)
+            if key in targets:
+                rename.error = f'{rename.target} is a target of another rename'
+            elif os.path.lexists(rename.target):
+                if rename.old_name.casefold() == rename.name.casefold() and \
+                        _is_same_file(rename.path, rename.target):
+                    # A case-only rename on a case-insensitive file system
+                    # may be ignored, it goes through a temporary name.
+                    rename.temp_name = f'.{rename.old_name}.rename'
+                    if os.path.lexists(os.path.join(rename.parent,
+                                                    rename.temp_name)):
+                        rename.error = f'{rename.temp_name} already exists'
+                else:
+                    rename.error = f'{rename.target} already exists'
+            targets.add(key)
+        return [rename for rename in self.renames if rename.error is None]
+
+    def apply(self):
+        # Return renames which are applied, failed ones have an error
+        renames = sorted(self.check(),
+                         key=lambda rename: (-rename.depth, rename.parent))
+        parent = dir_fd = None
+        try:
+            for rename in renames:
+                if rename.parent != parent:
+                    _close_dir(dir_fd)
+                    parent = rename.parent
+                    dir_fd = _open_dir(parent)
+                if self.checkpoint is not None:
+                    self.checkpoint.log_rename(rename.path, rename.target)
+                try:
+                    with STATS.timer('rename'):
+                        _rename(rename, dir_fd)
+                except OSError as e:
+                    STATS.add_error(e)
+                    rename.error = e.strerror or str(e)
+                    continue
+                self.applied.append(rename)
+        finally:
+            _close_dir(dir_fd)
+        return self.applied
+
+    def revert(self):
+        for rename in reversed(self.applied):
+            os.rename(rename.target, rename.path)
+        self.applied = []
+
+
+def _is_same_file(path, other_path):
+    try:
+        return os.path.samefile(path, other_path)
+    except OSError:
+        return False
+
+
+def _open_dir(path):
+    # Renames relative to a directory descriptor skip the lookup of the
+    # parent path, which is not supported everywhere.
+    if os.rename not in os.supports_dir_fd or \
+            not hasattr(os, 'O_DIRECTORY'):
+        return None
+    try:
+        return os.open(path or os.curdir, os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return None
+
+
+def _close_dir(dir_fd):
+    if dir_fd is not None:
+        os.close(dir_fd)
+
+
+def _rename(rename, dir_fd):
+    if dir_fd is None:
+        old_path, new_path = rename.path, rename.target
+        kwargs = {}
+    else:
+        old_path, new_path = rename.old_name, rename.name
+        kwargs = {'src_dir_fd': dir_fd, 'dst_dir_fd': dir_fd}
+    if rename.temp_name is not None:
+        temp_path = os.path.join(os.path.dirname(old_path), rename.temp_name)
+        os.rename(old_path, temp_path, **kwargs)
+        try:
+            os.rename(temp_path, new_path, **kwargs)
+        except OSError:
+            os.rename(temp_path, old_path, **kwargs)
+            raise
+    else:
+        os.rename(old_path, new_path, **kwargs)
@@ -0,0 +1,52 @@
+from module.stats import STATS
+from module.tag import read_tags
+
+
+__all__ = ['WriteSession', ]
+
+
+class WriteSession(object):
+    def __init__(self, filename, tag=None):
+        self.filename = filename
+        self.tag = tag
+        self.changes = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+
+    @property
+    def changed(self):
+        return bool(self.changes)
+
+    def get_tag(self):
+        if self.tag is None:
+            self.tag = read_tags(self.filename)
+        return self.tag
+
+    def get(self, key):
+        if key in self.changes:
+            return self.changes[key]
+        return getattr(self.get_tag(), key)
+
+    def set(self, key, value):
+        # Values equal to the stored ones are dropped, so a file whose
+        # values are already up to date is never rewritten.
+        if getattr(self.get_tag(), key) == value:
+            self.changes.pop(key, None)
+            return False
+        self.changes[key] = value
+        return True
+
+    def commit(self):
+        if not self.changes:
+            STATS.incr('saves_skipped')
+            return 0
+        tag = self.get_tag()
+        for key, value in self.changes.items():
+            setattr(tag, key, value)
+        self.changes = {}
+        return tag.save()
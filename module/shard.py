@@ -0,0 +1,78 @@
+import os
+
+from module.checkpoint import gen_journal_entries
+
+
+__all__ = ['ShardError', 'ShardParts', 'get_part_filename', ]
+
+
+_PATH_KEYS = ('path', 'target', 'directory', )
+
+
+class ShardError(Exception):
+    pass
+
+
+def get_part_filename(name, shard):
+    index, count = shard
+    return f'{name}.part-{index}-of-{count}.jsonl'
+
+
+class ShardParts(object):
+    # Partial outputs of shards are journals (see module.checkpoint), their
+    # start entries hold the command and the (index, count) shard pair.
+    def __init__(self, filenames):
+        self.command = None
+        self.count = None
+        parts = {}
+        for filename in filenames:
+            header = next(gen_journal_entries(filename), None)
+            if not header or header['type'] != 'start' or \
+                    not header.get('shard'):
+                raise ShardError(f'{filename} is not a shard output')
+            index, count = header['shard']
+            if self.command is None:
+                self.command = header['command']
+                self.count = count
+            elif (header['command'], count) != (self.command, self.count):
+                raise ShardError(f'{filename} belongs to another run')
+            if index in parts:
+                raise ShardError(f'shard {index} is given twice')
+            parts[index] = (filename, header['directory'])
+        missing = [str(index) for index in range(self.count or 0)
+                   if index not in parts]
+        if missing:
+            raise ShardError(f'missing shards of {self.count}: '
+                             f'{", ".join(missing)}')
+        self.parts = [parts[index] for index in range(self.count)]
+        self.completed = True
+
+    def gen_entries(self, directory, strict=True):
+        # Yield (shard index, entry) pairs in shard order. Paths are moved
+        # from the directory scanned by a shard to the given one, so nodes
+        # may mount the library at different places.
+        for index, (filename, part_directory) in enumerate(self.parts):
+            completed = False
+            for entry in gen_journal_entries(filename):
+                entry_type = entry['type']
+                if entry_type == 'start':
+                    continue
+                if entry_type == 'end':
+                    completed = True
+                    continue
+                for key in _PATH_KEYS:
+                    if key in entry:
+                        entry[key] = _rebase_path(
+                            entry[key], part_directory, directory)
+                yield index, entry
+            if not completed:
+                if strict:
+                    raise ShardError(f'{filename} is incomplete')
+                self.completed = False
+
+
+def _rebase_path(path, directory, new_directory):
+    relpath = os.path.relpath(path, directory)
+    if relpath == os.curdir:
+        return new_directory
+    return os.path.join(new_directory, relpath)
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+
+__all__ = ['Stats', 'STATS', ]
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+class _Timer(object):
+    def __init__(self, stats, phase):
+        self.stats = stats
+        self.phase = phase
+        self.start_time = None
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.perf_counter() - self.start_time
+        self.stats.add_timing(self.phase, elapsed)
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Stats(object):
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}
+        self.counters = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def timer(self, phase):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, phase)
+
+    def add_timing(self, phase, elapsed):
+        with self._lock:
+            calls, total = self.timings.get(phase, (0, 0.0))
+            self.timings[phase] = (calls + 1, total + elapsed)
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_error(self, error):
+        if not self.enabled:
+            return
+        name = error.__class__.__name__
+        with self._lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+
+    def gen_summary(self):
+        yield f'{"Phase":<12} {"Calls":>10} {"Total, s":>12} {"Avg, ms":>10}'
+        for phase, (calls, total) in sorted(self.timings.items()):
+            average = total / calls * 1000 if calls else 0
+            yield f'{phase:<12} {calls:>10} {total:>12.3f} {average:>10.3f}'
+        yield ''
+        yield f'{"Counter":<24} {"Value":>12}'
+        for name, value in sorted(self.counters.items()):
+            yield f'{name:<24} {value:>12}'
+        if self.errors:
+            yield ''
+            yield f'{"Error":<24} {"Count":>12}'
+            for name, count in sorted(self.errors.items()):
+                yield f'{name:<24} {count:>12}'
+
+    def to_json(self):
+        return json.dumps({
+            'timings': {
+                phase: {'calls': calls, 'seconds': total}
+                for phase, (calls, total) in self.timings.items()
+            },
+            'counters': self.counters,
+            'errors': self.errors,
+        }, indent=2, sort_keys=True)
+
+    def to_prometheus(self):
+        lines = [
+            '# TYPE audiotool_phase_seconds_total counter',
+        ]
+        for phase, (_, total) in sorted(self.timings.items()):
+            lines.append(
+                f'audiotool_phase_seconds_total{{phase="{phase}"}} {total}')
+        lines.append('# TYPE audiotool_phase_calls_total counter')
+        for phase, (calls, _) in sorted(self.timings.items()):
+            lines.append(
+                f'audiotool_phase_calls_total{{phase="{phase}"}} {calls}')
+        for name, value in sorted(self.counters.items()):
+            lines.append(f'# TYPE audiotool_{name}_total counter')
+            lines.append(f'audiotool_{name}_total {value}')
+        lines.append('# TYPE audiotool_errors_total counter')
+        for name, count in sorted(self.errors.items()):
+            lines.append(f'audiotool_errors_total{{type="{name}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self, filename):
+        if filename.endswith('.prom'):
+            data = self.to_prometheus()
+        else:
+            data = self.to_json()
+        # Textfile collectors may read the file at any time
+        temp_filename = filename + '.tmp'
+        with open(temp_filename, 'w', encoding='utf-8') as fd:
+            fd.write(data)
+        os.replace(temp_filename, filename)
+
+
+STATS = Stats()
@@ -1,16 +1,24 @@
 from base64 import b64decode, b64encode
 import os
-
-from mutagen import MutagenError
-from mutagen.flac import FLAC, Picture
-from mutagen.id3 import APIC, Frames, ID3
-from mutagen.mp4 import MP4, MP4Cover
-from mutagen.oggvorbis import OggVorbis
+import shutil
+import tempfile
 
 from module.artwork import Artwork
+from module.formats import (
+    detect_format, is_audio_extension, register_format as _register_format,
+    unregister_format as _unregister_format)
+from module.header import HeaderError, read_header
+from module.stats import STATS
+from module.throttle import SCHEDULER
+
+
+__all__ = [
+    'get_tags', 'is_audio_file', 'is_audio_supported', 'read_tags',
+    'register_format', 'unregister_format',
+]
 
 
-__all__ = ['get_tags', 'is_audio_file', 'is_audio_supported', ]
+_COPY_CHUNK_SIZE = 1024 * 1024
 
 
 class TagValueError(ValueError):
@@ -32,14 +40,153 @@ class TagLoadError(Exception):
         Exception.__init__(self, message)
 
 
+class UnknownFormatError(TagLoadError):
+    def __init__(self, filename):
+        message = u'Unknown file format: {0}'.format(filename)
+        Exception.__init__(self, message)
+
+
+class _PaddingExceeded(Exception):
+    pass
+
+
 class _AbstractWrapper(object):
-    def __init__(self):
-        pass
+    def __init__(self, filename):
+        self.filename = filename
+
+    @property
+    def artwork_mime(self):
+        artwork = self.artwork
+        return artwork.mime if artwork is not None else None
+
+    @property
+    def artwork_size(self):
+        artwork = self.artwork
+        return artwork.size if artwork is not None else 0
 
     def save(self):
+        SCHEDULER.throttle(ops=1)
+        with STATS.timer('save'):
+            size = self._save_in_place()
+            if size is None:
+                size = self._save_atomically()
+        # Written bytes are paid after the save, the copy of an atomic
+        # save is paid on the way
+        SCHEDULER.throttle(nbytes=size)
+        STATS.incr('files_written')
+        STATS.incr('bytes_written', size)
+        return size
+
+    def _save_in_place(self):
+        # A tag fitting into the existing padding overwrites the old tag
+        # only, nothing is moved and the file never gets truncated.
+        infos = []
+
+        def keep_padding(info):
+            if info.padding < 0:
+                raise _PaddingExceeded()
+            infos.append(info)
+            return info.padding
+
+        try:
+            self._save(padding=keep_padding)
+        except _PaddingExceeded:
+            return None
+        STATS.incr('saves_in_place')
+        return self._get_tag_size(infos[-1])
+
+    def _save_atomically(self):
+        dirname, basename = os.path.split(self.filename)
+        fd, temp_filename = tempfile.mkstemp(
+            prefix=f'.{basename}.', suffix='.tmp', dir=dirname or '.')
+        try:
+            with open(fd, 'wb') as temp_fd, \
+                    open(self.filename, 'rb') as source_fd:
+                _copy_file(source_fd, temp_fd)
+            shutil.copystat(self.filename, temp_filename)
+            self._save(temp_filename)
+            with open(temp_filename, 'rb+') as temp_fd:
+                os.fsync(temp_fd.fileno())
+            os.replace(temp_filename, self.filename)
+        except BaseException:
+            os.remove(temp_filename)
+            raise
+        _fsync_directory(dirname or '.')
+        return os.path.getsize(self.filename)
+
+    def _get_tag_size(self, padding_info):
+        # Everything in front of the data following the padding
+        return os.path.getsize(self.filename) - padding_info.size
+
+    def _save(self, filename=None, padding=None):
         raise NotImplementedError
 
 
+def _copy_file(source_fd, target_fd):
+    if not SCHEDULER.enabled:
+        shutil.copyfileobj(source_fd, target_fd)
+        return
+    # The copy is the bulk of an atomic save, it is throttled by chunks
+    while True:
+        chunk = source_fd.read(_COPY_CHUNK_SIZE)
+        if not chunk:
+            break
+        SCHEDULER.throttle(nbytes=len(chunk))
+        target_fd.write(chunk)
+
+
+def _fsync_directory(dirname):
+    # The replace itself survives a crash only once the directory is
+    # flushed. Directories can not be opened on Windows.
+    try:
+        fd = os.open(dirname, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _HeaderWrapper(object):
+    VALID_TAG_KEYS = (
+        'artwork', 'artist', 'album', 'title', 'genre',
+        'artwork_mime', 'artwork_size',
+    )
+
+    def __init__(self, filename, header, wrapper=None):
+        object.__setattr__(self, 'filename', filename)
+        object.__setattr__(self, 'header', header)
+        object.__setattr__(self, 'wrapper', wrapper)
+
+    def __getattr__(self, attr):
+        if attr not in self.VALID_TAG_KEYS:
+            raise TagError(self, attr)
+        if self.wrapper is None and attr in self.header:
+            return self.header[attr]
+        return getattr(self._get_wrapper(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._get_wrapper(), attr, value)
+
+    def __repr__(self):
+        if self.wrapper is None:
+            return repr(self.header)
+        return repr(self.wrapper)
+
+    def save(self):
+        if self.wrapper is None:
+            return 0
+        return self.wrapper.save()
+
+    def _get_wrapper(self):
+        if self.wrapper is None:
+            object.__setattr__(self, 'wrapper', get_tags(self.filename))
+        return self.wrapper
+
+
 class _OggVorbisWrapper(_AbstractWrapper):
     TAG_MAP = {
         'artwork': 'metadata_block_picture',
@@ -49,12 +196,21 @@ class _OggVorbisWrapper(_AbstractWrapper):
     VALID_TAG_KEYS = ('artwork', 'artist', 'album', 'title', 'genre', )
 
     def __init__(self, filename):
-        _AbstractWrapper.__init__(self)
-        self.audio = OggVorbis(filename)
+        # Format modules are imported on first use to keep startup fast
+        from mutagen import MutagenError
+        from mutagen.oggvorbis import OggVorbis
+
+        _AbstractWrapper.__init__(self, filename)
+        try:
+            self.audio = OggVorbis(filename)
+        except MutagenError:
+            raise TagLoadError('Vorbis')
 
     def __getattr__(self, attr):
         if attr in self.VALID_TAG_KEYS:
             if attr == 'artwork':
+                from mutagen.flac import Picture
+
                 try:
                     raw_artwork_data = b64decode(
                         self.audio['metadata_block_picture'][0])
@@ -72,6 +228,8 @@ class _OggVorbisWrapper(_AbstractWrapper):
     def __setattr__(self, attr, value):
         if attr in self.VALID_TAG_KEYS:
             if isinstance(value, Artwork):
+                from mutagen.flac import Picture
+
                 picture = Picture()
                 picture.type = 3
                 picture.mime = value.mime
@@ -89,16 +247,34 @@ class _OggVorbisWrapper(_AbstractWrapper):
     def __repr__(self):
         return repr(self.audio)
 
-    def save(self):
-        self.audio.save()
+    def _save(self, filename=None, padding=None):
+        self.audio.save(filename, padding=padding)
+
+
+class _OggOpusWrapper(_OggVorbisWrapper):
+    def __init__(self, filename):
+        from mutagen import MutagenError
+        from mutagen.oggopus import OggOpus
+
+        _AbstractWrapper.__init__(self, filename)
+        try:
+            self.audio = OggOpus(filename)
+        except MutagenError:
+            raise TagLoadError('Opus')
 
 
 class _FLACWrapper(_AbstractWrapper):
     VALID_TAG_KEYS = ('artwork', 'artist', 'album', 'title', 'genre', )
 
     def __init__(self, filename):
-        _AbstractWrapper.__init__(self)
-        self.audio = FLAC(filename)
+        from mutagen import MutagenError
+        from mutagen.flac import FLAC
+
+        _AbstractWrapper.__init__(self, filename)
+        try:
+            self.audio = FLAC(filename)
+        except MutagenError:
+            raise TagLoadError('FLAC')
 
     def __getattr__(self, attr):
         if attr in self.VALID_TAG_KEYS:
@@ -118,6 +294,8 @@ class _FLACWrapper(_AbstractWrapper):
     def __setattr__(self, attr, value):
         if attr in self.VALID_TAG_KEYS:
             if isinstance(value, Artwork):
+                from mutagen.flac import Picture
+
                 picture = Picture()
                 picture.type = 3
                 picture.mime = value.mime
@@ -134,8 +312,8 @@ class _FLACWrapper(_AbstractWrapper):
     def __repr__(self):
         return repr(self.audio)
 
-    def save(self):
-        self.audio.save()
+    def _save(self, filename=None, padding=None):
+        self.audio.save(filename, padding=padding)
 
 
 class _MP3Wrapper(_AbstractWrapper):
@@ -146,7 +324,10 @@ class _MP3Wrapper(_AbstractWrapper):
     }
 
     def __init__(self, filename):
-        _AbstractWrapper.__init__(self)
+        from mutagen import MutagenError
+        from mutagen.id3 import ID3
+
+        _AbstractWrapper.__init__(self, filename)
         try:
             self.audio = ID3(filename)
         except MutagenError:
@@ -167,6 +348,8 @@ class _MP3Wrapper(_AbstractWrapper):
 
     def __setattr__(self, attr, value):
         if attr in self.TAG_MAP:
+            from mutagen.id3 import APIC, Frames
+
             frame_id = self.TAG_MAP[attr]
             frame = self.audio.get(frame_id, None)
             if isinstance(value, Artwork):
@@ -188,8 +371,12 @@ class _MP3Wrapper(_AbstractWrapper):
     def __repr__(self):
         return repr(self.audio)
 
-    def save(self):
-        self.audio.save(v1=1, v2_version=3)
+    def _get_tag_size(self, padding_info):
+        # ID3 reports the whole file as the data following the padding
+        return self.audio.size
+
+    def _save(self, filename=None, padding=None):
+        self.audio.save(filename, v1=1, v2_version=3, padding=padding)
 
 
 class _MP4Wrapper(_AbstractWrapper):
@@ -198,18 +385,21 @@ class _MP4Wrapper(_AbstractWrapper):
         'artist': '\xa9ART', 'album': '\xa9alb',
         'title': '\xa9nam', 'genre': '\xa9gen',
     }
+    # Names of MP4Cover format constants
     COVER_MIME_MAP = {
-        'image/jpeg': MP4Cover.FORMAT_JPEG,
-        'image/png': MP4Cover.FORMAT_PNG,
-    }
-    COVER_FORMAT_MAP = {
-        MP4Cover.FORMAT_JPEG: 'image/jpeg',
-        MP4Cover.FORMAT_PNG: 'image/png',
+        'image/jpeg': 'FORMAT_JPEG',
+        'image/png': 'FORMAT_PNG',
     }
 
     def __init__(self, filename):
-        _AbstractWrapper.__init__(self)
-        self.audio = MP4(filename)
+        from mutagen import MutagenError
+        from mutagen.mp4 import MP4
+
+        _AbstractWrapper.__init__(self, filename)
+        try:
+            self.audio = MP4(filename)
+        except MutagenError:
+            raise TagLoadError('MP4')
 
     def __getattr__(self, attr):
         if attr in self.TAG_MAP:
@@ -229,6 +419,8 @@ class _MP4Wrapper(_AbstractWrapper):
         if attr in self.TAG_MAP:
             tag_id = _MP4Wrapper.TAG_MAP[attr]
             if isinstance(value, Artwork):
+                from mutagen.mp4 import MP4Cover
+
                 imageformat = _MP4Wrapper._get_format_by_mime(value.mime)
                 mp4_cover = MP4Cover(value.data, imageformat=imageformat)
                 self.audio[tag_id] = [mp4_cover]
@@ -242,36 +434,78 @@ class _MP4Wrapper(_AbstractWrapper):
     def __repr__(self):
         return repr(self.audio)
 
-    def save(self):
-        self.audio.save()
+    def _save(self, filename=None, padding=None):
+        self.audio.save(filename, padding=padding)
 
     @staticmethod
     def _get_format_by_mime(mime):
+        from mutagen.mp4 import MP4Cover
+
         try:
-            return _MP4Wrapper.COVER_MIME_MAP[mime]
+            return getattr(MP4Cover, _MP4Wrapper.COVER_MIME_MAP[mime])
         except Exception:
             raise ValueError('Unknown image MIME: %s' % mime)
 
     @staticmethod
     def _get_mime_by_format(imageformat):
-        try:
-            return _MP4Wrapper.COVER_FORMAT_MAP[imageformat]
-        except Exception:
-            raise ValueError('Unknown image format: %s' % imageformat)
+        from mutagen.mp4 import MP4Cover
+
+        for mime, format_name in _MP4Wrapper.COVER_MIME_MAP.items():
+            if getattr(MP4Cover, format_name) == imageformat:
+                return mime
+        raise ValueError('Unknown image format: %s' % imageformat)
 
 
 _WRAPPER_MAP = {
-    '.flac': _FLACWrapper, '.ogg': _OggVorbisWrapper,
-    '.mp3': _MP3Wrapper, '.m4a': _MP4Wrapper,
+    'flac': _FLACWrapper, 'vorbis': _OggVorbisWrapper,
+    'opus': _OggOpusWrapper, 'mp3': _MP3Wrapper, 'mp4': _MP4Wrapper,
 }
 
 
+def register_format(name, extensions, sniff, wrapper_class):
+    # wrapper_class(filename) is an _AbstractWrapper subclass,
+    # see module.formats for sniff
+    _register_format(name, extensions, sniff)
+    _WRAPPER_MAP[name] = wrapper_class
+
+
+def unregister_format(name):
+    _unregister_format(name)
+    del _WRAPPER_MAP[name]
+
+
 def get_tags(filename):
-    extension = os.path.splitext(filename)[1]
+    with STATS.timer('sniff'):
+        format_name = detect_format(filename)
     try:
-        return _WRAPPER_MAP[extension](filename)
+        wrapper_class = _WRAPPER_MAP[format_name]
     except KeyError:
-        raise RuntimeError('Unknown file format: %s' % extension)
+        raise UnknownFormatError(filename)
+    # Latency is sampled by the sniff, a parse takes longer for larger
+    # pictures however busy the volume is. It is paid as a read of the
+    # whole file, as some formats are scanned up to the end.
+    if SCHEDULER.enabled:
+        SCHEDULER.throttle(ops=1, nbytes=os.path.getsize(filename))
+    with STATS.timer('parse'):
+        wrapper = wrapper_class(filename)
+    _count_parsed_file(filename)
+    return wrapper
+
+
+def read_tags(filename):
+    try:
+        with STATS.timer('header'):
+            header = read_header(filename)
+    except HeaderError:
+        return _HeaderWrapper(filename, None, get_tags(filename))
+    _count_parsed_file(filename)
+    return _HeaderWrapper(filename, header)
+
+
+def _count_parsed_file(filename):
+    STATS.incr('files_parsed')
+    if STATS.enabled:
+        STATS.incr('bytes_parsed', os.path.getsize(filename))
 
 
 def is_audio_file(filename):
@@ -279,5 +513,6 @@ def is_audio_file(filename):
 
 
 def is_audio_supported(filename):
-    extension = os.path.splitext(filename)[1]
-    return extension in _WRAPPER_MAP
+    # Listings check extensions only, the content is sniffed once a file
+    # is opened
+    return is_audio_extension(filename)
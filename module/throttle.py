@@ -0,0 +1,250 @@
+import datetime
+import sys
+import threading
+import time
+
+from module.stats import STATS
+
+
+__all__ = [
+    'IOScheduler', 'SCHEDULER', 'TimeWindow', 'TokenBucket',
+    'set_idle_priority',
+]
+
+
+# Ceilings of the adaptive mode if no rates are given
+_DEFAULT_BYTES_RATE = 100 * 1024 * 1024
+_DEFAULT_OPS_RATE = 500
+_ADJUST_INTERVAL = 1.0
+_MIN_FACTOR = 0.02
+_FACTOR_STEP = 0.05
+_LATENCY_WEIGHT = 0.2
+# Longest sleep outside of time windows, so that Ctrl+C is responsive
+_MAX_WINDOW_SLEEP = 60.0
+
+_IOPRIO_CLASS_IDLE = 3
+_IOPRIO_CLASS_SHIFT = 13
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_SET_SYSCALLS = {
+    'x86_64': 251, 'i386': 289, 'i686': 289,
+    'aarch64': 30, 'armv7l': 314, 'ppc64le': 273,
+}
+
+
+class TokenBucket(object):
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.clock = clock
+        self.tokens = self.burst
+        self.last_time = clock()
+        self._lock = threading.Lock()
+
+    def consume(self, amount):
+        # Return seconds to wait. Tokens may go negative, so a request
+        # larger than the burst is paid by waiting afterwards.
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.last_time) * self.rate)
+            self.last_time = now
+            self.tokens -= amount
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def set_rate(self, rate):
+        with self._lock:
+            # Tokens earned so far are counted with the old rate
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens +
+                              (now - self.last_time) * self.rate)
+            self.last_time = now
+            self.rate = rate
+
+
+class TimeWindow(object):
+    def __init__(self, start, end):
+        # Minutes since midnight, a window may wrap around it
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f'TimeWindow({self.start!r}, {self.end!r})'
+
+    def contains(self, minute):
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def get_minutes_to_start(self, minute):
+        return (self.start - minute) % (24 * 60)
+
+    @classmethod
+    def parse(cls, value):
+        start, separator, end = value.partition('-')
+        if not separator:
+            raise ValueError(f'invalid time window: {value}')
+        start, end = _parse_minute(start), _parse_minute(end)
+        if start == end:
+            raise ValueError(f'empty time window: {value}')
+        return cls(start, end)
+
+
+def _parse_minute(value):
+    hours, separator, minutes = value.strip().partition(':')
+    hours = int(hours)
+    minutes = int(minutes) if separator else 0
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or \
+            hours * 60 + minutes > 24 * 60:
+        raise ValueError(f'invalid time: {value}')
+    return hours * 60 + minutes
+
+
+class _ReadTimer(object):
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.start_time = None
+
+    def __enter__(self):
+        self.scheduler.throttle(ops=1)
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.scheduler.add_latency(time.perf_counter() - self.start_time)
+        return False
+
+
+class _NullReadTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_READ_TIMER = _NullReadTimer()
+
+
+class IOScheduler(object):
+    # Rates are shared by all threads of a process. With a latency SLO
+    # both rates are scaled by a factor following AIMD: latency of reads
+    # above the SLO halves it, otherwise it grows a bit every second.
+    def __init__(self):
+        self.enabled = False
+        self.bytes_bucket = None
+        self.ops_bucket = None
+        self.bytes_rate = None
+        self.ops_rate = None
+        self.windows = ()
+        self.latency_slo = None
+        self.factor = 1.0
+        self.latency = None
+        self.last_adjust_time = None
+        self.clock = time.monotonic
+        self.sleep = time.sleep
+        self._lock = threading.Lock()
+
+    def configure(self, bytes_rate=None, ops_rate=None, windows=(),
+                  latency_slo=None, workers=1):
+        if latency_slo is not None:
+            bytes_rate = bytes_rate or _DEFAULT_BYTES_RATE
+            ops_rate = ops_rate or _DEFAULT_OPS_RATE
+        if workers > 1:
+            # Each worker process has its own scheduler and a share of
+            # the rates, also of the default ceilings
+            bytes_rate = bytes_rate and bytes_rate / workers
+            ops_rate = ops_rate and ops_rate / workers
+        self.bytes_rate = bytes_rate
+        self.ops_rate = ops_rate
+        self.bytes_bucket = None
+        self.ops_bucket = None
+        if bytes_rate:
+            self.bytes_bucket = TokenBucket(bytes_rate, clock=self.clock)
+        if ops_rate:
+            self.ops_bucket = TokenBucket(ops_rate, clock=self.clock)
+        self.windows = tuple(windows)
+        self.latency_slo = latency_slo
+        self.factor = 1.0
+        self.latency = None
+        self.last_adjust_time = self.clock()
+        self.enabled = bool(bytes_rate or ops_rate or self.windows)
+
+    def throttle(self, nbytes=0, ops=0):
+        if not self.enabled:
+            return
+        self._wait_for_window()
+        delay = 0.0
+        if nbytes and self.bytes_bucket is not None:
+            delay = max(delay, self.bytes_bucket.consume(nbytes))
+        if ops and self.ops_bucket is not None:
+            delay = max(delay, self.ops_bucket.consume(ops))
+        if delay > 0:
+            STATS.incr('throttle_waits')
+            with STATS.timer('throttle'):
+                self.sleep(delay)
+
+    def read_timer(self):
+        # Only short reads of a fixed size are timed, so their latency
+        # tells how busy the volume is and not how large the files are
+        if not self.enabled:
+            return _NULL_READ_TIMER
+        return _ReadTimer(self)
+
+    def add_latency(self, latency):
+        if self.latency_slo is None:
+            return
+        with self._lock:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += _LATENCY_WEIGHT * (latency - self.latency)
+            now = self.clock()
+            if now - self.last_adjust_time < _ADJUST_INTERVAL:
+                return
+            self.last_adjust_time = now
+            if self.latency > self.latency_slo:
+                self.factor = max(_MIN_FACTOR, self.factor / 2)
+            else:
+                self.factor = min(1.0, self.factor + _FACTOR_STEP)
+            factor = self.factor
+        if self.bytes_bucket is not None:
+            self.bytes_bucket.set_rate(self.bytes_rate * factor)
+        if self.ops_bucket is not None:
+            self.ops_bucket.set_rate(self.ops_rate * factor)
+
+    def _wait_for_window(self):
+        while self.windows:
+            now = datetime.datetime.now()
+            minute = now.hour * 60 + now.minute
+            if any(window.contains(minute) for window in self.windows):
+                return
+            minutes = min(window.get_minutes_to_start(minute)
+                          for window in self.windows)
+            seconds = minutes * 60 - now.second
+            with STATS.timer('throttle'):
+                self.sleep(min(max(seconds, 1), _MAX_WINDOW_SLEEP))
+
+
+def set_idle_priority():
+    # Put I/O of the process (and threads started later) into the idle
+    # class, so that it is served only when nobody else uses the disk.
+    import ctypes
+    import ctypes.util
+    import platform
+
+    syscall_number = _IOPRIO_SET_SYSCALLS.get(platform.machine())
+    if syscall_number is None or not sys.platform.startswith('linux'):
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+    except OSError:
+        return False
+    priority = _IOPRIO_CLASS_IDLE << _IOPRIO_CLASS_SHIFT
+    return libc.syscall(syscall_number, _IOPRIO_WHO_PROCESS, 0,
+                        priority) == 0
+
+
+SCHEDULER = IOScheduler()
@@ -0,0 +1,129 @@
+from array import array
+import os
+
+from module.tag import read_tags
+
+
+__all__ = ['TrackBatch', 'TrackInfo', 'read_track_info', 'TRACK_FIELDS', ]
+
+
+TRACK_FIELDS = (
+    'path', 'artist', 'album', 'title', 'genre',
+    'artwork_mime', 'artwork_size',
+)
+
+_STRING_FIELDS = ('artist', 'album', 'title', 'genre', 'artwork_mime', )
+
+
+class TrackInfo(object):
+    __slots__ = TRACK_FIELDS
+
+    def __init__(self, path, artist=None, album=None, title=None,
+                 genre=None, artwork_mime=None, artwork_size=0):
+        values = (path, artist, album, title, genre,
+                  artwork_mime, artwork_size)
+        for field, value in zip(TRACK_FIELDS, values):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, attr, value):
+        raise AttributeError(f"'{self.__class__.__name__}' object is "
+                             f"immutable")
+
+    def __delattr__(self, attr):
+        raise AttributeError(f"'{self.__class__.__name__}' object is "
+                             f"immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, TrackInfo):
+            return NotImplemented
+        return self.to_tuple() == other.to_tuple()
+
+    def __hash__(self):
+        return hash(self.to_tuple())
+
+    def __reduce__(self):
+        return TrackInfo, self.to_tuple()
+
+    def __repr__(self):
+        values = ', '.join(f'{field}={getattr(self, field)!r}'
+                           for field in TRACK_FIELDS)
+        return f'TrackInfo({values})'
+
+    def to_tuple(self):
+        return tuple(getattr(self, field) for field in TRACK_FIELDS)
+
+    @classmethod
+    def from_tag(cls, path, tag):
+        return cls(path, tag.artist, tag.album, tag.title, tag.genre,
+                   tag.artwork_mime, tag.artwork_size)
+
+
+class _StringPool(object):
+    def __init__(self):
+        # Id 0 stands for None
+        self.ids = {}
+        self.strings = [None]
+
+    def add(self, string):
+        if string is None:
+            return 0
+        string_id = self.ids.get(string)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.ids[string] = string_id
+            self.strings.append(string)
+        return string_id
+
+
+class TrackBatch(object):
+    # Tracks are stored in columns. Directories and tag values repeat a
+    # lot within a library, so they are kept once in a string pool and
+    # columns hold their ids only.
+    def __init__(self, tracks=()):
+        self.pool = _StringPool()
+        self.directories = array('I')
+        self.names = []
+        self.columns = {field: array('I') for field in _STRING_FIELDS}
+        self.artwork_sizes = array('q')
+        for track in tracks:
+            self.append(track)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        strings = self.pool.strings
+        path = os.path.join(strings[self.directories[index]],
+                            self.names[index])
+        values = [strings[self.columns[field][index]]
+                  for field in _STRING_FIELDS]
+        return TrackInfo(path, *values, self.artwork_sizes[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def append(self, track):
+        directory, name = os.path.split(track.path)
+        self.directories.append(self.pool.add(directory))
+        self.names.append(name)
+        for field in _STRING_FIELDS:
+            self.columns[field].append(self.pool.add(getattr(track, field)))
+        self.artwork_sizes.append(track.artwork_size)
+
+    def gen_values(self, field):
+        # Iterate over a single column without creating records
+        if field == 'artwork_size':
+            yield from self.artwork_sizes
+        elif field == 'path':
+            strings = self.pool.strings
+            for directory_id, name in zip(self.directories, self.names):
+                yield os.path.join(strings[directory_id], name)
+        else:
+            strings = self.pool.strings
+            for string_id in self.columns[field]:
+                yield strings[string_id]
+
+
+def read_track_info(filename):
+    return TrackInfo.from_tag(filename, read_tags(filename))
@@ -0,0 +1,235 @@
+import ctypes
+import ctypes.util
+import functools
+import os
+import select
+import struct
+import time
+
+from module.paths import walk_directories, WalkFilter
+from module.stats import STATS
+from module.tag import is_audio_supported
+
+
+__all__ = [
+    'DebounceQueue', 'InotifyWatcher', 'PollingWatcher',
+    'create_watcher', 'is_inotify_available', 'watch',
+]
+
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = (_IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+               _IN_CREATE | _IN_ONLYDIR)
+
+_EVENT_HEADER = struct.Struct('iIII')
+_READ_SIZE = 64 * 1024
+
+
+@functools.lru_cache(maxsize=None)
+def _get_libc():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                           use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, 'inotify_init1'):
+        return None
+    return libc
+
+
+def is_inotify_available():
+    return _get_libc() is not None
+
+
+class DebounceQueue(object):
+    def __init__(self, delay):
+        self.delay = delay
+        self.pending = {}
+
+    def add(self, path, now):
+        # Events of a subtree postpone the whole subtree, so an album is
+        # processed once after it has been copied completely.
+        for pending_path in self.pending:
+            if _is_subpath(path, pending_path):
+                self.pending[pending_path] = now
+                return
+        for pending_path in list(self.pending):
+            if _is_subpath(pending_path, path):
+                del self.pending[pending_path]
+        self.pending[path] = now
+
+    def pop_ready(self, now):
+        ready = sorted(path for path, last_time in self.pending.items()
+                       if now - last_time >= self.delay)
+        for path in ready:
+            del self.pending[path]
+        return ready
+
+    def get_timeout(self, now):
+        if not self.pending:
+            return None
+        oldest_time = min(self.pending.values())
+        return max(0.0, oldest_time + self.delay - now)
+
+
+def _is_subpath(path, directory):
+    return path == directory or path.startswith(
+        os.path.join(directory, ''))
+
+
+class InotifyWatcher(object):
+    def __init__(self, directory, walk_filter=None):
+        libc = _get_libc()
+        if libc is None:
+            raise OSError('inotify is not available')
+        self.libc = libc
+        self.directory = directory
+        self.walk_filter = walk_filter or WalkFilter()
+        self.paths = {}
+        self.fd = libc.inotify_init1(_IN_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self._add_tree(directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def wait(self, timeout):
+        # Return paths of directories whose content was changed
+        readable, _, _ = select.select((self.fd, ), (), (), timeout)
+        if not readable:
+            return []
+        changed = []
+        data = os.read(self.fd, _READ_SIZE)
+        pos = 0
+        while pos + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+            pos += _EVENT_HEADER.size
+            name = data[pos:pos + length].rstrip(b'\0')
+            pos += length
+            changed.extend(self._handle_event(wd, mask, os.fsdecode(name)))
+        return list(dict.fromkeys(changed))
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def _handle_event(self, wd, mask, name):
+        if mask & _IN_Q_OVERFLOW:
+            return [self.directory]
+        if mask & _IN_IGNORED:
+            self.paths.pop(wd, None)
+            return []
+        parent = self.paths.get(wd)
+        if parent is None:
+            return []
+        path = os.path.join(parent, name)
+        if mask & _IN_ISDIR:
+            if mask & _IN_MOVED_FROM or \
+                    not self.walk_filter.is_dir_allowed(name):
+                return []
+            # Directories created or moved in are watched from now on,
+            # their content is processed as a whole.
+            self._add_tree(path)
+            return [path]
+        # Files are reported once they are written or moved in
+        if mask & _IN_CREATE or is_audio_supported(name) and \
+                not self.walk_filter.is_file_allowed(name):
+            return []
+        return [parent]
+
+    def _add_tree(self, directory):
+        for record in walk_directories(directory, self.walk_filter):
+            wd = self.libc.inotify_add_watch(
+                self.fd, os.fsencode(record.path), _WATCH_MASK)
+            if wd >= 0:
+                self.paths[wd] = record.path
+
+
+class PollingWatcher(object):
+    def __init__(self, directory, walk_filter=None, interval=2.0):
+        self.directory = directory
+        self.walk_filter = walk_filter or WalkFilter()
+        self.interval = interval
+        self.snapshot = self._take_snapshot()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def wait(self, timeout):
+        if timeout is None or timeout > self.interval:
+            timeout = self.interval
+        time.sleep(timeout)
+        snapshot = self._take_snapshot()
+        changed = [path for path, files in snapshot.items()
+                   if self.snapshot.get(path) != files]
+        self.snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+    def _take_snapshot(self):
+        # Changed subdirectories are reported by themselves, so only files
+        # make up the state of a directory.
+        snapshot = {}
+        for record in walk_directories(self.directory, self.walk_filter):
+            files = set()
+            for filename in record.files:
+                try:
+                    stat_result = record.entries[
+                        os.path.basename(filename)].stat()
+                except OSError:
+                    continue
+                files.add((filename, stat_result.st_size,
+                           stat_result.st_mtime_ns))
+            snapshot[record.path] = frozenset(files)
+        return snapshot
+
+
+def create_watcher(directory, walk_filter=None, polling=False,
+                   interval=2.0):
+    if not polling and is_inotify_available():
+        try:
+            return InotifyWatcher(directory, walk_filter)
+        except OSError:
+            pass
+    return PollingWatcher(directory, walk_filter, interval)
+
+
+def watch(directory, process, walk_filter=None, delay=5.0, polling=False,
+          interval=2.0):
+    # process(path) is called for every changed subtree once no events
+    # happened in it for delay seconds. A subtree failing to be processed
+    # does not stop watching the others.
+    queue = DebounceQueue(delay)
+    with create_watcher(directory, walk_filter, polling,
+                        interval) as watcher:
+        while True:
+            for path in watcher.wait(queue.get_timeout(time.monotonic())):
+                queue.add(path, time.monotonic())
+            for path in queue.pop_ready(time.monotonic()):
+                if not os.path.isdir(path):
+                    continue
+                try:
+                    process(path)
+                except Exception as e:
+                    STATS.add_error(e)
+                    print(f'[watch] Unable to process {path}: {e}')
@@ -0,0 +1,70 @@
+from collections import deque
+import os
+import threading
+import time
+
+
+__all__ = ['WorkerStats', 'run_tasks', ]
+
+
+class WorkerStats(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.items = {}
+        self.busy_time = {}
+
+    def record(self, worker, elapsed):
+        with self._lock:
+            self.items[worker] = self.items.get(worker, 0) + 1
+            self.busy_time[worker] = self.busy_time.get(worker, 0) + elapsed
+
+    def gen_report(self):
+        for worker in sorted(self.items):
+            count = self.items[worker]
+            busy_time = self.busy_time[worker]
+            rate = count / busy_time if busy_time else 0
+            yield worker, count, rate
+
+
+def _get_worker_name():
+    thread_name = threading.current_thread().name
+    return f'{os.getpid()}:{thread_name}'
+
+
+def _call(function, item):
+    start_time = time.perf_counter()
+    result = function(item)
+    elapsed = time.perf_counter() - start_time
+    return result, _get_worker_name(), elapsed
+
+
+def run_tasks(function, items, jobs=1, processes=False, stats=None):
+    if jobs <= 1:
+        for item in items:
+            result, worker, elapsed = _call(function, item)
+            if stats is not None:
+                stats.record(worker, elapsed)
+            yield result
+        return
+
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    # Keep a bounded window of pending tasks so huge libraries are not
+    # submitted to the pool all at once.
+    max_pending = jobs * 4
+    pending = deque()
+    with executor_class(max_workers=jobs) as executor:
+        for item in items:
+            pending.append(executor.submit(_call, function, item))
+            if len(pending) >= max_pending:
+                yield _pop_result(pending, stats)
+        while pending:
+            yield _pop_result(pending, stats)
+
+
+def _pop_result(pending, stats):
+    result, worker, elapsed = pending.popleft().result()
+    if stats is not None:
+        stats.record(worker, elapsed)
+    return result
@@ -0,0 +1,67 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from module.aio import run_pipeline
+from module.paths import gen_audio_files, WalkFilter
+
+
+class RunPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for parts in (
+            ('Artist 1', 'Album 1', '01.flac'),
+            ('Artist 1', 'Album 1', '02.flac'),
+            ('Artist 1', 'Album 2', 'CD1', '01.mp3'),
+            ('Artist 2', 'Album 1', '01.ogg'),
+            ('Artist 2', 'Album 1', 'cover.jpg'),
+        ):
+            path = os.path.join(self.temp_dir, *parts)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_all_items_processed(self):
+        written = []
+        results = []
+        threads = set()
+
+        def read_item(filename):
+            return filename, filename.endswith('.flac')
+
+        def on_result(result):
+            threads.add(threading.current_thread())
+            results.append(result)
+
+        run_pipeline(self.temp_dir, lambda record: record.audio_files,
+                     read_item, written.append, on_result,
+                     meta_limit=2, write_limit=1)
+        expected = list(gen_audio_files(self.temp_dir))
+        self.assertEqual(sorted(results), sorted(expected))
+        self.assertEqual(
+            sorted(written),
+            sorted(path for path in expected if path.endswith('.flac')))
+        self.assertEqual(threads, {threading.current_thread()})
+
+    def test_walk_filter(self):
+        results = []
+        run_pipeline(self.temp_dir, lambda record: record.audio_files,
+                     lambda item: (item, False), None, results.append,
+                     walk_filter=WalkFilter(max_depth=2))
+        self.assertEqual(len(results), 3)
+
+    def test_error_propagated(self):
+        def read_item(filename):
+            raise IOError(filename)
+
+        with self.assertRaises(IOError):
+            run_pipeline(self.temp_dir, lambda record: record.audio_files,
+                         read_item, None, lambda result: None)
+
+
+if '__main__' == __name__:
+    unittest.main()
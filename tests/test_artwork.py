@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import ArtworkCache, create_artwork
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class ArtworkCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cover_paths = []
+        for name in ('cd1.jpg', 'cd2.jpg'):
+            path = os.path.join(self.temp_dir, name)
+            shutil.copy(COVER_EXAMPLE_PATH, path)
+            self.cover_paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_identical_covers_are_shared(self):
+        cache = ArtworkCache()
+        artworks = [cache.get(path) for path in self.cover_paths]
+        self.assertIs(artworks[0], artworks[1])
+        self.assertEqual(artworks[0], create_artwork(COVER_EXAMPLE_PATH))
+        self.assertEqual(cache.size, artworks[0].size)
+
+    def test_cache_size_is_bounded(self):
+        with open(self.cover_paths[1], 'ab') as fd:
+            fd.write(b'\0')
+        cache = ArtworkCache(max_size=1)
+        for path in self.cover_paths:
+            cache.get(path)
+        self.assertEqual(cache.size, os.path.getsize(self.cover_paths[1]))
+
+
+if '__main__' == __name__:
+    unittest.main()
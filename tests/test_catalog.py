@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.catalog import Catalog, get_catalog_row
+from module.tag import read_tags
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+
+
+class CatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.audio_dir = os.path.join(self.temp_dir, 'audio')
+        shutil.copytree(AUDIO_EXAMPLES_DIR, self.audio_dir)
+        self.catalog_filename = os.path.join(self.temp_dir, 'catalog.db')
+        with Catalog(self.catalog_filename) as catalog:
+            for name in ('1.flac', '1.mp3', '2.m4a', '3.ogg'):
+                filename = os.path.join(self.audio_dir, name)
+                catalog.add(get_catalog_row(filename, read_tags(filename)))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def query_names(self, where, directory=None):
+        with Catalog(self.catalog_filename, read_only=True) as catalog:
+            return [os.path.basename(row['path'])
+                    for row in catalog.query(where, directory)]
+
+    def test_query(self):
+        self.assertEqual(self.query_names('1'),
+                         ['1.flac', '1.mp3', '2.m4a', '3.ogg'])
+        self.assertEqual(self.query_names("format = 'mp3'"), ['1.mp3'])
+        self.assertEqual(self.query_names('album IS NULL'), ['2.m4a'])
+        self.assertEqual(self.query_names('artwork_mime IS NOT NULL'),
+                         ['3.ogg'])
+        self.assertEqual(self.query_names('1', self.temp_dir + 'x'), [])
+
+    def test_row(self):
+        with Catalog(self.catalog_filename, read_only=True) as catalog:
+            row = catalog.query("format = 'ogg'").fetchone()
+        filename = os.path.join(self.audio_dir, '3.ogg')
+        self.assertEqual(row['path'], os.path.abspath(filename))
+        self.assertEqual(row['directory'], os.path.abspath(self.audio_dir))
+        self.assertEqual(row['size'], os.path.getsize(filename))
+        self.assertEqual(row['artist'], 'Test Artist')
+        self.assertEqual(row['artwork_mime'], 'image/jpeg')
+        self.assertGreater(row['artwork_size'], 0)
+
+    def test_clear(self):
+        with Catalog(self.catalog_filename) as catalog:
+            catalog.clear(self.audio_dir)
+        self.assertEqual(self.query_names('1'), [])
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.checkpoint import Checkpoint, CheckpointError, read_checkpoint
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.temp_dir, 'checkpoint.jsonl')
+        self.album_dir = os.path.join(self.temp_dir, 'Album')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_resume(self):
+        with Checkpoint(self.filename, 'tags', self.temp_dir) as checkpoint:
+            checkpoint.mark_done(self.album_dir)
+            checkpoint.log_rename(os.path.join(self.album_dir, 'a'),
+                                  os.path.join(self.album_dir, 'b'))
+        self.assertFalse(checkpoint.completed)
+
+        with Checkpoint(self.filename, 'tags', self.temp_dir,
+                        resume=True) as checkpoint:
+            self.assertTrue(checkpoint.is_done(self.album_dir))
+            self.assertFalse(checkpoint.is_done(self.temp_dir))
+            checkpoint.complete()
+
+        state = read_checkpoint(self.filename)
+        self.assertTrue(state.completed)
+        self.assertEqual(state.renames, [(
+            os.path.join(self.album_dir, 'a'),
+            os.path.join(self.album_dir, 'b'))])
+
+    def test_resume_other_run(self):
+        Checkpoint(self.filename, 'tags', self.temp_dir).close()
+        with self.assertRaises(CheckpointError):
+            Checkpoint(self.filename, 'artwork', self.temp_dir, resume=True)
+        with self.assertRaises(CheckpointError):
+            Checkpoint(self.filename, 'tags', self.album_dir, resume=True)
+
+    def test_unfinished_run(self):
+        Checkpoint(self.filename, 'tags', self.temp_dir).close()
+        with self.assertRaises(CheckpointError):
+            Checkpoint(self.filename, 'tags', self.temp_dir)
+
+        with Checkpoint(self.filename, 'tags', self.temp_dir,
+                        resume=True) as checkpoint:
+            checkpoint.complete()
+        Checkpoint(self.filename, 'rename', self.temp_dir).close()
+
+    def test_truncated_entry(self):
+        with Checkpoint(self.filename, 'rename', self.temp_dir) as checkpoint:
+            checkpoint.log_rename('a', 'b')
+        with open(self.filename, 'a', encoding='utf-8') as fd:
+            fd.write('{"type": "rena')
+        self.assertEqual(len(read_checkpoint(self.filename).renames), 1)
+
+    def test_rollback_entry(self):
+        with Checkpoint(self.filename, 'rename', self.temp_dir) as checkpoint:
+            checkpoint.log_rename('a', 'b')
+            checkpoint.log_rollback()
+            checkpoint.log_rename('c', 'd')
+        renames = read_checkpoint(self.filename).renames
+        self.assertEqual([os.path.basename(path) for path, _ in renames],
+                         ['c'])
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,76 @@
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import Artwork, ArtworkCache
+from module.cover import CoverOptimizer, CoverOptions, is_optimizer_available
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipUnless(is_optimizer_available(), 'Pillow is not installed')
+class CoverOptimizerTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def create_png(self, size):
+        output = BytesIO()
+        Image.new('RGBA', size, (200, 100, 50, 255)).save(output, 'PNG')
+        return Artwork('image/png', output.getvalue())
+
+    def test_downscale_and_convert(self):
+        options = CoverOptions(max_dimension=100, png_to_jpeg=True)
+        optimizer = CoverOptimizer(options, self.cache_dir)
+        artwork = optimizer.optimize(self.create_png((400, 200)))
+        self.assertEqual(artwork.mime, 'image/jpeg')
+        image = Image.open(BytesIO(artwork.data))
+        self.assertEqual(image.format, 'JPEG')
+        self.assertEqual(image.size, (100, 50))
+
+    def test_small_cover_kept(self):
+        options = CoverOptions(max_dimension=1000)
+        optimizer = CoverOptimizer(options)
+        source = self.create_png((10, 10))
+        self.assertEqual(optimizer.optimize(source), source)
+
+    def test_cache(self):
+        options = CoverOptions(max_dimension=100, png_to_jpeg=True)
+        source = self.create_png((400, 400))
+        CoverOptimizer(options, self.cache_dir).optimize(source)
+        cached_paths = [
+            os.path.join(dirpath, filename)
+            for dirpath, _, filenames in os.walk(self.cache_dir)
+            for filename in filenames]
+        self.assertEqual(len(cached_paths), 1)
+
+        with open(cached_paths[0], 'wb') as fd:
+            fd.write(b'cached')
+        artwork = CoverOptimizer(options, self.cache_dir).optimize(source)
+        self.assertEqual(artwork.data, b'cached')
+
+        other_options = CoverOptions(max_dimension=50, png_to_jpeg=True)
+        artwork = CoverOptimizer(
+            other_options, self.cache_dir).optimize(source)
+        self.assertNotEqual(artwork.data, b'cached')
+
+    def test_artwork_cache(self):
+        cover_path = os.path.join(self.temp_dir, 'cover.png')
+        with open(cover_path, 'wb') as fd:
+            fd.write(self.create_png((400, 400)).data)
+        optimizer = CoverOptimizer(CoverOptions(max_dimension=100))
+        artwork = ArtworkCache(optimizer=optimizer).get(cover_path)
+        self.assertEqual(artwork.mime, 'image/png')
+        self.assertEqual(Image.open(BytesIO(artwork.data)).size, (100, 100))
+
+
+if '__main__' == __name__:
+    unittest.main()
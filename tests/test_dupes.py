@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import Artwork
+from module.dupes import DupeIndex, get_track_key, hash_audio_payload
+from module.tag import get_tags
+from module.track import TrackInfo
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+
+
+class HashAudioPayloadTest(unittest.TestCase):
+    def setUp(self):
+        self.formats = ('flac', 'm4a', 'mp3', 'ogg')
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_tags_ignored(self):
+        artwork = Artwork('image/png', b'\x89PNG' * 64 * 1024)
+        for audio_format in self.formats:
+            filename = os.path.join(self.temp_dir, f'1.{audio_format}')
+            shutil.copy(
+                os.path.join(AUDIO_EXAMPLES_DIR, f'1.{audio_format}'),
+                filename)
+            digest = hash_audio_payload(filename)
+            size = os.path.getsize(filename)
+
+            tag = get_tags(filename)
+            tag.title = 'Another Title'
+            tag.artwork = artwork
+            tag.save()
+            self.assertNotEqual(os.path.getsize(filename), size)
+            self.assertEqual(hash_audio_payload(filename), digest)
+
+    def test_payload_compared(self):
+        filename = os.path.join(self.temp_dir, '1.mp3')
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '1.mp3'), filename)
+        digest = hash_audio_payload(filename)
+        with open(filename, 'r+b') as fd:
+            fd.seek(-200, os.SEEK_END)
+            fd.write(b'\xff')
+        self.assertNotEqual(hash_audio_payload(filename), digest)
+
+
+class DupeIndexTest(unittest.TestCase):
+    def test_track_key(self):
+        tag = get_tags(os.path.join(AUDIO_EXAMPLES_DIR, '1.flac'))
+        self.assertEqual(get_track_key(tag),
+                         ('test artist', 'test album', 'test title'))
+        tag.title = ''
+        self.assertIsNone(get_track_key(tag))
+
+    def test_groups(self):
+        dupe_index = DupeIndex()
+        dupe_index.add(TrackInfo('a.flac'), 300, key=('a', 'b', 'c'),
+                       digest='1')
+        dupe_index.add(TrackInfo('a.mp3'), 100, key=('a', 'b', 'c'),
+                       digest='2')
+        dupe_index.add(TrackInfo('b.mp3'), 100, key=('a', 'b', 'd'),
+                       digest='2')
+        self.assertEqual(list(dupe_index.gen_track_groups()), [
+            (('a', 'b', 'c'), [('a.flac', 300), ('a.mp3', 100)], 100),
+        ])
+        self.assertEqual(list(dupe_index.gen_payload_groups()), [
+            ('2', [('a.mp3', 100), ('b.mp3', 100)], 100),
+        ])
+        self.assertEqual(dupe_index.get_reclaimable_size(), 200)
+
+    def test_reclaimable_size(self):
+        # A pair having the same tags and the same audio is counted once
+        dupe_index = DupeIndex()
+        dupe_index.add(TrackInfo('a.flac'), 300, key=('a', 'b', 'c'),
+                       digest='1')
+        dupe_index.add(TrackInfo('b.flac'), 200, key=('a', 'b', 'c'),
+                       digest='1')
+        self.assertEqual(len(list(dupe_index.gen_track_groups())), 1)
+        self.assertEqual(len(list(dupe_index.gen_payload_groups())), 1)
+        self.assertEqual(dupe_index.get_reclaimable_size(), 200)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import create_artwork
+from module.extract import EmbeddedPicture, extract_cover, has_cover_file
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class ExtractCoverTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cover = create_artwork(COVER_EXAMPLE_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_embedded_picture(self):
+        for ext in ('flac', 'm4a', 'mp3', 'ogg'):
+            filename = os.path.join(AUDIO_EXAMPLES_DIR, f'3.{ext}')
+            with EmbeddedPicture(filename) as picture:
+                self.assertEqual(picture.mime, self.cover.mime)
+                self.assertEqual(bytes(picture.data), self.cover.data)
+                self.assertEqual(picture.get_digest(), self.cover.digest)
+            self.assertIsNone(picture.data)
+
+            filename = os.path.join(AUDIO_EXAMPLES_DIR, f'1.{ext}')
+            with EmbeddedPicture(filename) as picture:
+                self.assertIsNone(picture.data)
+
+    def test_extract_cover(self):
+        audio_files = []
+        for name in ('1.mp3', '3.flac', '3.m4a'):
+            filename = os.path.join(self.temp_dir, name)
+            shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, name), filename)
+            audio_files.append(filename)
+        cover_filename, picture_count = extract_cover(self.temp_dir,
+                                                      audio_files)
+        self.assertEqual(cover_filename,
+                         os.path.join(self.temp_dir, 'cover.jpg'))
+        self.assertEqual(picture_count, 1)
+        self.assertEqual(create_artwork(cover_filename), self.cover)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['1.mp3', '3.flac', '3.m4a', 'cover.jpg'])
+
+        self.assertEqual(extract_cover(self.temp_dir, audio_files[:1]),
+                         (None, 0))
+
+    def test_existing_cover(self):
+        filename = os.path.join(self.temp_dir, '3.flac')
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '3.flac'), filename)
+        self.assertFalse(has_cover_file(self.temp_dir))
+        cover_filename = os.path.join(self.temp_dir, 'cover.jpg')
+        with open(cover_filename, 'wb') as fd:
+            fd.write(b'own cover')
+        self.assertTrue(has_cover_file(self.temp_dir))
+
+        with self.assertRaises(FileExistsError):
+            extract_cover(self.temp_dir, [filename])
+        with open(cover_filename, 'rb') as fd:
+            self.assertEqual(fd.read(), b'own cover')
+        self.assertEqual(sorted(os.listdir(self.temp_dir)),
+                         ['3.flac', 'cover.jpg'])
+
+    @unittest.skipUnless(os.path.exists('/dev/full'), 'requires /dev/full')
+    def test_failed_write(self):
+        filename = os.path.join(self.temp_dir, '3.flac')
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '3.flac'), filename)
+        # Writes of the temporary file fail as on a full disk
+        os.symlink('/dev/full',
+                   os.path.join(self.temp_dir, '.cover.jpg.extract'))
+        with self.assertRaises(OSError):
+            extract_cover(self.temp_dir, [filename])
+        self.assertEqual(os.listdir(self.temp_dir), ['3.flac'])
+
+
+if '__main__' == __name__:
+    unittest.main()
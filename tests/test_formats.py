@@ -0,0 +1,117 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+
+from mutagen.ogg import OggPage
+
+from module.dupes import hash_audio_payload
+from module.formats import detect_format
+from module.tag import (
+    get_tags, is_audio_supported, read_tags, register_format, TagLoadError,
+    unregister_format)
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+
+
+def _create_ogg_page(packets, sequence, position, first=False, last=False):
+    page = OggPage()
+    page.serial = 1
+    page.sequence = sequence
+    page.position = position
+    page.packets = packets
+    page.first = first
+    page.last = last
+    return page.write()
+
+
+def _create_opus_file(filename, title):
+    head = b'OpusHead\x01\x01' + struct.pack('<HIhB', 312, 48000, 0, 0)
+    comment = f'TITLE={title}'.encode('utf-8')
+    tags = (b'OpusTags' + struct.pack('<I', 4) + b'test' +
+            struct.pack('<II', 1, len(comment)) + comment)
+    with open(filename, 'wb') as fd:
+        fd.write(_create_ogg_page([head], 0, 0, first=True))
+        fd.write(_create_ogg_page([tags], 1, 0))
+        fd.write(_create_ogg_page([b'\xfc\xff\xfe'], 2, 960, last=True))
+
+
+class FormatDetectionTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_examples(self):
+        formats = {'flac': 'flac', 'ogg': 'vorbis', 'mp3': 'mp3',
+                   'm4a': 'mp4'}
+        for ext, format_name in formats.items():
+            filename = os.path.join(AUDIO_EXAMPLES_DIR, f'1.{ext}')
+            self.assertEqual(detect_format(filename), format_name)
+
+    def test_misnamed_file(self):
+        for ext in ('flac', 'm4a'):
+            filename = os.path.join(self.temp_dir, f'{ext}.MP3')
+            shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, f'1.{ext}'),
+                        filename)
+            self.assertTrue(is_audio_supported(filename))
+            self.assertEqual(get_tags(filename).title, 'Test Title')
+            self.assertEqual(read_tags(filename).title, 'Test Title')
+
+    def test_unknown_file(self):
+        filename = os.path.join(self.temp_dir, 'notes.txt')
+        with open(filename, 'wb') as fd:
+            fd.write(b'plain text notes')
+        self.assertFalse(is_audio_supported(filename))
+        with self.assertRaises(TagLoadError):
+            get_tags(filename)
+
+    def test_corrupt_file(self):
+        for name, content in (('x.flac', b'\x01' * 64),
+                              ('y.flac', b'fLaC' + b'\xff' * 64),
+                              ('z.m4a', b'\0\0\0\x10ftypM4A ' + b'\xff' * 8)):
+            filename = os.path.join(self.temp_dir, name)
+            with open(filename, 'wb') as fd:
+                fd.write(content)
+            with self.assertRaises(TagLoadError):
+                get_tags(filename)
+        filename = os.path.join(self.temp_dir, 'x.flac')
+        self.assertIsNone(detect_format(filename))
+        with self.assertRaises(TagLoadError):
+            read_tags(filename)
+
+    def test_opus(self):
+        filename = os.path.join(self.temp_dir, '1.opus')
+        _create_opus_file(filename, 'Opus Title')
+        self.assertEqual(detect_format(filename), 'opus')
+        digest = hash_audio_payload(filename)
+
+        tag = get_tags(filename)
+        self.assertEqual(tag.title, 'Opus Title')
+        tag.title = 'New Title'
+        tag.save()
+        self.assertEqual(read_tags(filename).header['title'], 'New Title')
+        self.assertEqual(hash_audio_payload(filename), digest)
+
+    def test_plugin(self):
+        class TextWrapper(object):
+            def __init__(self, filename):
+                with open(filename, encoding='utf-8') as fd:
+                    self.title = fd.read()
+
+        register_format('text', ('.tag', ),
+                        lambda head, has_id3: head[:4] == b'TAG:',
+                        TextWrapper)
+        self.addCleanup(unregister_format, 'text')
+        filename = os.path.join(self.temp_dir, 'track.tag')
+        with open(filename, 'w', encoding='utf-8') as fd:
+            fd.write('TAG:title')
+        self.assertTrue(is_audio_supported(filename))
+        self.assertEqual(get_tags(filename).title, 'TAG:title')
+
+
+if '__main__' == __name__:
+    unittest.main()
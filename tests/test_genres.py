@@ -0,0 +1,60 @@
+import io
+import json
+import unittest
+
+from module.genres import GenreCollector, write_genres
+
+
+class GenreCollectorTest(unittest.TestCase):
+    def setUp(self):
+        self.tracks = (
+            ('Rock', '/music/b'), ('Jazz', '/music/c'), ('Rock', '/music/a'),
+            ('Rock', '/music/b'), ('Blues', '/music/c'), ('Rock', '/music/a'),
+            ('Rock', '/music/b'),
+        )
+        self.expected_items = [
+            ('Blues', '/music/c', 1), ('Jazz', '/music/c', 1),
+            ('Rock', '/music/a', 2), ('Rock', '/music/b', 3),
+        ]
+
+    def test_in_memory_collect(self):
+        with GenreCollector() as collector:
+            for genre, directory in self.tracks:
+                collector.add(genre, directory)
+            self.assertEqual(list(collector.gen_items()),
+                             self.expected_items)
+            self.assertFalse(collector.run_filenames)
+
+    def test_spilled_collect(self):
+        with GenreCollector(memory_limit=1) as collector:
+            for genre, directory in self.tracks:
+                collector.add(genre, directory)
+            self.assertTrue(collector.run_filenames)
+            self.assertEqual(list(collector.gen_items()),
+                             self.expected_items)
+
+    def test_text_format(self):
+        with GenreCollector(memory_limit=1) as collector:
+            for genre, directory in self.tracks:
+                collector.add(genre, directory)
+            fd = io.StringIO()
+            write_genres(fd, collector, 'text')
+        expected = ('Blues\n/music/c\n\nJazz\n/music/c\n\n'
+                    'Rock\n/music/a\n/music/b\n\n')
+        self.assertEqual(fd.getvalue(), expected)
+
+    def test_json_format(self):
+        with GenreCollector() as collector:
+            for genre, directory in self.tracks:
+                collector.add(genre, directory)
+            fd = io.StringIO()
+            write_genres(fd, collector, 'json')
+        genres = json.loads(fd.getvalue())
+        self.assertEqual([item['genre'] for item in genres],
+                         ['Blues', 'Jazz', 'Rock'])
+        self.assertEqual(genres[2]['tracks'], 5)
+        self.assertEqual(genres[2]['directory_count'], 2)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import create_artwork
+from module.header import read_header
+from module.tag import get_tags, read_tags, TagError
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class HeaderReaderTest(unittest.TestCase):
+    def setUp(self):
+        self.formats = ('flac', 'm4a', 'mp3', 'ogg')
+        self.names = ('1', '2', '3')
+        self.tag_keys = ('artist', 'album', 'title', 'genre')
+
+    def test_header_matches_tags(self):
+        for filename in self._gen_filenames(AUDIO_EXAMPLES_DIR):
+            header = read_header(filename)
+            tag = get_tags(filename)
+            for key in self.tag_keys:
+                self.assertEqual(header[key], getattr(tag, key))
+            self.assertEqual(header['artwork_mime'], tag.artwork_mime)
+            self.assertEqual(header['artwork_size'], tag.artwork_size)
+
+    def test_artwork_info(self):
+        cover = create_artwork(COVER_EXAMPLE_PATH)
+        for ext in self.formats:
+            filename = os.path.join(AUDIO_EXAMPLES_DIR, f'3.{ext}')
+            tag = read_tags(filename)
+            self.assertEqual(tag.artwork_mime, cover.mime)
+            self.assertEqual(tag.artwork_size, cover.size)
+            self.assertIsNone(tag.wrapper)
+            self.assertEqual(tag.artwork, cover)
+
+    def test_lazy_upgrade_on_write(self):
+        temp_dir = tempfile.mkdtemp()
+        shutil.copytree(AUDIO_EXAMPLES_DIR, temp_dir, dirs_exist_ok=True)
+        for filename in self._gen_filenames(temp_dir):
+            tag = read_tags(filename)
+            self.assertIsNone(tag.wrapper)
+            tag.title = 'Write Test Title'
+            self.assertIsNotNone(tag.wrapper)
+            tag.save()
+            self.assertEqual(read_tags(filename).title, 'Write Test Title')
+        shutil.rmtree(temp_dir)
+
+    def test_reading_wrong_data(self):
+        tag = read_tags(os.path.join(AUDIO_EXAMPLES_DIR, '1.flac'))
+        with self.assertRaises(TagError):
+            getattr(tag, 'wrong_key')
+
+    def _gen_filenames(self, directory):
+        for name in self.names:
+            for ext in self.formats:
+                yield os.path.join(directory, f'{name}.{ext}')
+
+
+if '__main__' == __name__:
+    unittest.main()
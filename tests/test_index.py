@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import create_artwork
+from module.index import get_index_values, ScanIndex
+from module.tag import get_tags
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class ScanIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        shutil.copytree(AUDIO_EXAMPLES_DIR, self.temp_dir, dirs_exist_ok=True)
+        self.filename = os.path.join(self.temp_dir, '3.flac')
+        self.index = ScanIndex(os.path.join(self.temp_dir, 'index.db'))
+        self.index.update(self.filename,
+                          get_index_values(get_tags(self.filename)))
+
+    def tearDown(self):
+        self.index.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_lookup(self):
+        row = self.index.lookup(self.filename)
+        self.assertEqual(row['artist'], 'Test Artist')
+        self.assertEqual(row['album'], 'Test Album')
+        self.assertTrue(row['has_artwork'])
+
+    def test_artwork_digest(self):
+        self.assertIsNone(self.index.lookup(self.filename)['artwork_digest'])
+        artwork = create_artwork(COVER_EXAMPLE_PATH)
+        tag = get_tags(self.filename)
+        self.index.update(self.filename, get_index_values(tag, artwork))
+        self.assertEqual(self.index.lookup(self.filename)['artwork_digest'],
+                         artwork.digest)
+
+    def test_lookup_modified_file(self):
+        with open(self.filename, 'ab') as fd:
+            fd.write(b'\0')
+        self.assertIsNone(self.index.lookup(self.filename))
+
+    def test_invalidate(self):
+        self.assertEqual(self.index.invalidate(self.temp_dir), 1)
+        self.assertIsNone(self.index.lookup(self.filename))
+
+    def test_case_sensitive_paths(self):
+        filenames = []
+        for name in ('Rock', 'rock'):
+            directory = os.path.join(self.temp_dir, name)
+            os.mkdir(directory)
+            filename = os.path.join(directory, '1.flac')
+            shutil.copy(self.filename, filename)
+            self.index.update(filename, get_index_values(get_tags(filename)))
+            filenames.append(filename)
+        upper_dir = os.path.dirname(filenames[0])
+        self.assertEqual(self.index.get_stats(upper_dir)['files'], 1)
+        self.assertEqual(self.index.invalidate(upper_dir), 1)
+        self.assertIsNone(self.index.lookup(filenames[0]))
+        self.assertIsNotNone(self.index.lookup(filenames[1]))
+
+    def test_rename(self):
+        new_filename = os.path.join(self.temp_dir, 'renamed.flac')
+        os.rename(self.filename, new_filename)
+        self.index.rename(self.filename, new_filename)
+        self.assertEqual(self.index.lookup(new_filename)['title'],
+                         'Test Title')
+
+    def test_stats(self):
+        stats = self.index.get_stats(self.temp_dir)
+        self.assertEqual(stats['files'], 1)
+        self.assertEqual(stats['with_artwork'], 1)
+        self.assertEqual(stats['total_size'], os.path.getsize(self.filename))
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -1,6 +1,15 @@
+import re
 import unittest
 
-from module.normalize import normalize_path, normalize_string
+from module.normalize import (
+    normalize_many, normalize_path, normalize_string, _WORDS_TO_REPLACE)
+
+
+def _normalize_string_sequentially(string):
+    for word in _WORDS_TO_REPLACE:
+        pattern = '(?<![-.:_&]) %s (?![(-])' % word.capitalize()
+        string = re.sub(pattern, ' %s ' % word, string)
+    return string
 
 
 class StringNormalizationTest(unittest.TestCase):
@@ -18,6 +27,12 @@ class StringNormalizationTest(unittest.TestCase):
             'Music\\2\\02 - The Rockafeller Skank',
             'Music\\Bring Me The Horizon': 'Music\\Bring Me the Horizon',
         }
+        self.compatibility_test_strings = (
+            'Fly Away A A A Way', 'Rise Of The The The Robots',
+            'One And The Other Or An Of', 'Live At The Apollo - The End',
+            'Back In The (Remix)', 'Up & The Up', 'Stand Up On It',
+            'Is It Is Is It', ' The ', 'The The', 'A', '',
+        )
 
     def test_path_normalization(self):
         for testing, expected in self.path_test_map.items():
@@ -29,6 +44,17 @@ class StringNormalizationTest(unittest.TestCase):
             actual = normalize_string(testing)
             self.assertEqual(actual, expected)
 
+    def test_sequential_compatibility(self):
+        for testing in self.compatibility_test_strings:
+            expected = _normalize_string_sequentially(testing)
+            actual = normalize_string(testing)
+            self.assertEqual(actual, expected)
+
+    def test_batch_normalization(self):
+        testing = list(self.string_test_map) + [None]
+        expected = list(self.string_test_map.values()) + [None]
+        self.assertEqual(normalize_many(testing), expected)
+
 
 if '__main__' == __name__:
     unittest.main()
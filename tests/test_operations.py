@@ -0,0 +1,77 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from audiotool import run_operations, OPERATIONS
+from module.artwork import create_artwork
+from module.tag import get_tags
+
+
+AUDIO_EXAMPLES_DIR = os.path.abspath(os.path.join('tests', 'audio_examples'))
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class RunOperationsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.library_dir = os.path.join(self.temp_dir, 'Library')
+        album_dir = os.path.join(self.library_dir, 'Live At The Apollo')
+        uncovered_dir = os.path.join(self.library_dir, 'Up In The Air')
+        os.makedirs(album_dir)
+        os.makedirs(uncovered_dir)
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '1.mp3'),
+                    os.path.join(album_dir, '01 - Back In The Day.mp3'))
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '1.flac'),
+                    os.path.join(album_dir, '02 - Out Of Time.flac'))
+        shutil.copy(COVER_EXAMPLE_PATH, os.path.join(album_dir, 'cover.jpg'))
+        shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, '2.flac'),
+                    os.path.join(uncovered_dir, '01 - Back In Time.flac'))
+
+        # Reports are written into the working directory
+        self.old_cwd = os.getcwd()
+        os.chdir(self.temp_dir)
+
+    def tearDown(self):
+        os.chdir(self.old_cwd)
+        shutil.rmtree(self.temp_dir)
+
+    def get_tree(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.library_dir)
+            for root, dirs, files in os.walk(self.library_dir)
+            for name in files)
+
+    def test_all_operations(self):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            run_operations(self.library_dir, OPERATIONS)
+
+        album_dir = os.path.join(self.library_dir, 'Live at the Apollo')
+        uncovered_dir = os.path.join(self.library_dir, 'Up in the Air')
+        self.assertEqual(self.get_tree(), [
+            os.path.join('Live at the Apollo', '01 - Back in the Day.mp3'),
+            os.path.join('Live at the Apollo', '02 - Out of Time.flac'),
+            os.path.join('Live at the Apollo', 'cover.jpg'),
+            os.path.join('Up in the Air', '01 - Back in Time.flac'),
+        ])
+
+        cover = create_artwork(COVER_EXAMPLE_PATH)
+        for name in ('01 - Back in the Day.mp3', '02 - Out of Time.flac'):
+            tag = get_tags(os.path.join(album_dir, name))
+            self.assertEqual(tag.artwork, cover)
+        tag = get_tags(os.path.join(uncovered_dir, '01 - Back in Time.flac'))
+        self.assertIsNone(tag.artwork)
+
+        # Reports hold paths after directories are renamed
+        lines = output.getvalue().splitlines()
+        self.assertIn(f'Uncovered: {uncovered_dir}', lines)
+        with open('genres.txt', encoding='utf-8') as fd:
+            self.assertEqual(fd.read(),
+                             f'Test Genre\n{album_dir}\n{uncovered_dir}\n\n')
+
+
+if '__main__' == __name__:
+    unittest.main()
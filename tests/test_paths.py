@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.paths import (
+    gen_audio_files, gen_directories, walk_directories, WalkFilter)
+
+
+class WalkDirectoriesTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_tree = (
+            ('Artist', 'Album 1', 'CD1', '01.flac'),
+            ('Artist', 'Album 1', 'CD1', 'cover.jpg'),
+            ('Artist', 'Album 1', 'CD2', '01.mp3'),
+            ('Artist', 'Album 2', '01.ogg'),
+            ('Artist', 'Album 2', '02.m4a'),
+            ('Artist', 'Album 2', 'notes.txt'),
+            ('Artist', 'Scans', 'back.png'),
+            ('Empty', ),
+        )
+        for parts in self.file_tree:
+            path = os.path.join(self.temp_dir, *parts)
+            if os.path.splitext(path)[1]:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                open(path, 'w').close()
+            else:
+                os.makedirs(path, exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_os_walk_compatibility(self):
+        expected = [root for root, _, _ in os.walk(self.temp_dir)]
+        actual = list(gen_directories(self.temp_dir))
+        self.assertEqual(actual, expected)
+
+        expected = [root for root, _, files in os.walk(self.temp_dir)
+                    if files]
+        actual = list(gen_directories(self.temp_dir, with_files=True))
+        self.assertEqual(actual, expected)
+
+    def test_records(self):
+        records = {os.path.relpath(record.path, self.temp_dir): record
+                   for record in walk_directories(self.temp_dir)}
+        record = records[os.path.join('Artist', 'Album 1', 'CD1')]
+        self.assertEqual([os.path.basename(path)
+                          for path in record.audio_files], ['01.flac'])
+        self.assertEqual([os.path.basename(path)
+                          for path in record.artwork_files], ['cover.jpg'])
+        self.assertEqual(record.depth, 3)
+        self.assertEqual(len(records['Artist'].subdirs), 3)
+
+    def test_filters(self):
+        walk_filter = WalkFilter(include=['*.flac', '*.mp3'],
+                                 exclude=['CD2'])
+        actual = [os.path.basename(path) for path in
+                  gen_audio_files(self.temp_dir, walk_filter=walk_filter)]
+        self.assertEqual(actual, ['01.flac'])
+
+        # Covers are found even if they do not match the globs
+        records = {os.path.basename(record.path): record for record in
+                   walk_directories(self.temp_dir, walk_filter)}
+        self.assertEqual(len(records['CD1'].artwork_files), 1)
+        self.assertEqual(len(records['CD1'].files), 2)
+
+        walk_filter = WalkFilter(max_depth=1)
+        actual = [os.path.relpath(path, self.temp_dir) for path in
+                  gen_directories(self.temp_dir, walk_filter=walk_filter)]
+        self.assertEqual(sorted(actual), ['.', 'Artist', 'Empty'])
+
+    def test_shards(self):
+        open(os.path.join(self.temp_dir, 'root.mp3'), 'w').close()
+        expected = sorted(gen_audio_files(self.temp_dir))
+        shards = []
+        for index in range(3):
+            walk_filter = WalkFilter(shard=(index, 3))
+            shards.append(list(gen_audio_files(self.temp_dir,
+                                               walk_filter=walk_filter)))
+        self.assertEqual(sorted(sum(shards, [])), expected)
+        self.assertIn(os.path.join(self.temp_dir, 'root.mp3'), shards[0])
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.plan import (
+    gen_directory_groups, get_dir_renames, make_paths_absolute, PlanWriter,
+    read_plan,
+    OP_ARTWORK, OP_RENAME_DIR, OP_RENAME_FILE, OP_TAGS)
+
+
+class PlanTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.album_dir = os.path.join(self.temp_dir, 'Album')
+        self.disc_dir = os.path.join(self.album_dir, 'CD1')
+        track_path = os.path.join(self.disc_dir, '1.flac')
+        self.entries = [
+            {'op': OP_RENAME_DIR, 'path': self.album_dir, 'target': 'x'},
+            {'op': OP_ARTWORK, 'path': track_path, 'cover': 'cover.jpg',
+             'size': 10},
+            {'op': OP_RENAME_DIR, 'path': self.disc_dir, 'target': 'y'},
+            {'op': OP_RENAME_FILE, 'path': track_path, 'target': 'z'},
+            {'op': OP_TAGS, 'path': track_path, 'tags': {'title': 'a'},
+             'size': 20},
+        ]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_plan_round_trip(self):
+        plan_path = os.path.join(self.temp_dir, 'plan.jsonl')
+        with PlanWriter(plan_path) as writer:
+            for entry in self.entries:
+                writer.write(entry)
+        self.assertEqual(writer.count, len(self.entries))
+        self.assertEqual(writer.size, 30)
+        self.assertEqual(list(read_plan(plan_path)), self.entries)
+        self.assertEqual(list(read_plan(plan_path, self.disc_dir)),
+                         self.entries[1:])
+
+    def test_absolute_paths(self):
+        entry = make_paths_absolute({'op': OP_ARTWORK, 'path': '1.flac',
+                                     'cover': 'cover.jpg', 'size': 10})
+        self.assertEqual(entry['path'], os.path.abspath('1.flac'))
+        self.assertEqual(entry['cover'], os.path.abspath('cover.jpg'))
+        self.assertEqual(entry['size'], 10)
+
+    def test_directory_groups(self):
+        groups = list(gen_directory_groups(self.entries))
+        self.assertEqual(len(groups), 1)
+        dirname, file_edits, renames = groups[0]
+        self.assertEqual(dirname, self.disc_dir)
+        self.assertEqual(len(file_edits), 1)
+        self.assertEqual(len(file_edits[0][1]), 2)
+        self.assertEqual(renames, [self.entries[3]])
+
+    def test_dir_renames_are_bottom_up(self):
+        renames = get_dir_renames(self.entries)
+        self.assertEqual([entry['path'] for entry in renames],
+                         [self.disc_dir, self.album_dir])
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.checkpoint import Checkpoint, read_checkpoint
+from module.rename import RenameBatch
+
+
+class RenameBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        for parts in (('A', 'B', 'c.mp3'), ('A', 'd.mp3'), ('A', 'D.flac')):
+            path = os.path.join(self.temp_dir, *parts)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            open(path, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_tree(self):
+        return sorted(os.path.relpath(os.path.join(root, name), self.temp_dir)
+                      for root, dirs, files in os.walk(self.temp_dir)
+                      for name in dirs + files)
+
+    def test_nested_renames(self):
+        checkpoint_path = os.path.join(self.temp_dir, 'checkpoint.jsonl')
+        old_tree = self.get_tree()
+        with Checkpoint(checkpoint_path, 'rename',
+                        self.temp_dir) as checkpoint:
+            batch = RenameBatch(checkpoint)
+            # Parents are added first, as a top-down walk does
+            batch.add(os.path.join(self.temp_dir, 'A'), 'a')
+            batch.add(os.path.join(self.temp_dir, 'A', 'B'), 'b')
+            batch.add(os.path.join(self.temp_dir, 'A', 'B', 'c.mp3'), 'C.mp3')
+            batch.add(os.path.join(self.temp_dir, 'A', 'd.mp3'), 'd.mp3')
+            self.assertEqual(len(batch.apply()), 3)
+        self.assertEqual(len(batch), 3)
+        self.assertIn(os.path.join('a', 'b', 'C.mp3'), self.get_tree())
+        self.assertEqual(len(read_checkpoint(checkpoint_path).renames), 3)
+
+        os.remove(checkpoint_path)
+        batch.revert()
+        self.assertEqual(self.get_tree(), old_tree)
+
+    def test_conflicts(self):
+        batch = RenameBatch()
+        batch.add(os.path.join(self.temp_dir, 'A', 'd.mp3'), 'D.flac')
+        batch.add(os.path.join(self.temp_dir, 'A', 'B'), 'x')
+        batch.add(os.path.join(self.temp_dir, 'A', 'D.flac'), 'x')
+        applied = batch.apply()
+        self.assertEqual([rename.name for rename in applied], ['x'])
+        errors = [rename.error for rename in batch.renames]
+        self.assertIn('already exists', errors[0])
+        self.assertIsNone(errors[1])
+        self.assertIn('another rename', errors[2])
+        self.assertTrue(os.path.exists(
+            os.path.join(self.temp_dir, 'A', 'D.flac')))
+
+
+if '__main__' == __name__:
+    unittest.main()
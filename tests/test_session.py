@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from module.artwork import Artwork, create_artwork
+from module.session import WriteSession
+from module.tag import get_tags
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+COVER_EXAMPLE_PATH = os.path.join(AUDIO_EXAMPLES_DIR, 'cover.jpg')
+
+
+class WriteSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.formats = ('flac', 'm4a', 'mp3', 'ogg')
+        self.temp_dir = tempfile.mkdtemp()
+        for audio_format in self.formats:
+            filename = f'1.{audio_format}'
+            shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, filename),
+                        os.path.join(self.temp_dir, filename))
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def get_filename(self, audio_format):
+        return os.path.join(self.temp_dir, f'1.{audio_format}')
+
+    def test_unchanged_values_skipped(self):
+        for audio_format in self.formats:
+            filename = self.get_filename(audio_format)
+            mtime_ns = os.stat(filename).st_mtime_ns
+            session = WriteSession(filename)
+            self.assertFalse(session.set('artist', 'Test Artist'))
+            self.assertFalse(session.changed)
+            self.assertEqual(session.commit(), 0)
+            self.assertEqual(os.stat(filename).st_mtime_ns, mtime_ns)
+
+    def test_changes_coalesced(self):
+        artwork = create_artwork(COVER_EXAMPLE_PATH)
+        for audio_format in self.formats:
+            filename = self.get_filename(audio_format)
+            with WriteSession(filename) as session:
+                self.assertTrue(session.set('artist', 'New Artist'))
+                self.assertTrue(session.set('title', 'New Title'))
+                self.assertTrue(session.set('artwork', artwork))
+                self.assertEqual(session.get('artist'), 'New Artist')
+            self.assertFalse(session.changed)
+
+            tag = get_tags(filename)
+            self.assertEqual(tag.artist, 'New Artist')
+            self.assertEqual(tag.title, 'New Title')
+            self.assertEqual(tag.album, 'Test Album')
+            self.assertEqual(tag.artwork, artwork)
+
+    def test_bytes_rewritten(self):
+        large_artwork = Artwork('image/png', b'\x89PNG' * 64 * 1024)
+        for audio_format in self.formats:
+            filename = self.get_filename(audio_format)
+            session = WriteSession(filename, get_tags(filename))
+            session.set('artwork', large_artwork)
+            size = session.commit()
+            self.assertEqual(size, os.path.getsize(filename))
+            self.assertEqual(get_tags(filename).artwork, large_artwork)
+
+            session = WriteSession(filename, get_tags(filename))
+            session.set('title', 'T')
+            size = session.commit()
+            self.assertGreater(size, 0)
+            self.assertLess(size, os.path.getsize(filename))
+            self.assertEqual(get_tags(filename).title, 'T')
+
+        for name in os.listdir(self.temp_dir):
+            self.assertFalse(name.endswith('.tmp'))
+
+
+if '__main__' == __name__:
+    unittest.main()
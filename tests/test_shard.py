@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from audiotool import _create_parser
+from module.checkpoint import Checkpoint
+from module.shard import get_part_filename, ShardError, ShardParts
+
+
+class ShardPartsTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.old_dir = os.path.join(self.temp_dir, 'old')
+        self.new_dir = os.path.join(self.temp_dir, 'new')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def write_part(self, shard, paths, command='uncovered', complete=True):
+        filename = os.path.join(self.temp_dir,
+                                get_part_filename(command, shard))
+        with Checkpoint(filename, command, self.old_dir,
+                        shard=shard) as part:
+            for path in paths:
+                part.write({'type': 'uncovered',
+                            'path': os.path.join(self.old_dir, path)})
+            if complete:
+                part.complete()
+        return filename
+
+    def test_merge(self):
+        filenames = [self.write_part((1, 2), ['b']),
+                     self.write_part((0, 2), ['a', 'c'])]
+        parts = ShardParts(filenames)
+        self.assertEqual(parts.command, 'uncovered')
+        entries = list(parts.gen_entries(self.new_dir))
+        self.assertEqual([(index, entry['path']) for index, entry in entries],
+                         [(0, os.path.join(self.new_dir, 'a')),
+                          (0, os.path.join(self.new_dir, 'c')),
+                          (1, os.path.join(self.new_dir, 'b'))])
+
+    def test_invalid_parts(self):
+        first = self.write_part((0, 2), ['a'])
+        with self.assertRaises(ShardError):
+            ShardParts([first])
+        with self.assertRaises(ShardError):
+            ShardParts([first, first])
+        with self.assertRaises(ShardError):
+            ShardParts([first, self.write_part((1, 2), [], 'genres')])
+
+    def test_incomplete_part(self):
+        filenames = [self.write_part((0, 2), ['a']),
+                     self.write_part((1, 2), ['b'], complete=False)]
+        parts = ShardParts(filenames)
+        with self.assertRaises(ShardError):
+            list(parts.gen_entries(self.new_dir))
+        self.assertEqual(len(list(parts.gen_entries(self.new_dir,
+                                                    strict=False))), 2)
+        self.assertFalse(parts.completed)
+
+
+class MergeArgumentsTest(unittest.TestCase):
+    def test_documented_command(self):
+        args = _create_parser().parse_args([
+            '--merge', 'genres.part-0-of-2.jsonl',
+            '--merge', 'genres.part-1-of-2.jsonl', 'DIR'])
+        self.assertEqual(args.merge, ['genres.part-0-of-2.jsonl',
+                                      'genres.part-1-of-2.jsonl'])
+        self.assertEqual(args.directory, 'DIR')
+
+        args = _create_parser().parse_args([
+            '--merge', 'node1.jsonl', '--merge', 'node2.jsonl',
+            '--checkpoint', 'all.jsonl', 'DIR'])
+        self.assertEqual(args.merge, ['node1.jsonl', 'node2.jsonl'])
+        self.assertEqual(args.checkpoint, 'all.jsonl')
+        self.assertEqual(args.directory, 'DIR')
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIO_EXAMPLES_DIR = os.path.join(ROOT_DIR, 'tests', 'audio_examples')
+
+# Cumulative import time of the audiotool module, in microseconds. It was
+# about 150 ms with eager imports and is about 60 ms with lazy ones.
+STARTUP_BUDGET_US = 100000
+
+LAZY_MODULE_PREFIXES = ('mutagen', 'asyncio', 'PIL', 'sqlite3', )
+
+
+def get_import_times(*args):
+    # Return a dict of imported modules and their cumulative import times
+    process = subprocess.run(
+        (sys.executable, '-X', 'importtime') + args, cwd=ROOT_DIR,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    import_times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        try:
+            import_times[name.strip()] = int(cumulative)
+        except ValueError:
+            continue
+    return import_times
+
+
+class StartupTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        album_dir = os.path.join(self.temp_dir, 'Artist', 'Album')
+        os.makedirs(album_dir)
+        for name in ('1.flac', '1.m4a', '1.mp3', '1.ogg'):
+            shutil.copy(os.path.join(AUDIO_EXAMPLES_DIR, name), album_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_import_time(self):
+        import_time = min(
+            get_import_times('-c', 'import audiotool')['audiotool']
+            for _ in range(3))
+        self.assertLess(import_time, STARTUP_BUDGET_US)
+
+    def test_lazy_modules(self):
+        for args in (('-c', 'import audiotool'),
+                     ('audiotool.py', '-u', self.temp_dir),
+                     ('audiotool.py', '-r', self.temp_dir)):
+            for name in get_import_times(*args):
+                self.assertFalse(name.startswith(LAZY_MODULE_PREFIXES),
+                                 f'{name} is imported by {args}')
+
+    def test_format_modules(self):
+        import_times = get_import_times(
+            '-c', 'from module.tag import get_tags; '
+                  f'get_tags({os.path.join(AUDIO_EXAMPLES_DIR, "1.flac")!r})')
+        self.assertIn('mutagen.flac', import_times)
+        for name in ('mutagen.mp4', 'mutagen.oggvorbis'):
+            self.assertNotIn(name, import_times)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from module.stats import Stats
+
+
+class StatsTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = Stats()
+
+    def test_disabled_stats(self):
+        with self.stats.timer('parse'):
+            pass
+        self.stats.incr('files_parsed')
+        self.stats.add_error(OSError())
+        self.assertEqual(self.stats.timings, {})
+        self.assertEqual(self.stats.counters, {})
+        self.assertEqual(self.stats.errors, {})
+
+    def test_enabled_stats(self):
+        self.stats.enabled = True
+        for _ in range(3):
+            with self.stats.timer('parse'):
+                pass
+        self.stats.incr('bytes_written', 10)
+        self.stats.incr('bytes_written', 5)
+        self.stats.add_error(FileNotFoundError())
+        self.assertEqual(self.stats.timings['parse'][0], 3)
+        self.assertEqual(self.stats.counters, {'bytes_written': 15})
+        self.assertEqual(self.stats.errors, {'FileNotFoundError': 1})
+
+    def test_prometheus_format(self):
+        self.stats.enabled = True
+        with self.stats.timer('save'):
+            pass
+        self.stats.incr('files_written')
+        self.stats.add_error(OSError())
+        lines = self.stats.to_prometheus().splitlines()
+        self.assertIn('audiotool_phase_calls_total{phase="save"} 1', lines)
+        self.assertIn('audiotool_files_written_total 1', lines)
+        self.assertIn('audiotool_errors_total{type="OSError"} 1', lines)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+
+from module.throttle import IOScheduler, TimeWindow, TokenBucket
+
+
+class _FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_consume(self):
+        clock = _FakeClock()
+        bucket = TokenBucket(100, clock=clock)
+        self.assertEqual(bucket.consume(60), 0)
+        self.assertAlmostEqual(bucket.consume(60), 0.2)
+        clock.now += 2.0
+        # Tokens never exceed the burst
+        self.assertEqual(bucket.consume(100), 0)
+        self.assertAlmostEqual(bucket.consume(50), 0.5)
+
+
+class TimeWindowTest(unittest.TestCase):
+    def test_parse(self):
+        window = TimeWindow.parse('1:30-6')
+        self.assertEqual((window.start, window.end), (90, 360))
+        for value in ('1:30', '25:00-1:00', '2:00-2:00', 'a-b'):
+            with self.assertRaises(ValueError):
+                TimeWindow.parse(value)
+
+    def test_contains(self):
+        window = TimeWindow.parse('22:00-06:00')
+        self.assertTrue(window.contains(23 * 60))
+        self.assertTrue(window.contains(5 * 60))
+        self.assertFalse(window.contains(12 * 60))
+        self.assertEqual(window.get_minutes_to_start(21 * 60), 60)
+
+
+class IOSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = _FakeClock()
+        self.scheduler = IOScheduler()
+        self.scheduler.clock = self.clock
+        self.scheduler.sleep = self.clock.sleep
+
+    def test_disabled(self):
+        self.scheduler.configure()
+        self.assertFalse(self.scheduler.enabled)
+        self.scheduler.throttle(nbytes=10 ** 9, ops=10 ** 6)
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_throttle(self):
+        self.scheduler.configure(bytes_rate=1000, ops_rate=10)
+        self.scheduler.throttle(nbytes=3000, ops=1)
+        self.assertEqual(self.clock.sleeps, [2.0])
+
+    def test_latency_adaptation(self):
+        self.scheduler.configure(bytes_rate=1000, latency_slo=0.01)
+        for _ in range(3):
+            self.clock.now += 1.0
+            self.scheduler.add_latency(0.05)
+        self.assertEqual(self.scheduler.factor, 0.125)
+        self.assertEqual(self.scheduler.bytes_bucket.rate, 125)
+        self.assertEqual(self.scheduler.ops_rate, 500)
+
+        for _ in range(40):
+            self.clock.now += 1.0
+            self.scheduler.add_latency(0.001)
+        self.assertEqual(self.scheduler.factor, 1.0)
+
+    def test_worker_share(self):
+        self.scheduler.configure(bytes_rate=1000, workers=4)
+        self.assertEqual(self.scheduler.bytes_rate, 250)
+        self.assertIsNone(self.scheduler.ops_bucket)
+
+        # Default ceilings of the latency SLO are shared too
+        self.scheduler.configure(latency_slo=0.01, workers=4)
+        self.assertEqual(self.scheduler.bytes_rate, 25 * 1024 * 1024)
+        self.assertEqual(self.scheduler.ops_rate, 125)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import pickle
+import unittest
+
+from module.track import read_track_info, TrackBatch, TrackInfo
+
+
+AUDIO_EXAMPLES_DIR = os.path.join('tests', 'audio_examples')
+
+
+class TrackInfoTest(unittest.TestCase):
+    def test_immutable(self):
+        track = TrackInfo('/music/01.flac', artist='Artist')
+        with self.assertRaises(AttributeError):
+            track.artist = 'Other Artist'
+        with self.assertRaises(AttributeError):
+            track.extra = 'value'
+        with self.assertRaises(AttributeError):
+            del track.artist
+        self.assertFalse(hasattr(track, '__dict__'))
+
+    def test_equality(self):
+        track = TrackInfo('/music/01.flac', artist='Artist')
+        self.assertEqual(track, TrackInfo('/music/01.flac', 'Artist'))
+        self.assertNotEqual(track, TrackInfo('/music/02.flac', 'Artist'))
+        self.assertEqual(len({track, TrackInfo('/music/01.flac', 'Artist')}),
+                         1)
+        self.assertEqual(pickle.loads(pickle.dumps(track)), track)
+
+    def test_read_track_info(self):
+        for audio_format in ('flac', 'm4a', 'mp3', 'ogg'):
+            filename = os.path.join(AUDIO_EXAMPLES_DIR, f'3.{audio_format}')
+            track = read_track_info(filename)
+            self.assertEqual(track.path, filename)
+            self.assertEqual(track.artist, 'Test Artist')
+            self.assertEqual(track.album, 'Test Album')
+            self.assertEqual(track.title, 'Test Title')
+            self.assertEqual(track.artwork_mime, 'image/jpeg')
+            self.assertGreater(track.artwork_size, 0)
+
+
+class TrackBatchTest(unittest.TestCase):
+    def setUp(self):
+        self.tracks = [
+            TrackInfo('/music/Artist/Album/01.flac', 'Artist', 'Album',
+                      'Title 1', 'Rock', 'image/jpeg', 1000),
+            TrackInfo('/music/Artist/Album/02.flac', 'Artist', 'Album',
+                      'Title 2', 'Rock', 'image/jpeg', 1000),
+            TrackInfo('/music/Other/03.mp3', title='Title 3'),
+        ]
+
+    def test_round_trip(self):
+        batch = TrackBatch(self.tracks)
+        self.assertEqual(len(batch), 3)
+        self.assertEqual(list(batch), self.tracks)
+        self.assertEqual(batch[2], self.tracks[2])
+
+    def test_columns(self):
+        batch = TrackBatch(self.tracks)
+        self.assertEqual(list(batch.gen_values('genre')),
+                         ['Rock', 'Rock', None])
+        self.assertEqual(list(batch.gen_values('artwork_size')),
+                         [1000, 1000, 0])
+        self.assertEqual(list(batch.gen_values('path')),
+                         [track.path for track in self.tracks])
+        # Repeated values are stored once
+        self.assertEqual(len(batch.pool.strings), 10)
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,115 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from module.watch import (
+    DebounceQueue, InotifyWatcher, is_inotify_available, PollingWatcher,
+    watch)
+
+
+class DebounceQueueTest(unittest.TestCase):
+    def test_debounce(self):
+        queue = DebounceQueue(5)
+        self.assertIsNone(queue.get_timeout(0))
+        queue.add('/lib/a', 0)
+        queue.add('/lib/b', 1)
+        queue.add('/lib/a/cd1', 3)
+        self.assertEqual(queue.get_timeout(3), 3)
+        self.assertEqual(queue.pop_ready(6), ['/lib/b'])
+        self.assertEqual(queue.pop_ready(7), [])
+        self.assertEqual(queue.pop_ready(8), ['/lib/a'])
+        self.assertEqual(queue.pending, {})
+
+    def test_parent_replaces_children(self):
+        queue = DebounceQueue(5)
+        queue.add('/lib/a/cd1', 0)
+        queue.add('/lib/a/cd2', 0)
+        queue.add('/lib/ab', 0)
+        queue.add('/lib/a', 2)
+        self.assertEqual(queue.pop_ready(5), ['/lib/ab'])
+        self.assertEqual(queue.pop_ready(7), ['/lib/a'])
+
+
+class WatcherTestMixin(object):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.album_dir = os.path.join(self.temp_dir, 'Album')
+        os.mkdir(self.album_dir)
+        self.watcher = self.create_watcher()
+
+    def tearDown(self):
+        self.watcher.close()
+        shutil.rmtree(self.temp_dir)
+
+    def create_watcher(self):
+        raise NotImplementedError
+
+    def test_new_directory(self):
+        new_dir = os.path.join(self.temp_dir, 'New Album')
+        os.makedirs(os.path.join(new_dir, 'CD1'))
+        self.assertIn(new_dir, self.watcher.wait(1))
+
+    def test_new_file(self):
+        with open(os.path.join(self.album_dir, '01.flac'), 'wb') as fd:
+            fd.write(b'data')
+        self.assertEqual(self.watcher.wait(1), [self.album_dir])
+        self.assertEqual(self.watcher.wait(0.01), [])
+
+
+class PollingWatcherTest(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self):
+        return PollingWatcher(self.temp_dir, interval=0.01)
+
+
+@unittest.skipUnless(is_inotify_available(), 'inotify is not available')
+class InotifyWatcherTest(WatcherTestMixin, unittest.TestCase):
+    def create_watcher(self):
+        return InotifyWatcher(self.temp_dir)
+
+    def test_watch_new_directory(self):
+        new_dir = os.path.join(self.temp_dir, 'New Album')
+        os.mkdir(new_dir)
+        self.assertEqual(self.watcher.wait(1), [new_dir])
+        open(os.path.join(new_dir, '01.flac'), 'w').close()
+        self.assertEqual(self.watcher.wait(1), [new_dir])
+
+
+class WatchTest(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_failing_process(self):
+        first_dir = os.path.join(self.temp_dir, 'First Album')
+        second_dir = os.path.join(self.temp_dir, 'Second Album')
+        processed = []
+
+        def process(path):
+            processed.append(path)
+            if path == first_dir:
+                os.mkdir(second_dir)
+                raise OSError('No space left on device')
+            # Nothing but an interrupt stops watching
+            raise KeyboardInterrupt()
+
+        timer = threading.Timer(0.05, os.mkdir, (first_dir, ))
+        timer.start()
+        output = io.StringIO()
+        with self.assertRaises(KeyboardInterrupt), \
+                contextlib.redirect_stdout(output):
+            watch(self.temp_dir, process, delay=0, polling=True,
+                  interval=0.01)
+        timer.join()
+        self.assertEqual(processed, [first_dir, second_dir])
+        self.assertIn(f'[watch] Unable to process {first_dir}',
+                      output.getvalue())
+
+
+if '__main__' == __name__:
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from module.workers import run_tasks, WorkerStats
+
+
+def _square(value):
+    return value * value
+
+
+class RunTasksTest(unittest.TestCase):
+    def setUp(self):
+        self.items = list(range(100))
+        self.expected = [_square(item) for item in self.items]
+
+    def test_serial_run(self):
+        actual = list(run_tasks(_square, self.items))
+        self.assertEqual(actual, self.expected)
+
+    def test_thread_run_keeps_order(self):
+        actual = list(run_tasks(_square, iter(self.items), jobs=4))
+        self.assertEqual(actual, self.expected)
+
+    def test_process_run_keeps_order(self):
+        actual = list(run_tasks(_square, self.items, jobs=2, processes=True))
+        self.assertEqual(actual, self.expected)
+
+    def test_worker_stats(self):
+        stats = WorkerStats()
+        list(run_tasks(_square, self.items, jobs=4, stats=stats))
+        total = sum(count for _, count, _ in stats.gen_report())
+        self.assertEqual(total, len(self.items))
+
+
+if '__main__' == __name__:
+    unittest.main()